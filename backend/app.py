@@ -1,13 +1,16 @@
-from flask import Flask, jsonify, request, send_from_directory, session
+from flask import Flask, Response, jsonify, request, send_from_directory, session
 from flask_cors import CORS
-from utils.tmdb_client import TMDBClient
-from models.recommender import MovieRecommender
+from utils.tmdb_client import get_tmdb_client
+from utils.cache_warmer import CacheWarmer
+from models.recommender import get_recommender, get_construction_stats
 from models.user import User
-from models.ai_recommender import AIRecommender
+from models.ai_recommender import get_ai_recommender
 import os
 from dotenv import load_dotenv
 import logging
-import asyncio
+from utils.async_runtime import run_async, iterate_async
+from utils.sse import sse_event, SSE_HEADERS
+from utils.lazy import preload
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -30,12 +33,28 @@ app = Flask(__name__,
 CORS(app)
 app.secret_key = os.urandom(24)  # Required for session management
 
+def start_background_tasks():
+    """Start this process's background threads: the cache warmer and Gemini model discovery"""
+    if os.getenv('ENABLE_CACHE_WARMER', 'true').lower() == 'true':
+        cache_warmer.start()
+    ai_recommender.gemini.start()
+
 # Initialize clients
 try:
     user_model = User()  # Initialize User model first
-    tmdb_client = TMDBClient(api_key)  # Pass the api_key to TMDBClient
-    recommender = MovieRecommender(tmdb_client)
-    ai_recommender = AIRecommender(recommender)
+    # Shared with the ASGI routes (asgi.py) through the same accessors
+    tmdb_client = get_tmdb_client()
+    recommender = get_recommender(tmdb_client)
+    ai_recommender = get_ai_recommender(recommender)
+    if os.getenv('PRELOAD_HEAVY_MODULES', 'false').lower() == 'true':
+        # Pay the numpy/pandas/scikit-learn import and index load here (e.g. once in
+        # the gunicorn master) instead of in the first TF-IDF request
+        preload()
+        recommender.load_index()
+    cache_warmer = CacheWarmer(tmdb_client, mood_genres=recommender.mood_genres)
+    # A preloading gunicorn master starts these in each worker instead (post_fork)
+    if os.getenv('DEFER_BACKGROUND_TASKS', 'false').lower() != 'true':
+        start_background_tasks()
     logger.info("Clients initialized successfully")
 except Exception as e:
     logger.error(f"Error initializing clients: {str(e)}")
@@ -178,6 +197,29 @@ def health_check():
             "api_key_loaded": bool(api_key)
         }), 500
 
+@app.route('/api/metrics')
+def get_metrics():
+    """Runtime counters for this worker (connection reuse, cache, recommender)"""
+    try:
+        return jsonify({
+            'success': True,
+            'pid': os.getpid(),
+            'tmdb': tmdb_client.get_stats(),
+            'recommender': get_construction_stats(),
+            'cache_warmer': cache_warmer.stats,
+            'ai': {
+                'model': ai_recommender.gemini.get_stats(),
+                'fast_path': ai_recommender.intent_parser.get_stats(),
+                'intent_cache': ai_recommender.intent_cache.get_stats()
+            }
+        })
+    except Exception as e:
+        logger.error(f"Error collecting metrics: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Error collecting metrics'
+        }), 500
+
 @app.route('/api/movie-of-the-day')
 def get_movie_of_the_day():
     try:
@@ -247,8 +289,11 @@ def search_movies():
             'error': 'No search query provided'
         }), 400
     
+    # ?lite=1 returns the raw search payload without per-movie detail calls
+    lite = request.args.get('lite', '').lower() in ('1', 'true', 'yes')
+    
     try:
-        movies = tmdb_client.search_movies(query)
+        movies = tmdb_client.search_movies(query, lite=lite)
         return jsonify({
             'success': True,
             'movies': movies
@@ -274,7 +319,7 @@ def get_recommendations():
                 'error': 'No recommendation criteria provided'
             }), 400
         
-        recommender = MovieRecommender(tmdb_client)
+        recommender = get_recommender(tmdb_client)
         recommendations = recommender.get_recommendations(movie_id, mood, genre)
         return jsonify({
             'success': True,
@@ -376,7 +421,7 @@ def get_watchlist():
 @app.route('/api/recommendations/mood/<mood>')
 def get_mood_recommendations(mood):
     try:
-        recommender = MovieRecommender(tmdb_client)
+        recommender = get_recommender(tmdb_client)
         movies = recommender.get_mood_recommendations(mood)
         
         return jsonify({
@@ -393,7 +438,7 @@ def get_mood_recommendations(mood):
 @app.route('/api/recommendations/genre/<genre>')
 def get_genre_recommendations(genre):
     try:
-        recommender = MovieRecommender(tmdb_client)
+        recommender = get_recommender(tmdb_client)
         movies = recommender.get_genre_recommendations(genre)
         
         return jsonify({
@@ -525,21 +570,10 @@ def chat_recommendations():
         
         logger.info(f"Processing user input: {user_input}")
         
-        # Check if AI recommender is properly initialized
-        if not hasattr(ai_recommender, 'model'):
-            logger.error("AI recommender model not initialized - missing GOOGLE_API_KEY")
-            return jsonify({
-                'success': False,
-                'error': 'AI service not available. Please check configuration.',
-                'debug_info': {
-                    'ai_recommender_initialized': hasattr(ai_recommender, 'model'),
-                    'google_api_key_loaded': bool(os.getenv('GOOGLE_API_KEY'))
-                }
-            }), 503
-        
-        # Call the async Gemini AI recommender
+        # Call the async Gemini AI recommender on this worker's persistent event loop;
+        # without a model it still answers plain requests, or falls back to popular movies
         logger.info("Calling AI recommender...")
-        recommendations = asyncio.run(ai_recommender.get_chat_recommendations(user_input))
+        recommendations = run_async(ai_recommender.get_chat_recommendations(user_input))
         
         logger.info(f"AI recommender returned {len(recommendations) if recommendations else 0} recommendations")
         
@@ -559,10 +593,29 @@ def chat_recommendations():
             'debug_info': {
                 'exception_type': type(e).__name__,
                 'exception_message': str(e),
-                'ai_recommender_initialized': hasattr(ai_recommender, 'model') if 'ai_recommender' in locals() else False,
+                'ai_recommender_initialized': ai_recommender.is_available if 'ai_recommender' in locals() else False,
                 'google_api_key_loaded': bool(os.getenv('GOOGLE_API_KEY'))
             }
         }), 500
 
+@app.route('/api/recommendations/chat-recommendations/stream', methods=['POST'])
+def chat_recommendations_stream():
+    """Server-sent events: the explanation first, then each movie as soon as it is fetched"""
+    data = request.get_json(silent=True) or {}
+    user_input = data.get('user_input')
+    if not user_input:
+        return jsonify({
+            'success': False,
+            'error': 'user_input is required'
+        }), 400
+    
+    logger.info(f"Streaming chat recommendations for: {user_input}")
+    events = iterate_async(ai_recommender.stream_chat_recommendations(user_input))
+    return Response(
+        (sse_event(event) for event in events),
+        mimetype='text/event-stream',
+        headers=SSE_HEADERS
+    )
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000) 
\ No newline at end of file
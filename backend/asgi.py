@@ -0,0 +1,17 @@
+"""ASGI entry point: the async FastAPI routes in front of the Flask app.
+
+Requests under /api/recommendations that routes/recommendations.py defines
+are served by FastAPI on the event loop; everything else falls through to
+the Flask app. Both use the same per-process TMDB client and recommenders.
+
+    uvicorn asgi:app --port 5000
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+"""
+from fastapi import FastAPI
+from a2wsgi import WSGIMiddleware
+from app import app as flask_app
+from routes.recommendations import router
+
+app = FastAPI(title='CineGenie')
+app.include_router(router, prefix='/api/recommendations')
+app.mount('/', WSGIMiddleware(flask_app))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Profile how long a fresh worker spends importing the app.
+
+Runs ``python -X importtime -c "import app"`` in a clean interpreter (as a
+gunicorn worker would, without PRELOAD_HEAVY_MODULES), then prints the total
+import time and the top-level packages that cost the most (summing each
+package's own import time over all of its submodules):
+
+    python benchmarks/import_time.py [--repeat 3] [--top 15] [--budget 3.0]
+
+Exits non-zero when a module that should be imported lazily (numpy, pandas,
+scipy, scikit-learn, google.generativeai) is imported at startup, or when
+the best total exceeds --budget seconds.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Top-level packages that must stay out of app startup
+LAZY_PACKAGES = ('numpy', 'pandas', 'scipy', 'sklearn', 'google.generativeai')
+
+# "import time: self [us] | cumulative | imported package"
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| *(\S+)")
+
+
+def profile_once(target):
+    env = dict(os.environ)
+    # Startup must not depend on the network or leave files behind: no cache
+    # warmer, no SQLite cache file, placeholder keys
+    env.setdefault('TMDB_API_KEY', 'benchmark')
+    env['ENABLE_CACHE_WARMER'] = 'false'
+    env['TMDB_CACHE_BACKEND'] = 'memory'
+    env['PRELOAD_HEAVY_MODULES'] = 'false'
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{result.stderr[-2000:]}")
+
+    modules = {}
+    top_level = defaultdict(int)
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        own, cumulative, name = int(match.group(1)), int(match.group(2)), match.group(3)
+        modules[name] = cumulative
+        top_level[name.split('.')[0]] += own
+    return modules, top_level
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile app import time")
+    parser.add_argument('--target', default='app', help="Module to import (default: app)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs to take the best of")
+    parser.add_argument('--top', type=int, default=15, help="Slowest packages to list")
+    parser.add_argument('--budget', type=float, default=None, help="Fail above this many seconds")
+    args = parser.parse_args()
+
+    runs = [profile_once(args.target) for _ in range(args.repeat)]
+    totals = [modules.get(args.target, 0) / 1e6 for modules, _ in runs]
+    modules, top_level = runs[totals.index(min(totals))]
+    best = min(totals)
+
+    print(f"import {args.target}: best {best:.3f}s of {args.repeat} "
+          f"(runs: {', '.join(f'{t:.3f}s' for t in totals)})")
+    print(f"{'package':<32}{'self time':>12}")
+    for name, micros in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<32}{micros / 1e6:>11.3f}s")
+
+    failed = False
+    eager = [name for name in LAZY_PACKAGES if name in modules]
+    if eager:
+        print(f"❌ Imported at startup but should be lazy: {', '.join(eager)}")
+        failed = True
+    if args.budget is not None and best > args.budget:
+        print(f"❌ Import time {best:.3f}s exceeds budget {args.budget:.3f}s")
+        failed = True
+    if not failed:
+        print("✅ Heavy modules are deferred")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Report memory per gunicorn worker, from /proc/<pid>/smaps_rollup (Linux).
+
+    python benchmarks/worker_memory.py [--pid MASTER_PID]
+
+Without --pid the gunicorn master is found by scanning /proc. RSS counts
+shared pages once per process, so its sum overstates the real footprint;
+PSS splits each shared page between the processes mapping it, so the PSS
+total is what the whole server actually costs. With preload_app the
+workers' Shared columns should be large and their Private_Dirty small.
+"""
+
+import argparse
+import os
+import sys
+
+FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_cmdline(pid):
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return f.read().replace(b'\0', b' ').decode(errors='replace').strip()
+    except OSError:
+        return ''
+
+
+def read_ppid(pid):
+    with open(f'/proc/{pid}/stat') as f:
+        # The command name may contain spaces; fields resume after the last ')'
+        return int(f.read().rsplit(')', 1)[1].split()[1])
+
+
+def process_tree():
+    """{pid: [child pids]} for every process"""
+    tree = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                tree.setdefault(read_ppid(entry), []).append(int(entry))
+            except OSError:
+                continue
+    return tree
+
+
+def find_master(tree):
+    """The gunicorn process whose children are all childless gunicorn workers"""
+    for pid, kids in tree.items():
+        if pid and 'gunicorn' in read_cmdline(pid) and all(
+            'gunicorn' in read_cmdline(kid) and not tree.get(kid) for kid in kids
+        ):
+            return pid
+    return None
+
+
+def memory_kb(pid):
+    stats = dict.fromkeys(FIELDS, 0)
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in stats:
+                stats[key] = int(value.split()[0])
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per gunicorn worker")
+    parser.add_argument('--pid', type=int, help="gunicorn master pid (default: search /proc)")
+    args = parser.parse_args()
+
+    tree = process_tree()
+    master = args.pid or find_master(tree)
+    if not master:
+        print("❌ No gunicorn master found; pass --pid")
+        return 1
+
+    rows = [('master', master)] + [('worker', pid) for pid in sorted(tree.get(master, []))]
+    print(f"{'process':<8}{'pid':>8}" + ''.join(f"{field:>15}" for field in FIELDS))
+    totals = dict.fromkeys(FIELDS, 0)
+    for role, pid in rows:
+        stats = memory_kb(pid)
+        for field in FIELDS:
+            totals[field] += stats[field]
+        print(f"{role:<8}{pid:>8}" + ''.join(f"{stats[field] / 1024:>12.1f} MB" for field in FIELDS))
+    print(f"{'total':<16}" + ''.join(f"{totals[field] / 1024:>12.1f} MB" for field in FIELDS))
+    workers = len(rows) - 1
+    if workers:
+        print(f"{workers} workers; PSS total {totals['Pss'] / 1024:.1f} MB vs RSS total {totals['Rss'] / 1024:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Build the persisted TF-IDF index used by MovieRecommender.
+
+Run offline (or at deploy time) so that workers only ever memory-map the
+finished index at startup:
+
+    python build_index.py [--limit 1000] [--output PATH]
+
+Run with --update (e.g. hourly from cron) to append trending, now-playing
+and upcoming titles to the existing index without refitting. The index is
+compacted, and refitted once enough rows were appended, when needed.
+Running workers reload the new index within RECOMMENDER_INDEX_RELOAD_INTERVAL.
+
+    python build_index.py --update [--limit 200] [--compact]
+"""
+
+import argparse
+import os
+import sys
+import time
+from dotenv import load_dotenv
+
+from utils.tmdb_client import TMDBClient
+from models.recommender import MovieRecommender
+from models.tfidf_index import TfidfIndex, get_index_path
+from models.corpus_ingest import CorpusIngestor, UPDATE_SOURCES
+
+def update_index(tmdb_client, args):
+    """Append fresh titles to the existing index and compact it when due"""
+    if not TfidfIndex.exists(args.output):
+        print(f"❌ No index at {args.output}; run a full build first")
+        return 1
+
+    start = time.time()
+    index = TfidfIndex.load(args.output, mmap=False)
+    ingestor = CorpusIngestor(
+        tmdb_client,
+        max_workers=args.workers,
+        sources=UPDATE_SOURCES,
+        max_pages=5
+    )
+    existing_ids = set(index.movies_df['id'])
+    new_movies = ingestor.ingest(limit=args.limit, skip_ids=existing_ids)
+    added = index.add_movies(new_movies)
+
+    if args.compact or index.needs_compaction():
+        index.compact(refit=True if args.compact else None)
+
+    index.save(args.output)
+    print(f"✅ Added {added} movies; index now has {index.live_count} movies "
+          f"({index.appended_since_fit} appended since last fit) in {time.time() - start:.1f}s")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the CineGenie TF-IDF index")
+    parser.add_argument('--limit', type=int, default=1000, help="Number of movies to index")
+    parser.add_argument('--output', default=get_index_path(), help="Index directory")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent TMDB requests")
+    parser.add_argument('--fresh', action='store_true', help="Ignore any checkpoint from a failed run")
+    parser.add_argument('--update', action='store_true', help="Append new titles to the existing index")
+    parser.add_argument('--compact', action='store_true', help="With --update, force a compaction and refit")
+    args = parser.parse_args()
+
+    load_dotenv()
+    api_key = os.getenv('TMDB_API_KEY')
+    if not api_key:
+        print("❌ TMDB_API_KEY not found")
+        return 1
+
+    tmdb_client = TMDBClient(api_key)
+    if args.update:
+        return update_index(tmdb_client, args)
+
+    start = time.time()
+    recommender = MovieRecommender(tmdb_client)
+    # Rows are checkpointed as they arrive, so a failed build resumes where it stopped
+    checkpoint_path = os.path.join(os.path.dirname(os.path.abspath(args.output)), 'ingest_checkpoint.jsonl')
+    if args.fresh and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    movies_df = recommender.fetch_movie_data(
+        limit=args.limit,
+        checkpoint_path=checkpoint_path,
+        max_workers=args.workers
+    )
+    if movies_df.empty:
+        print("❌ No movies fetched; index not written")
+        return 1
+
+    index = TfidfIndex.build(movies_df)
+    index.save(args.output)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    print(f"✅ Indexed {index.matrix.shape[0]} movies x {index.matrix.shape[1]} terms "
+          f"in {time.time() - start:.1f}s -> {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
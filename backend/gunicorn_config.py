@@ -1,3 +1,54 @@
-bind = "0.0.0.0:10000"
-workers = 2
-timeout = 120 
\ No newline at end of file
+"""
+Production gunicorn profile:
+
+    cd backend && gunicorn -c gunicorn_config.py app:app
+
+The app is preloaded in the master so the worker processes share its read-only
+state copy-on-write: numpy/pandas/scikit-learn, the genre and mood tables,
+the memory-mapped TF-IDF index and the movie metadata frame. Requests spend
+most of their time waiting on TMDB and Gemini, so each worker runs a pool of
+threads (gthread) rather than handling one request at a time. Check the
+result with benchmarks/worker_memory.py.
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+# Threads cover the I/O waits; a few processes cover the CPU work (TF-IDF scoring, JSON)
+workers = int(os.getenv('WEB_CONCURRENCY', max(2, min(multiprocessing.cpu_count(), 4))))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# The TMDB rate limiter gives each worker a 1/WEB_CONCURRENCY share of the budget
+os.environ['WEB_CONCURRENCY'] = str(workers)
+
+if preload_app:
+    # Import the heavy modules and load the index once, in the master; start
+    # threads (which don't survive fork) in each worker instead
+    os.environ.setdefault('PRELOAD_HEAVY_MODULES', 'true')
+    os.environ['DEFER_BACKGROUND_TASKS'] = 'true'
+
+
+def when_ready(server):
+    if preload_app:
+        # Move everything the master allocated out of the collector's reach, so
+        # collections in the workers don't write to (and so copy) the shared pages
+        gc.collect()
+        gc.freeze()
+        server.log.info(f"Preloaded app; froze {gc.get_freeze_count()} objects for copy-on-write sharing")
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app import tmdb_client, start_background_tasks
+        # Sockets and thread pools can't be shared with the master
+        tmdb_client.after_fork()
+        start_background_tasks()
@@ -1,162 +1,98 @@
+import asyncio
 import os
 import logging
-from typing import List, Dict, Any
-import google.generativeai as genai
+import threading
+from typing import List, Dict, Any, AsyncIterator, Awaitable
 from models.recommender import MovieRecommender
+from models.intent_cache import IntentCache
+from models.intent_parser import IntentParser
+from models.gemini_model import GeminiModelLoader
+from models.analysis_schema import build_analysis_prompt, parse_analysis, ANALYSIS_GENERATION_CONFIG
+from utils.async_runtime import run_blocking
+from utils.async_tmdb_client import get_async_tmdb_client
 
 logger = logging.getLogger(__name__)
 
+NO_MATCH_MESSAGE = "I couldn't find movies matching your specific criteria. Here are some popular movies you might enjoy."
+
+# One Gemini client per worker process; see get_ai_recommender()
+_shared_ai_recommender = None
+_shared_lock = threading.Lock()
+
+def get_ai_recommender(movie_recommender: MovieRecommender) -> 'AIRecommender':
+    """Return the process-wide AIRecommender, building it on first use"""
+    global _shared_ai_recommender
+    if _shared_ai_recommender is None:
+        with _shared_lock:
+            if _shared_ai_recommender is None:
+                _shared_ai_recommender = AIRecommender(movie_recommender)
+    return _shared_ai_recommender
+
 class AIRecommender:
     def __init__(self, movie_recommender: MovieRecommender):
         """Initialize AI recommender with movie recommender"""
         self.movie_recommender = movie_recommender
+        self.intent_cache = IntentCache()  # Parsed chat requests, shared by paraphrases
+        self.async_tmdb_client = get_async_tmdb_client()  # Non-blocking TMDB calls
+        self.intent_parser = IntentParser(
+            movie_recommender.tmdb_client.genre_mapping,
+            movie_recommender.tmdb_client.mood_mapping
+        )
         api_key = os.getenv('GOOGLE_API_KEY')
         if not api_key:
             logger.error("GOOGLE_API_KEY not found in environment variables!")
             logger.error("Please set GOOGLE_API_KEY environment variable to use AI features")
-            self.model = None
-            return
         else:
             logger.info("GOOGLE_API_KEY loaded successfully")
             logger.debug(f"API Key length: {len(api_key)}")
-        
-        try:
-            genai.configure(api_key=api_key)
-            # List available models for debugging
-            models = genai.list_models()
-            available_models = [model.name for model in models]
-            logger.info(f"Available models: {available_models}")
-            
-            # Use gemini-1.5-flash as recommended
-            model_name = 'models/gemini-1.5-flash'
-            if model_name not in available_models:
-                logger.warning(f"Recommended model {model_name} not found, using first available model")
-                model_name = available_models[0] if available_models else None
-                if not model_name:
-                    raise Exception("No available models found")
-            
-            logger.info(f"Using model: {model_name}")
-            self.model = genai.GenerativeModel(model_name)
-            logger.info("Successfully initialized Gemini model")
-        except Exception as e:
-            logger.error(f"Error initializing Gemini: {str(e)}")
-            logger.error("AI features will be disabled. Please check your GOOGLE_API_KEY")
-            self.model = None
+        # Model discovery happens in the background, never while the app is imported
+        self.gemini = GeminiModelLoader(api_key)
+        self.model_wait = float(os.getenv('GEMINI_MODEL_WAIT', 10))
+
+    @property
+    def model(self):
+        """The Gemini model, or None while it is being discovered or when AI is unavailable"""
+        return self.gemini.model
+
+    @property
+    def is_available(self) -> bool:
+        """True when Gemini is configured and its model is loaded or still loading"""
+        return self.gemini.is_available
+
+    async def _wait_for_model(self):
+        """The Gemini model, giving a discovery still in progress up to GEMINI_MODEL_WAIT seconds"""
+        model = self.model
+        if model is None and self.gemini.is_available:
+            # Awaited on the loop: a blocking wait would hold a run_blocking thread
+            model = await self.gemini.wait_async(self.model_wait)
+        return model
 
     async def get_chat_recommendations(self, user_input: str) -> List[Dict[str, Any]]:
         """
         Get movie recommendations based on natural language input using Gemini AI
         """
+        intent = self._known_intent(user_input)
+        
         # Check if AI model is available
-        if not self.model:
+        if intent is None and not await self._wait_for_model():
             logger.warning("AI model not available, providing fallback recommendations")
-            fallback_movies = self.movie_recommender.get_popular_movies()
+            fallback_movies = await run_blocking(self.movie_recommender.get_popular_movies)
             if fallback_movies:
                 fallback_movies.insert(0, {
                     "message": "AI service is currently unavailable. Here are some popular movies you might enjoy."
                 })
             return fallback_movies
         
-        prompt = f"""You are a movie recommendation expert. Based on the following user request, 
-        identify the key elements for movie recommendations. Respond in this exact format:
-        GENRES: [list of genres, separated by commas]
-        YEAR: [specific year or year range, or "any" if not specified]
-        MOOD: [mood if specified, or "any"]
-        
-        For example:
-        - For "horror comedy movies" -> GENRES: horror, comedy
-        - For "90s movies" -> YEAR: 1990-1999
-        - For "romantic comedies from 2000s" -> GENRES: romance, comedy, YEAR: 2000-2009
-        
-        User request: {user_input}"""
-        
         try:
-            logger.info(f"Processing user request: {user_input}")
-            response = self.model.generate_content(prompt)
-            analysis = response.text.strip()
-            logger.info(f"AI analysis: {analysis}")
-            
-            # Parse the analysis
-            genres = []
-            year_range = None
-            mood = None
-            
-            for line in analysis.split('\n'):
-                if line.startswith('GENRES:'):
-                    genres = [g.strip().lower() for g in line.replace('GENRES:', '').split(',')]
-                elif line.startswith('YEAR:'):
-                    year_str = line.replace('YEAR:', '').strip()
-                    if year_str != 'any':
-                        if '-' in year_str:
-                            start_year, end_year = map(int, year_str.split('-'))
-                            year_range = (start_year, end_year)
-                        else:
-                            year = int(year_str)
-                            year_range = (year, year)
-                elif line.startswith('MOOD:'):
-                    mood = line.replace('MOOD:', '').strip().lower()
-            
-            logger.info(f"Parsed genres: {genres}, year range: {year_range}, mood: {mood}")
+            if intent is None:
+                intent = await self._parse_request(user_input)
             
             # Get recommendations based on the analysis
             try:
-                recommendations = []
-                
-                # If we have a mood, get movies for that mood
-                if mood and mood != 'any':
-                    # Use the mood-based recommendations method
-                    mood_movies = self.movie_recommender.get_recommendations(mood=mood)
-                    if mood_movies:
-                        recommendations.extend(mood_movies)
-                
-                # If we have specific genres, get movies for those genres
-                elif genres and genres[0] != 'any':
-                    for genre in genres:
-                        genre_movies = self.movie_recommender.get_recommendations(genre=genre)
-                        if genre_movies:
-                            recommendations.extend(genre_movies)
-                
-                # If no specific criteria, get popular movies
-                if not recommendations:
-                    recommendations = self.movie_recommender.get_popular_movies()
-                
-                # Filter by year if specified
-                if year_range and recommendations:
-                    recommendations = [
-                        movie for movie in recommendations
-                        if movie.get('release_date') and 
-                        year_range[0] <= int(movie['release_date'][:4]) <= year_range[1]
-                    ]
-                
-                if not recommendations:
-                    logger.warning("No recommendations found matching all criteria")
-                    popular_movies = self.movie_recommender.get_popular_movies()
-                    if popular_movies:
-                        popular_movies.insert(0, {
-                            "message": f"I couldn't find movies matching your specific criteria. Here are some popular movies you might enjoy."
-                        })
-                    return popular_movies
-                
-                # Add a message explaining the recommendation
-                message_parts = []
-                if genres and genres[0] != 'any':
-                    message_parts.append(f"{', '.join(g.title() for g in genres)} movies")
-                if year_range:
-                    if year_range[0] == year_range[1]:
-                        message_parts.append(f"from {year_range[0]}")
-                    else:
-                        message_parts.append(f"from {year_range[0]}-{year_range[1]}")
-                if mood and mood != 'any':
-                    message_parts.append(f"with a {mood} mood")
-                
-                message = f"Based on your request for '{user_input}', I've selected {', '.join(message_parts)} that might interest you."
-                recommendations.insert(0, {"message": message})
-                
-                return recommendations
-                
+                return await self._recommend(user_input, intent)
             except Exception as e:
                 logger.error(f"Error getting recommendations: {str(e)}")
-                popular_movies = self.movie_recommender.get_popular_movies()
+                popular_movies = await run_blocking(self.movie_recommender.get_popular_movies)
                 if popular_movies:
                     popular_movies.insert(0, {
                         "message": "I encountered an issue finding specific recommendations. Here are some popular movies you might enjoy."
@@ -165,55 +101,263 @@ class AIRecommender:
             
         except Exception as e:
             logger.error(f"Error in AI recommendation process: {str(e)}")
-            popular_movies = self.movie_recommender.get_popular_movies()
+            popular_movies = await run_blocking(self.movie_recommender.get_popular_movies)
             if popular_movies:
                 popular_movies.insert(0, {
                     "message": "I encountered an issue processing your request. Here are some popular movies you might enjoy."
                 })
             return popular_movies
     
-    def _process_ai_analysis(self, analysis: str) -> List[Dict[str, Any]]:
+    def _known_intent(self, user_input: str):
+        """
+        The intent of a request that needs no model: parsed locally or parsed before
+        """
+        # Plain requests ("80s action", "scary movies") are parsed locally, without the model
+        intent = self.intent_parser.parse(user_input)
+        if intent is not None:
+            logger.info(f"Fast-path parse for: {user_input} -> {intent}")
+            return intent
+        intent = self.intent_cache.get(user_input)
+        if intent is not None:
+            logger.info(f"Intent cache hit for: {user_input}")
+        return intent
+    
+    async def _parse_request(self, user_input: str) -> Dict[str, Any]:
+        """
+        Extract genres, year range and mood from a chat request with the model, caching the parse
+        """
+        prompt = f"""You are a movie recommendation expert. Based on the following user request, 
+        identify the key elements for movie recommendations. Respond in this exact format:
+        GENRES: [list of genres, separated by commas]
+        YEAR: [specific year or year range, or "any" if not specified]
+        MOOD: [mood if specified, or "any"]
+        
+        For example:
+        - For "horror comedy movies" -> GENRES: horror, comedy
+        - For "90s movies" -> YEAR: 1990-1999
+        - For "romantic comedies from 2000s" -> GENRES: romance, comedy, YEAR: 2000-2009
+        
+        User request: {user_input}"""
+        
+        logger.info(f"Processing user request: {user_input}")
+        response = await run_blocking(self.model.generate_content, prompt)
+        analysis = response.text.strip()
+        logger.info(f"AI analysis: {analysis}")
+        
+        intent = self._parse_analysis(analysis)
+        logger.info(f"Parsed genres: {intent['genres']}, year range: {intent['year_range']}, mood: {intent['mood']}")
+        self.intent_cache.set(user_input, intent)
+        return intent
+    
+    @staticmethod
+    def _parse_analysis(analysis: str) -> Dict[str, Any]:
+        """
+        Parse the GENRES/YEAR/MOOD lines of a model response
+        """
+        genres = []
+        year_range = None
+        mood = None
+        
+        for line in analysis.split('\n'):
+            if line.startswith('GENRES:'):
+                genres = [g.strip().lower() for g in line.replace('GENRES:', '').split(',')]
+            elif line.startswith('YEAR:'):
+                year_str = line.replace('YEAR:', '').strip()
+                if year_str != 'any':
+                    if '-' in year_str:
+                        start_year, end_year = map(int, year_str.split('-'))
+                        year_range = (start_year, end_year)
+                    else:
+                        year = int(year_str)
+                        year_range = (year, year)
+            elif line.startswith('MOOD:'):
+                mood = line.replace('MOOD:', '').strip().lower()
+        
+        return {'genres': genres, 'year_range': year_range, 'mood': mood}
+    
+    async def _recommend(self, user_input: str, intent: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Turn a parsed intent into recommendations, with an explanation message first
+        """
+        recommendations = []
+        seen_ids = set()
+        for movies in await asyncio.gather(*self._intent_lookups(intent)):
+            recommendations.extend(self._select(intent, movies, seen_ids))
+        
+        if not recommendations:
+            logger.warning("No recommendations found matching all criteria")
+            popular_movies = await run_blocking(self.movie_recommender.get_popular_movies)
+            if popular_movies:
+                popular_movies.insert(0, {"message": NO_MATCH_MESSAGE})
+            return popular_movies
+        
+        # Add a message explaining the recommendation
+        recommendations.insert(0, {"message": self._describe_intent(user_input, intent)})
+        
+        return recommendations
+    
+    def _intent_lookups(self, intent: Dict[str, Any]) -> List[Awaitable[List[Dict[str, Any]]]]:
+        """
+        The lookups an intent needs; both chat endpoints run exactly these
+        """
+        genres = intent['genres']
+        mood = intent['mood']
+        client = self.async_tmdb_client
+        
+        # If we have a mood, get movies for that mood
+        if mood and mood != 'any':
+            return [run_blocking(self.movie_recommender.get_recommendations, mood=mood)]
+        
+        # If we have specific genres, one lookup per genre, fetched side by side.
+        # Parsed genres are TMDB genre names, so they resolve through the client's
+        # full genre table; the year range is applied by TMDB, not after the fact.
+        genre_ids = [client.genre_mapping[genre] for genre in genres if genre in client.genre_mapping]
+        if genre_ids:
+            return [
+                client.get_movies_by_genres([genre_id], count=10, year_range=intent['year_range'])
+                for genre_id in genre_ids
+            ]
+        
+        # If no specific criteria, get popular movies
+        return [run_blocking(self.movie_recommender.get_popular_movies)]
+    
+    @staticmethod
+    def _select(intent: Dict[str, Any], movies: List[Dict[str, Any]], seen_ids: set) -> List[Dict[str, Any]]:
+        """
+        The movies of one lookup to recommend: not picked already and within the year range
+        """
+        year_range = intent['year_range']
+        selected = []
+        for movie in movies or []:
+            if movie['id'] in seen_ids:
+                continue
+            if year_range and not (
+                movie.get('release_date') and
+                year_range[0] <= int(movie['release_date'][:4]) <= year_range[1]
+            ):
+                continue
+            seen_ids.add(movie['id'])
+            selected.append(movie)
+        return selected
+    
+    @staticmethod
+    def _describe_intent(user_input: str, intent: Dict[str, Any]) -> str:
         """
-        Process the AI analysis to extract key preferences and get recommendations
+        The explanation message shown above chat recommendations
         """
+        genres = intent['genres']
+        year_range = intent['year_range']
+        mood = intent['mood']
+        
+        message_parts = []
+        if genres and genres[0] != 'any':
+            message_parts.append(f"{', '.join(g.title() for g in genres)} movies")
+        if year_range:
+            if year_range[0] == year_range[1]:
+                message_parts.append(f"from {year_range[0]}")
+            else:
+                message_parts.append(f"from {year_range[0]}-{year_range[1]}")
+        if mood and mood != 'any':
+            message_parts.append(f"with a {mood} mood")
+        
+        return f"Based on your request for '{user_input}', I've selected {', '.join(message_parts)} that might interest you."
+    
+    async def stream_chat_recommendations(self, user_input: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming get_chat_recommendations: yields a {'type': 'message'} event as soon as
+        the request is understood, then a {'type': 'movie'} event per movie as each TMDB
+        call returns, then {'type': 'done'}
+        """
+        intent = self._known_intent(user_input)
+        if intent is None and await self._wait_for_model():
+            try:
+                intent = await self._parse_request(user_input)
+            except Exception as e:
+                logger.error(f"Error in AI recommendation process: {str(e)}")
+        
+        count = 0
+        if intent is not None:
+            yield {'type': 'message', 'message': self._describe_intent(user_input, intent)}
+            try:
+                async for movie in self._stream_movies(intent):
+                    count += 1
+                    yield {'type': 'movie', 'movie': movie}
+            except Exception as e:
+                logger.error(f"Error streaming recommendations: {str(e)}")
+            if not count:
+                yield {'type': 'message', 'message': NO_MATCH_MESSAGE}
+        elif not self.model:
+            yield {'type': 'message', 'message': "AI service is currently unavailable. Here are some popular movies you might enjoy."}
+        else:
+            yield {'type': 'message', 'message': "I encountered an issue processing your request. Here are some popular movies you might enjoy."}
+        
+        if not count:
+            for movie in await run_blocking(self.movie_recommender.get_popular_movies):
+                count += 1
+                yield {'type': 'movie', 'movie': movie}
+        yield {'type': 'done', 'count': count}
+    
+    async def _stream_movies(self, intent: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield the movies _recommend picks, as each of its lookups completes
+        """
+        tasks = [asyncio.ensure_future(lookup) for lookup in self._intent_lookups(intent)]
+        seen_ids = set()
         try:
-            # Extract the primary genre/type from the analysis
-            prompt = f"""Based on this analysis, what is the SINGLE most relevant movie genre that would best match the user's preferences?
-            Choose from these exact genre names: Action, Adventure, Animation, Comedy, Crime, Documentary, 
-            Drama, Family, Fantasy, History, Horror, Music, Mystery, Romance, Science Fiction, TV Movie, 
-            Thriller, War, Western.
-            
-            Only respond with the genre name, nothing else.
-            
-            Analysis: {analysis}"""
-            
-            response = self.model.generate_content(prompt)
-            primary_genre = response.text.strip().lower()
+            for next_done in asyncio.as_completed(tasks):
+                for movie in self._select(intent, await next_done, seen_ids):
+                    yield movie
+        finally:
+            # The client went away or something failed: stop the remaining lookups
+            for task in tasks:
+                task.cancel()
+    
+    async def _process_ai_analysis(self, analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Get recommendations for a validated structured analysis (see models.analysis_schema)
+        """
+        try:
+            primary_genre = analysis['primary_genre']
+            year_range = analysis['year_range']
+            mood = analysis['mood']
             logger.info(f"Primary genre identified: {primary_genre}")
             
             try:
-                # Get recommendations based on the primary genre
-                recommendations = self.movie_recommender.get_recommendations(genre=primary_genre)
+                # The schema only allows TMDB genre names, so the primary genre
+                # resolves through the client's full genre table, with the year
+                # range applied by TMDB. A mood the recommender knows adds its
+                # movies alongside, held to the same years.
+                lookups = [self.async_tmdb_client.get_movies_by_genres(
+                    [self.async_tmdb_client.genre_mapping[primary_genre]], count=10, year_range=year_range
+                )]
+                if mood and (mood in self.movie_recommender.mood_genres or
+                             mood in self.movie_recommender.tmdb_client.mood_mapping):
+                    lookups.append(run_blocking(self.movie_recommender.get_recommendations, mood=mood))
+                
+                recommendations = []
+                seen_ids = set()
+                for movies in await asyncio.gather(*lookups):
+                    recommendations.extend(self._select({'year_range': year_range}, movies, seen_ids))
                 
                 if not recommendations or len(recommendations) == 0:
                     logger.warning(f"No recommendations found for genre: {primary_genre}")
-                    popular_movies = self.movie_recommender.get_popular_movies()
+                    popular_movies = await run_blocking(self.movie_recommender.get_popular_movies)
                     if popular_movies:
                         popular_movies.insert(0, {
                             "message": f"I couldn't find specific {primary_genre.title()} movies, but here are some popular movies you might enjoy."
                         })
                     return popular_movies
                 
-                # Add a message explaining the recommendation
+                # The model wrote the explanation in the same response as the genre
                 recommendations.insert(0, {
-                    "message": f"Based on your preferences, I've selected {primary_genre.title()} movies that might interest you."
+                    "message": analysis['explanation']
                 })
                 
                 return recommendations
                 
             except Exception as e:
                 logger.error(f"Error getting genre recommendations: {str(e)}")
-                popular_movies = self.movie_recommender.get_popular_movies()
+                popular_movies = await run_blocking(self.movie_recommender.get_popular_movies)
                 if popular_movies:
                     popular_movies.insert(0, {
                         "message": "I encountered an issue finding specific recommendations. Here are some popular movies you might enjoy."
@@ -222,13 +366,27 @@ class AIRecommender:
             
         except Exception as e:
             logger.error(f"Error in AI analysis process: {str(e)}")
-            popular_movies = self.movie_recommender.get_popular_movies()
+            popular_movies = await run_blocking(self.movie_recommender.get_popular_movies)
             if popular_movies:
                 popular_movies.insert(0, {
                     "message": "I encountered an issue processing your request. Here are some popular movies you might enjoy."
                 })
             return popular_movies
     
+    async def _generate_analysis(self, prompt: str) -> Dict[str, Any]:
+        """
+        One model round-trip returning the validated structured analysis (genres, years, mood, explanation)
+        """
+        model = await self._wait_for_model()
+        if model is None:
+            raise Exception("AI model not available")
+        response = await run_blocking(
+            model.generate_content, prompt, generation_config=ANALYSIS_GENERATION_CONFIG
+        )
+        analysis = parse_analysis(response.text)
+        logger.info(f"AI analysis: {analysis}")
+        return analysis
+    
     async def get_contextual_recommendations(
         self,
         context: Dict[str, Any]
@@ -236,7 +394,7 @@ class AIRecommender:
         """
         Get recommendations based on various contextual factors
         """
-        prompt = f"""Analyze the following context and provide movie recommendations:
+        prompt = build_analysis_prompt(f"""Analyze the following context and provide movie recommendations:
         - Time of day: {context.get('time_of_day')}
         - Weather: {context.get('weather')}
         - Season: {context.get('season')}
@@ -244,15 +402,14 @@ class AIRecommender:
         - Previous watch history: {context.get('watch_history')}
         
         Please provide recommendations that would be suitable for this context.
-        """
+        """)
         
         try:
-            response = self.model.generate_content(prompt)
-            return self._process_ai_analysis(response.text)
+            return await self._process_ai_analysis(await self._generate_analysis(prompt))
             
         except Exception as e:
             print(f"Error getting contextual recommendations: {str(e)}")
-            return self.movie_recommender.get_popular_movies()
+            return await run_blocking(self.movie_recommender.get_popular_movies)
     
     async def get_social_recommendations(
         self,
@@ -262,19 +419,18 @@ class AIRecommender:
         """
         Get recommendations based on social and cultural context
         """
-        prompt = f"""Based on the following social context, provide movie recommendations:
+        prompt = build_analysis_prompt(f"""Based on the following social context, provide movie recommendations:
         - User's cultural background: {social_context.get('cultural_background')}
         - User's interests: {social_context.get('interests')}
         - Trending in user's social circle: {social_context.get('trending')}
         - User's age group: {social_context.get('age_group')}
         
         Please provide recommendations that would be culturally relevant and socially engaging.
-        """
+        """)
         
         try:
-            response = self.model.generate_content(prompt)
-            return self._process_ai_analysis(response.text)
+            return await self._process_ai_analysis(await self._generate_analysis(prompt))
             
         except Exception as e:
             print(f"Error getting social recommendations: {str(e)}")
-            return self.movie_recommender.get_popular_movies() 
\ No newline at end of file
+            return await run_blocking(self.movie_recommender.get_popular_movies) 
\ No newline at end of file
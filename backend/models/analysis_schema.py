@@ -0,0 +1,96 @@
+import json
+import re
+
+# The genres TMDBClient.genre_mapping knows, as shown to the model
+GENRE_NAMES = [
+    'Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Documentary',
+    'Drama', 'Family', 'Fantasy', 'History', 'Horror', 'Music', 'Mystery',
+    'Romance', 'Science Fiction', 'TV Movie', 'Thriller', 'War', 'Western'
+]
+
+MAX_EXPLANATION_LENGTH = 400
+
+# Low temperature keeps the model on the schema; the SDK pinned here has no JSON mode
+ANALYSIS_GENERATION_CONFIG = {'temperature': 0.2}
+
+ANALYSIS_INSTRUCTIONS = f"""Respond with a single JSON object and nothing else, using exactly these keys:
+{{
+  "genres": [1 to 3 genre names],
+  "year_range": [start_year, end_year] or null,
+  "mood": a short mood word or null,
+  "primary_genre": the single best genre name,
+  "explanation": one or two sentences addressed to the user explaining the choice
+}}
+Genre names must be chosen from: {', '.join(GENRE_NAMES)}."""
+
+_GENRES = {name.lower(): name.lower() for name in GENRE_NAMES}
+
+
+class AnalysisError(ValueError):
+    """The model's response doesn't match the analysis schema"""
+
+
+def build_analysis_prompt(request):
+    """Append the JSON output contract to a task description"""
+    return f"{request.strip()}\n\n{ANALYSIS_INSTRUCTIONS}"
+
+
+def parse_analysis(text):
+    """Extract and validate the JSON object in a model response"""
+    # Models often wrap JSON in a ```json fence despite being asked not to
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if not match:
+        raise AnalysisError("No JSON object in model response")
+    try:
+        data = json.loads(match.group(0))
+    except ValueError as e:
+        raise AnalysisError(f"Invalid JSON in model response: {str(e)}")
+    return validate_analysis(data)
+
+
+def validate_analysis(data):
+    """Check ``data`` against the schema and return it normalized (lowercase genres, tuple years)"""
+    if not isinstance(data, dict):
+        raise AnalysisError("Analysis must be a JSON object")
+    missing = {'genres', 'year_range', 'mood', 'primary_genre', 'explanation'} - set(data)
+    if missing:
+        raise AnalysisError(f"Analysis is missing keys: {', '.join(sorted(missing))}")
+
+    genres = data['genres']
+    if not isinstance(genres, list) or not genres or not all(isinstance(g, str) for g in genres):
+        raise AnalysisError("genres must be a non-empty list of strings")
+    unknown = [g for g in genres if g.strip().lower() not in _GENRES]
+    if unknown:
+        raise AnalysisError(f"Unknown genres: {', '.join(unknown)}")
+    genres = list(dict.fromkeys(_GENRES[g.strip().lower()] for g in genres))[:3]
+
+    primary_genre = data['primary_genre']
+    if not isinstance(primary_genre, str) or primary_genre.strip().lower() not in _GENRES:
+        raise AnalysisError(f"Unknown primary_genre: {primary_genre}")
+    primary_genre = _GENRES[primary_genre.strip().lower()]
+
+    year_range = data['year_range']
+    if year_range is not None:
+        if (not isinstance(year_range, list) or len(year_range) != 2
+                or not all(isinstance(y, int) and not isinstance(y, bool) for y in year_range)
+                or not 1870 <= year_range[0] <= year_range[1] <= 2100):
+            raise AnalysisError(f"year_range must be [start_year, end_year] or null, got {year_range}")
+        year_range = (year_range[0], year_range[1])
+
+    mood = data['mood']
+    if mood is not None and not isinstance(mood, str):
+        raise AnalysisError("mood must be a string or null")
+    if mood is not None:
+        mood = mood.strip().lower() or None
+
+    explanation = data['explanation']
+    if not isinstance(explanation, str) or not explanation.strip():
+        raise AnalysisError("explanation must be a non-empty string")
+
+    return {
+        'genres': genres,
+        'year_range': year_range,
+        'mood': mood,
+        'primary_genre': primary_genre,
+        'explanation': explanation.strip()[:MAX_EXPLANATION_LENGTH]
+    }
@@ -0,0 +1,209 @@
+import json
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.lazy import lazy_import
+from utils.rate_limiter import priority_lane, BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+pd = lazy_import('pandas')
+
+IMAGE_BASE_URL = "https://image.tmdb.org/t/p/w500"
+
+# Listing endpoints paged through, in order, to collect candidate movie IDs
+DEFAULT_SOURCES = [
+    ('movie/popular', {}),
+    ('movie/top_rated', {}),
+    ('discover/movie', {'sort_by': 'vote_count.desc'})
+]
+
+# Fresh titles for incremental index updates (build_index.py --update)
+UPDATE_SOURCES = [
+    ('trending/movie/week', {}),
+    ('movie/now_playing', {}),
+    ('movie/upcoming', {})
+]
+
+# TMDB refuses pages beyond 500 on list endpoints
+MAX_PAGES = 500
+
+
+class CorpusIngestor:
+    """Build the recommender corpus from TMDB concurrently and resumably.
+
+    Candidate IDs are collected by paging through the listing sources until
+    enough new IDs are queued. Details and keywords come back in one call per
+    movie (``append_to_response=keywords``) and are fetched with at most
+    ``max_workers`` requests in flight. Every finished row is appended to a
+    JSONL checkpoint, so a failed run picks up where it stopped. Rows are
+    turned into DataFrame chunks as they arrive, not all at the end.
+    """
+
+    def __init__(self, tmdb_client, max_workers=8, checkpoint_path=None,
+                 sources=None, chunk_size=100, max_pages=MAX_PAGES):
+        self.tmdb_client = tmdb_client
+        self.max_workers = max_workers
+        self.checkpoint_path = checkpoint_path
+        self.sources = sources or DEFAULT_SOURCES
+        self.chunk_size = chunk_size
+        self.max_pages = min(max_pages, MAX_PAGES)
+        self.stats = {'pages': 0, 'fetched': 0, 'failed': 0, 'resumed': 0}
+        if checkpoint_path:
+            os.makedirs(os.path.dirname(os.path.abspath(checkpoint_path)), exist_ok=True)
+
+    def ingest(self, limit=1000, skip_ids=None):
+        """Return a frame with up to ``limit`` movies, resuming from the checkpoint.
+
+        IDs in ``skip_ids`` (e.g. movies already in the index) are never fetched.
+        """
+        rows = self._load_checkpoint()
+        done_ids = {row['id'] for row in rows}
+        self.stats['resumed'] = len(rows)
+        frames = [pd.DataFrame(rows)] if rows else []
+        if len(done_ids) >= limit:
+            return self._to_frame(frames, limit)
+
+        candidates = self._iter_candidate_ids(done_ids | set(skip_ids or ()))
+        chunk = []
+        backoff = 0
+        checkpoint = open(self.checkpoint_path, 'a') if self.checkpoint_path else None
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='corpus-ingest') as executor:
+                while len(done_ids) < limit:
+                    # Submit one bounded window of work at a time
+                    window = []
+                    for movie_id in candidates:
+                        window.append(movie_id)
+                        if len(window) >= min(self.max_workers * 2, limit - len(done_ids)):
+                            break
+                    if not window:
+                        logger.info("Corpus sources exhausted")
+                        break
+
+                    futures = {executor.submit(self._fetch_row, movie_id): movie_id for movie_id in window}
+                    failures = 0
+                    for future in as_completed(futures):
+                        row = future.result()
+                        if row is None:
+                            failures += 1
+                            continue
+                        if row['id'] in done_ids or len(done_ids) >= limit:
+                            continue
+                        done_ids.add(row['id'])
+                        chunk.append(row)
+                        if checkpoint:
+                            checkpoint.write(json.dumps(row) + '\n')
+                        if len(chunk) >= self.chunk_size:
+                            frames.append(pd.DataFrame(chunk))
+                            chunk = []
+                    if checkpoint:
+                        checkpoint.flush()
+
+                    self.stats['fetched'] = len(done_ids) - self.stats['resumed']
+                    self.stats['failed'] += failures
+                    logger.info(f"Corpus ingestion: {len(done_ids)}/{limit} movies")
+
+                    # Most failures are rate limiting; slow down until a window succeeds
+                    if failures > len(window) // 2:
+                        backoff = min(max(backoff * 2, 1), 30)
+                        logger.warning(f"{failures}/{len(window)} fetches failed, backing off {backoff}s")
+                        time.sleep(backoff)
+                    else:
+                        backoff = 0
+        finally:
+            if checkpoint:
+                checkpoint.close()
+
+        if chunk:
+            frames.append(pd.DataFrame(chunk))
+        return self._to_frame(frames, limit)
+
+    def _iter_candidate_ids(self, done_ids):
+        seen = set(done_ids)
+        for endpoint, params in self.sources:
+            page = 1
+            total_pages = 1
+            while page <= min(total_pages, self.max_pages):
+                page_params = dict(params)
+                page_params['page'] = page
+                # Ingestion only uses rate-limit capacity that user requests leave over
+                with priority_lane(BACKGROUND):
+                    data = self.tmdb_client._make_request(endpoint, page_params, use_cache=False)
+                self.stats['pages'] += 1
+                if not data or 'results' not in data:
+                    logger.error(f"Failed to fetch {endpoint} page {page}; moving to next source")
+                    break
+                total_pages = data.get('total_pages', page)
+                for movie in data['results']:
+                    if movie['id'] not in seen:
+                        seen.add(movie['id'])
+                        yield movie['id']
+                page += 1
+
+    def _fetch_row(self, movie_id):
+        try:
+            with priority_lane(BACKGROUND):
+                details = self.tmdb_client._make_request(
+                    f'movie/{movie_id}',
+                    {'append_to_response': 'keywords'},
+                    use_cache=False
+                )
+            if not details:
+                return None
+
+            genres = [g['name'] for g in details.get('genres', [])]
+            keyword_names = [k['name'] for k in details.get('keywords', {}).get('keywords', [])]
+            overview = details.get('overview') or ''
+
+            # Combine features for content-based filtering
+            features = ' '.join([
+                ' '.join(genres),
+                ' '.join(keyword_names),
+                overview
+            ])
+
+            poster_path = details.get('poster_path')
+            return {
+                'id': details['id'],
+                'title': details.get('title'),
+                'features': features,
+                'genres': genres,
+                'keywords': keyword_names,
+                'overview': overview,
+                'poster_path': f"{IMAGE_BASE_URL}{poster_path}" if poster_path else None,
+                'vote_average': details.get('vote_average', 0),
+                'release_date': details.get('release_date'),
+                'runtime': details.get('runtime') or 0
+            }
+        except Exception as e:
+            logger.error(f"Error fetching details for movie {movie_id}: {str(e)}")
+            return None
+
+    def _load_checkpoint(self):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return []
+        with open(self.checkpoint_path, 'rb+') as f:
+            data = f.read()
+            # A crash can leave a torn last line; cut it off so the next append
+            # starts on a line of its own. Everything before it is fine.
+            complete = data.rfind(b'\n') + 1
+            if complete < len(data):
+                logger.warning("Dropping torn last checkpoint line")
+                f.truncate(complete)
+        rows = []
+        for line in data[:complete].splitlines():
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                logger.warning("Skipping unreadable checkpoint line")
+        logger.info(f"Resuming corpus ingestion with {len(rows)} movies from {self.checkpoint_path}")
+        return rows
+
+    @staticmethod
+    def _to_frame(frames, limit):
+        if not frames:
+            return pd.DataFrame()
+        movies_df = pd.concat(frames, ignore_index=True)
+        return movies_df.drop_duplicates(subset='id').head(limit).reset_index(drop=True)
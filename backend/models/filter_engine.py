@@ -0,0 +1,95 @@
+from utils.lazy import lazy_import
+
+np = lazy_import('numpy')
+sparse = lazy_import('scipy.sparse')
+
+# Quiz runtime answers; each bucket becomes a precomputed boolean column
+RUNTIME_BUCKETS = {
+    'Short (< 90 min)': lambda runtime: runtime < 90,
+    'Medium (90-120 min)': lambda runtime: (runtime >= 90) & (runtime <= 120),
+    'Long (> 120 min)': lambda runtime: runtime > 120
+}
+
+
+class MovieFilterIndex:
+    """Columnar view of a movie frame for vectorised quiz filtering.
+
+    Genres become a dense multi-hot matrix (there are only ~20 of them),
+    keywords a sparse multi-hot CSC matrix, and runtime buckets boolean
+    columns; all names are lowercased once here rather than per request.
+    A filter is then a handful of boolean mask operations, and the result is
+    the top-k of ``vote_average`` under the mask, without copying the frame.
+    """
+
+    def __init__(self, movies_df):
+        n_rows = len(movies_df)
+        genre_lists = movies_df['genres'] if 'genres' in movies_df else [[]] * n_rows
+        keyword_lists = movies_df['keywords'] if 'keywords' in movies_df else [[]] * n_rows
+
+        self.genre_columns = {}
+        genre_rows, genre_cols = [], []
+        for row, genres in enumerate(genre_lists):
+            for genre in genres or []:
+                column = self.genre_columns.setdefault(genre.lower(), len(self.genre_columns))
+                genre_rows.append(row)
+                genre_cols.append(column)
+        self.genre_matrix = np.zeros((n_rows, len(self.genre_columns)), dtype=bool)
+        self.genre_matrix[genre_rows, genre_cols] = True
+
+        self.keyword_columns = {}
+        keyword_rows, keyword_cols = [], []
+        for row, keywords in enumerate(keyword_lists):
+            for keyword in keywords or []:
+                column = self.keyword_columns.setdefault(keyword.lower(), len(self.keyword_columns))
+                keyword_rows.append(row)
+                keyword_cols.append(column)
+        self.keyword_matrix = sparse.csc_matrix(
+            (np.ones(len(keyword_rows), dtype=bool), (keyword_rows, keyword_cols)),
+            shape=(n_rows, len(self.keyword_columns))
+        )
+
+        # Unknown runtimes stay NaN, which compares False, so they fall in no bucket
+        runtime = movies_df['runtime'].to_numpy(dtype=np.float64, na_value=np.nan) \
+            if 'runtime' in movies_df else np.full(n_rows, np.nan)
+        self.runtime_masks = {label: bucket(runtime) for label, bucket in RUNTIME_BUCKETS.items()}
+
+        self.vote_average = movies_df['vote_average'].fillna(0).to_numpy(dtype=np.float64) \
+            if 'vote_average' in movies_df else np.zeros(n_rows)
+        self.n_rows = n_rows
+
+    def genre_mask(self, genre):
+        column = self.genre_columns.get(genre.lower())
+        if column is None:
+            return np.zeros(self.n_rows, dtype=bool)
+        return self.genre_matrix[:, column]
+
+    def keyword_mask(self, terms):
+        """Rows having any of ``terms`` as a keyword"""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        indptr, indices = self.keyword_matrix.indptr, self.keyword_matrix.indices
+        for term in terms:
+            column = self.keyword_columns.get(term.lower())
+            if column is not None:
+                mask[indices[indptr[column]:indptr[column + 1]]] = True
+        return mask
+
+    def mask(self, genre=None, keyword_terms=None, runtime_bucket=None, base=None):
+        """AND together the requested filters (unknown runtime labels are ignored)"""
+        mask = np.ones(self.n_rows, dtype=bool) if base is None else base.copy()
+        if genre:
+            mask &= self.genre_mask(genre)
+        if keyword_terms:
+            mask &= self.keyword_mask(keyword_terms)
+        if runtime_bucket in self.runtime_masks:
+            mask &= self.runtime_masks[runtime_bucket]
+        return mask
+
+    def top_rated(self, mask, k):
+        """Row positions of the k highest vote_average rows under ``mask``, best first"""
+        candidates = np.flatnonzero(mask)
+        if len(candidates) > k:
+            votes = self.vote_average[candidates]
+            kth_best = -np.partition(-votes, k - 1)[k - 1]
+            candidates = candidates[votes >= kth_best]
+        # Ties keep frame order, like DataFrame.nlargest
+        return candidates[np.lexsort((candidates, -self.vote_average[candidates]))][:k]
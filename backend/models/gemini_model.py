@@ -0,0 +1,204 @@
+import asyncio
+import json
+import os
+import time
+import logging
+import threading
+from utils.lazy import lazy_import
+
+logger = logging.getLogger(__name__)
+
+genai = lazy_import('google.generativeai')
+
+PREFERRED_MODEL = 'models/gemini-1.5-flash'
+
+DEFAULT_MODEL_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'gemini_model.json')
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class GeminiModelLoader:
+    """Chooses the Gemini model without blocking worker startup.
+
+    ``GEMINI_MODEL`` pins the model and skips discovery altogether. Otherwise
+    the name chosen last time is read from a small JSON file
+    (``GEMINI_MODEL_CACHE_PATH``) and used straight away; only when there is
+    none, or it is older than ``GEMINI_MODEL_CACHE_TTL``, is
+    ``genai.list_models()`` called, in a background thread started by
+    ``start()`` or the first ``model`` access. ``model`` never
+    waits on the network: it is None until a model name is known, and the
+    SDK itself is only imported when the model is first used. A failed
+    discovery is retried on the next access after ``GEMINI_DISCOVERY_RETRY``
+    seconds. Discovery is restarted in a forked worker if the parent's
+    thread never finished.
+    """
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+        self.pinned_model = os.getenv('GEMINI_MODEL')
+        self.cache_path = os.getenv('GEMINI_MODEL_CACHE_PATH', DEFAULT_MODEL_CACHE_PATH)
+        self.cache_ttl = float(os.getenv('GEMINI_MODEL_CACHE_TTL', 7 * 24 * 3600))
+        self.retry_interval = float(os.getenv('GEMINI_DISCOVERY_RETRY', 60))
+        self.model_name = None
+        self.source = None
+        self.error = None
+        self._model = None
+        self._stale = False
+        self._failed_at = 0.0
+        self._ready = threading.Event()
+        self._waiters = []  # (loop, future) of coroutines in wait_async()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        if not api_key:
+            self._ready.set()
+            return
+        if self.pinned_model:
+            self._use(self.pinned_model, 'pinned')
+            return
+        cached = self._load_cached_name()
+        if cached:
+            name, discovered_at = cached
+            self._use(name, 'disk cache')
+            self._stale = time.time() - discovered_at > self.cache_ttl
+
+    def start(self):
+        """Begin background discovery if the model isn't known yet (or the cached name is stale)"""
+        if self.api_key and (self.model_name is None or self._stale):
+            self._start_discovery()
+
+    @property
+    def model(self):
+        """The GenerativeModel, or None while discovery is running or after it failed"""
+        self.start()
+        if self.model_name is None:
+            return None
+        model = self._model
+        if model is None:
+            with self._lock:
+                if self._model is None:
+                    genai.configure(api_key=self.api_key)  # Local only: no request is made here
+                    self._model = genai.GenerativeModel(self.model_name)
+                model = self._model
+        return model
+
+    @property
+    def is_available(self):
+        """True when a model is known or still being discovered"""
+        return bool(self.api_key) and (self.model_name is not None or self.error is None)
+
+    def wait(self, timeout):
+        """Block up to ``timeout`` seconds for discovery; return the model (or None)"""
+        if self.model is None and self.api_key:
+            self._ready.wait(timeout)
+        return self.model
+
+    async def wait_async(self, timeout):
+        """``wait`` for coroutines: awaits discovery on the loop instead of holding a thread"""
+        if self.model is None and self.api_key:
+            loop = asyncio.get_running_loop()
+            waiter = loop.create_future()
+            with self._lock:
+                ready = self._ready.is_set()
+                if not ready:
+                    self._waiters.append((loop, waiter))
+            if not ready:
+                try:
+                    await asyncio.wait_for(waiter, timeout)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    with self._lock:
+                        if (loop, waiter) in self._waiters:
+                            self._waiters.remove((loop, waiter))
+        return self.model
+
+    def _use(self, name, source):
+        with self._lock:
+            if name != self.model_name:
+                self._model = None  # Rebuilt from the new name on next use
+            self.model_name = name
+            self.source = source
+        logger.info(f"Using Gemini model {name} ({source})")
+
+    def _start_discovery(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self.model_name is not None and not self._stale:
+                return
+            if self.error is not None and time.time() - self._failed_at < self.retry_interval:
+                return
+            if self.model_name is None:
+                self._ready.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._discover, name='gemini-discovery', daemon=True)
+            self._thread.start()
+
+    def _discover(self):
+        try:
+            genai.configure(api_key=self.api_key)
+            models = genai.list_models()
+            available_models = [model.name for model in models]
+            logger.info(f"Available models: {available_models}")
+
+            model_name = PREFERRED_MODEL
+            if model_name not in available_models:
+                logger.warning(f"Recommended model {model_name} not found, using first available model")
+                model_name = available_models[0] if available_models else None
+                if not model_name:
+                    raise Exception("No available models found")
+
+            self._use(model_name, 'discovered')
+            self._stale = False
+            self.error = None
+            self._save_cached_name(model_name)
+        except Exception as e:
+            logger.error(f"Error discovering Gemini models: {str(e)}")
+            if self.model_name is None:
+                logger.error("AI features are disabled until discovery succeeds. Please check your GOOGLE_API_KEY")
+            self.error = str(e)
+            self._failed_at = time.time()
+        finally:
+            with self._lock:
+                self._ready.set()
+                waiters, self._waiters = self._waiters, []
+            for loop, waiter in waiters:
+                try:
+                    loop.call_soon_threadsafe(_wake, waiter)
+                except RuntimeError:
+                    pass  # That loop has been closed
+
+    def _load_cached_name(self):
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+            return data['model'], float(data['discovered_at'])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable Gemini model cache {self.cache_path}: {str(e)}")
+            return None
+
+    def _save_cached_name(self, name):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            # Write then rename so concurrent workers never read a partial file
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'model': name, 'discovered_at': time.time()}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not cache Gemini model name: {str(e)}")
+
+    def get_stats(self):
+        return {
+            'model': self.model_name,
+            'source': self.source,
+            'discovering': self._thread is not None and self._thread.is_alive(),
+            'error': self.error
+        }
@@ -0,0 +1,165 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from utils.lazy import lazy_import
+
+sklearn_text = lazy_import('sklearn.feature_extraction.text')
+sparse = lazy_import('scipy.sparse')
+
+# Words that don't change what a chat request asks for
+STOPWORDS = frozenset("""
+a about an and any are as at be best can could film films for from give good
+great i in is it like looking me movie movies my of on or please recommend
+recommendation recommendations show some something suggest thank thanks that
+the to want watch what with would you
+""".split())
+
+DECADE_WORDS = {
+    'twenties': '1920s', 'thirties': '1930s', 'forties': '1940s', 'fifties': '1950s',
+    'sixties': '1960s', 'seventies': '1970s', 'eighties': '1980s', 'nineties': '1990s'
+}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _stem(token):
+    """Crude plural folding: comedies -> comedy, thrillers -> thriller"""
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss') and not token[0].isdigit():
+        return token[:-1]
+    return token
+
+
+def _normalize_year(token):
+    """'90s' / '1990s' / 'nineties' -> '1990s'; other numbers pass through"""
+    if token in DECADE_WORDS:
+        return DECADE_WORDS[token]
+    match = re.fullmatch(r"(\d{2})s", token)
+    if match:
+        century = '20' if int(match.group(1)) < 30 else '19'
+        return f"{century}{match.group(1)}s"
+    return token
+
+
+def _same_words(key, candidate, min_ratio=0.8):
+    """True when each word pairs off with a cached word at most a typo away (numbers exactly)"""
+    words, remaining = key.split(), candidate.split()
+    if len(words) != len(remaining):
+        return False
+    for word in words:
+        for other in remaining:
+            if word == other or (
+                not word[0].isdigit() and not other[0].isdigit()
+                and SequenceMatcher(None, word, other).ratio() >= min_ratio
+            ):
+                remaining.remove(other)
+                break
+        else:
+            return False
+    return True
+
+
+def normalize_request(text):
+    """Order-insensitive canonical form of a chat request, e.g. '1990s comedy horror'"""
+    tokens = set()
+    for token in _TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.add(_stem(_normalize_year(token)))
+    return ' '.join(sorted(tokens))
+
+
+class IntentCache:
+    """TTL + LRU cache of parsed chat intents, keyed on the normalized request.
+
+    Requests that normalize identically ("90s horror comedies" and "horror
+    comedy from the 90s") share an entry. Otherwise cached keys close by
+    character n-gram cosine (HashingVectorizer, so nothing is fitted) are
+    candidates, and one is reused only if its words pair off one-to-one with
+    the request's, allowing typos but not extra words or different numbers:
+    "horor comedies 90s" matches, "funny horror comedies 90s" and "80s horror
+    comedies" do not.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, similarity=None):
+        self.max_entries = max_entries or int(os.getenv('INTENT_CACHE_MAX_ENTRIES', 1024))
+        self.ttl = ttl or float(os.getenv('INTENT_CACHE_TTL', 24 * 3600))
+        self.similarity = similarity or float(os.getenv('INTENT_CACHE_SIMILARITY', 0.6))
+        self._vectorizer = None  # Built on first use, which imports scikit-learn
+        self._entries = OrderedDict()  # key -> (intent, expires_at, vector)
+        self._matrix = None
+        self._matrix_keys = []
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'near_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, text):
+        """Return a cached intent for ``text`` (or a close paraphrase), else None"""
+        key = normalize_request(text)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[0]
+            if entry is not None:
+                self._remove(key)
+
+            match = self._nearest(key, now)
+            if match is not None:
+                self._entries.move_to_end(match)
+                self.stats['near_hits'] += 1
+                return self._entries[match][0]
+            self.stats['misses'] += 1
+            return None
+
+    def set(self, text, intent):
+        key = normalize_request(text)
+        vector = self.vectorizer.transform([key])
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (intent, time.time() + self.ttl, vector)
+            self._matrix = None
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+
+    @property
+    def vectorizer(self):
+        if self._vectorizer is None:
+            self._vectorizer = sklearn_text.HashingVectorizer(analyzer='char_wb', ngram_range=(3, 4), n_features=2 ** 16)
+        return self._vectorizer
+
+    def _remove(self, key):
+        del self._entries[key]
+        self._matrix = None
+
+    def _nearest(self, key, now):
+        if not key or not self._entries:
+            return None
+        if self._matrix is None:
+            self._matrix_keys = list(self._entries)
+            self._matrix = sparse.vstack([self._entries[k][2] for k in self._matrix_keys]).tocsr()
+        # Rows are L2-normalised, so the dot product is the cosine
+        scores = (self._matrix @ self.vectorizer.transform([key]).T).toarray().ravel()
+        for row in scores.argsort()[::-1][:8]:
+            if scores[row] < self.similarity:
+                break
+            candidate = self._matrix_keys[row]
+            if _same_words(key, candidate) and self._entries[candidate][1] > now:
+                return candidate
+        return None
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['near_hits'] + self.stats['misses']
+            return dict(
+                self.stats,
+                entries=len(self._entries),
+                hit_rate=(self.stats['hits'] + self.stats['near_hits']) / lookups if lookups else 0.0
+            )
@@ -0,0 +1,154 @@
+import re
+import threading
+from models.intent_cache import STOPWORDS, DECADE_WORDS, _stem
+
+# Extra ways of naming a TMDB genre (matched against stemmed or raw words)
+GENRE_SYNONYMS = {
+    'sci fi': ['science fiction'],
+    'scifi': ['science fiction'],
+    'rom com': ['romance', 'comedy'],
+    'romcom': ['romance', 'comedy'],
+    'romantic comedy': ['romance', 'comedy'],
+    'animated': ['animation'],
+    'cartoon': ['animation'],
+    'anime': ['animation'],
+    'doc': ['documentary'],
+    'docu': ['documentary'],
+    'musical': ['music'],
+    'kid': ['family'],
+    'children': ['family'],
+    'crime drama': ['crime', 'drama'],
+    'detective': ['crime', 'mystery'],
+    'whodunit': ['mystery'],
+    'cowboy': ['western'],
+    'superhero': ['action', 'adventure'],
+    'superheroes': ['action', 'adventure'],
+    'tv': ['tv movie']
+}
+
+# Extra ways of naming a mood from TMDBClient.mood_mapping
+MOOD_SYNONYMS = {
+    'feel good': 'feel-good',
+    'feelgood': 'feel-good',
+    'light hearted': 'lighthearted',
+    'thought provoking': 'thought-provoking',
+    'spooky': 'scary',
+    'creepy': 'scary',
+    'terrifying': 'scary',
+    'hilarious': 'funny',
+    'tearjerker': 'emotional',
+    'sad': 'emotional',
+    'mind bending': 'thought-provoking',
+    'cozy': 'relaxing',
+    'chill': 'relaxing',
+    'intense': 'suspenseful',
+    'epic': 'adventurous'
+}
+
+# Words that only glue the request together
+FILLER = STOPWORDS | frozenset("""
+all era decade year released made between until till through than
+new kind type genre
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_YEAR = re.compile(r"(19|20)\d\d")
+_DECADE = re.compile(r"(?:(19|20)?(\d)0)s")
+
+
+class IntentParser:
+    """Deterministic GENRES/YEAR/MOOD extraction for the common chat requests.
+
+    Tokens are matched (longest phrase first) against the genre and mood
+    tables and their synonyms, and years and decades ("1994", "80s",
+    "nineties", "1990-1995") become a year range. The result is only trusted
+    when every remaining word is filler; anything else ("movies like
+    Inception", "something my dad would enjoy") returns None and goes to
+    the model. Returns the same dict shape as the Gemini parse.
+    """
+
+    def __init__(self, genre_mapping, mood_mapping):
+        self.phrases = {}
+        for genre in genre_mapping:
+            self.phrases[tuple(_stem(word) for word in genre.split())] = ('genre', [genre])
+        for phrase, genres in GENRE_SYNONYMS.items():
+            self.phrases[tuple(phrase.split())] = ('genre', genres)
+        for mood in mood_mapping:
+            self.phrases[tuple(_stem(word) for word in mood.split('-'))] = ('mood', mood)
+        for phrase, mood in MOOD_SYNONYMS.items():
+            self.phrases[tuple(phrase.split())] = ('mood', mood)
+        self.max_phrase = max(len(phrase) for phrase in self.phrases)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'hits': 0}
+
+    def parse(self, text):
+        """Return {'genres', 'year_range', 'mood'} when confident, else None"""
+        intent = self._parse(text)
+        with self._lock:
+            self.stats['requests'] += 1
+            if intent is not None:
+                self.stats['hits'] += 1
+        return intent
+
+    def _parse(self, text):
+        tokens = _TOKEN.findall(text.lower())
+        genres = []
+        moods = []
+        years = []
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            year_range = self._year_range(token)
+            if year_range:
+                years.append(year_range)
+                i += 1
+                continue
+
+            words = tokens[i:i + self.max_phrase]
+            stems = [_stem(t) for t in words]
+            for size in range(len(stems), 0, -1):
+                match = self.phrases.get(tuple(stems[:size])) or self.phrases.get(tuple(words[:size]))
+                if match:
+                    kind, value = match
+                    if kind == 'genre':
+                        genres.extend(g for g in value if g not in genres)
+                    elif value not in moods:
+                        moods.append(value)
+                    i += size
+                    break
+            else:
+                if token not in FILLER and _stem(token) not in FILLER:
+                    return None  # A word we don't understand: let the model decide
+                i += 1
+
+        if len(moods) > 1 or len(years) > 2 or not (genres or moods or years):
+            return None
+        if len(years) == 2:
+            # "1990-1995", "between 1990 and 1995"; two decades mean the span of both
+            year_range = (min(years[0][0], years[1][0]), max(years[0][1], years[1][1]))
+        else:
+            year_range = years[0] if years else None
+
+        return {
+            'genres': genres,
+            'year_range': year_range,
+            'mood': moods[0] if moods else None
+        }
+
+    @staticmethod
+    def _year_range(token):
+        if token in DECADE_WORDS:
+            token = DECADE_WORDS[token]
+        if _YEAR.fullmatch(token):
+            return (int(token), int(token))
+        match = _DECADE.fullmatch(token)
+        if match:
+            century = match.group(1) or ('20' if match.group(2) in '012' else '19')
+            start = int(f"{century}{match.group(2)}0")
+            return (start, start + 9)
+        return None
+
+    def get_stats(self):
+        with self._lock:
+            requests = self.stats['requests']
+            return dict(self.stats, hit_rate=self.stats['hits'] / requests if requests else 0.0)
@@ -28,12 +28,9 @@ class MovieRecommender:
                 if not mood_genres:
                     logger.warning(f"Invalid mood: {mood}")
                     return []
-                # Get movies for each genre in the mood and combine them
-                all_movies = []
-                for genre_id in mood_genres:
-                    movies = self.tmdb_client.get_movies_by_genre(genre_id)
-                    all_movies.extend(movies)
-                return all_movies
+                # One OR-ed discover query for all of the mood's genres, paging
+                # only as far as the previous per-genre calls would have returned
+                return self.tmdb_client.get_movies_by_genres(mood_genres, count=10 * len(mood_genres))
             elif year:
                 return self.tmdb_client.get_movies_by_year(year)
             else:
@@ -1,24 +1,70 @@
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import pandas as pd
-from tmdbv3api import TMDb, Movie, Keyword
 import os
+import threading
+import time
 from dotenv import load_dotenv
 from utils.tmdb_client import TMDBClient
+from models.tfidf_index import TfidfIndex, get_index_path
+from models.corpus_ingest import CorpusIngestor
 
 load_dotenv()
 
+# One recommender per worker process; see get_recommender()
+_shared_recommender = None
+_shared_lock = threading.Lock()
+_construction_stats = {
+    'requests': 0,
+    'instances_created': 0,
+    'total_seconds': 0.0,
+    'last_seconds': 0.0,
+    'max_seconds': 0.0
+}
+
+
+def get_recommender(tmdb_client):
+    """Return the process-wide MovieRecommender, building it on first use.
+
+    Also records how long each caller spent obtaining the recommender, so the
+    per-request construction overhead shows up in /api/metrics.
+    """
+    global _shared_recommender
+    start = time.perf_counter()
+    recommender = _shared_recommender
+    if recommender is None:
+        with _shared_lock:
+            if _shared_recommender is None:
+                _shared_recommender = MovieRecommender(tmdb_client)
+                _construction_stats['instances_created'] += 1
+            recommender = _shared_recommender
+    
+    elapsed = time.perf_counter() - start
+    with _shared_lock:
+        _construction_stats['requests'] += 1
+        _construction_stats['total_seconds'] += elapsed
+        _construction_stats['last_seconds'] = elapsed
+        _construction_stats['max_seconds'] = max(_construction_stats['max_seconds'], elapsed)
+    return recommender
+
+
+def get_construction_stats():
+    """Return recommender construction-time counters for this process"""
+    with _shared_lock:
+        stats = dict(_construction_stats)
+    stats['avg_seconds'] = stats['total_seconds'] / stats['requests'] if stats['requests'] else 0.0
+    return stats
+
+
 class MovieRecommender:
     def __init__(self, tmdb_client):
         self.tmdb_client = tmdb_client
-        self.tmdb = TMDb()
-        self.tmdb.api_key = os.getenv('TMDB_API_KEY')
-        self.movie_api = Movie()
-        self.keyword_api = Keyword()
         self.movies_df = None
         self.tfidf_matrix = None
         self.vectorizer = None
+        self.index = None
+        self.index_path = get_index_path()
+        self.index_reload_interval = float(os.getenv('RECOMMENDER_INDEX_RELOAD_INTERVAL', 60))
+        self._index_mtime = None
+        self._index_checked_at = 0.0
+        self._prepare_lock = threading.Lock()
         
         self.mood_keywords = {
             'happy': ['comedy', 'feel-good', 'uplifting', 'family', 'adventure'],
@@ -40,64 +86,89 @@ class MovieRecommender:
             'thriller': 53
         }
         
-    def fetch_movie_data(self, limit=1000):
-        """Fetch movie data from TMDB and prepare it for recommendations"""
-        movies = []
+        # Map mood to TMDB genre IDs (the cache warmer keeps these discover queries fresh)
+        self.mood_genres = {
+            'happy': [35, 10751],  # Comedy, Family
+            'sad': [18, 10749],    # Drama, Romance
+            'excited': [28, 12],   # Action, Adventure
+            'romantic': [10749, 35], # Romance, Comedy
+            'scared': [27, 53],    # Horror, Thriller
+            'inspired': [18, 99],  # Drama, Documentary
+            'relaxed': [35, 16]    # Comedy, Animation
+        }
         
-        # Fetch popular movies
-        popular_movies = self.movie_api.popular()
-        for movie in popular_movies:
-            try:
-                # Get detailed movie info
-                details = self.movie_api.details(movie.id)
-                
-                # Get keywords
-                keywords = self.movie_api.keywords(movie.id)
-                keyword_names = [k.name for k in keywords.keywords]
-                
-                # Combine features for content-based filtering
-                features = ' '.join([
-                    ' '.join([g.name for g in details.genres]),
-                    ' '.join(keyword_names),
-                    details.overview
-                ])
-                
-                movies.append({
-                    'id': movie.id,
-                    'title': movie.title,
-                    'features': features,
-                    'genres': [g.name for g in details.genres],
-                    'keywords': keyword_names,
-                    'overview': details.overview,
-                    'poster_path': f"https://image.tmdb.org/t/p/w500{movie.poster_path}" if movie.poster_path else None,
-                    'vote_average': movie.vote_average,
-                    'release_date': movie.release_date,
-                    'runtime': details.runtime
-                })
-            except Exception as e:
-                print(f"Error fetching details for movie {movie.id}: {str(e)}")
-                continue
-                
-            if len(movies) >= limit:
-                break
-                
-        self.movies_df = pd.DataFrame(movies)
+        # The prebuilt index (and numpy/pandas/scikit-learn with it) is loaded by the
+        # first TF-IDF request, or up front by app.py when PRELOAD_HEAVY_MODULES is set
+        
+    def load_index(self, path=None):
+        """Load the persisted TF-IDF index (see build_index.py); returns True on success"""
+        path = path or self.index_path
+        if not TfidfIndex.exists(path):
+            print(f"No prebuilt TF-IDF index at {path}; it will be fitted on first use")
+            return False
+        try:
+            mtime = os.path.getmtime(os.path.join(path, 'meta.json'))
+            self._use_index(TfidfIndex.load(path))
+            self._index_mtime = mtime
+            return True
+        except Exception as e:
+            print(f"Error loading TF-IDF index from {path}: {str(e)}")
+            return False
+        
+    def maybe_reload_index(self):
+        """Pick up an index rewritten by build_index.py --update (checked at most once per interval)"""
+        now = time.time()
+        if now - self._index_checked_at < self.index_reload_interval:
+            return
+        self._index_checked_at = now
+        try:
+            mtime = os.path.getmtime(os.path.join(self.index_path, 'meta.json'))
+        except OSError:
+            return
+        if mtime != self._index_mtime:
+            with self._prepare_lock:
+                if mtime != self._index_mtime:
+                    print(f"TF-IDF index on disk changed; reloading from {self.index_path}")
+                    self.load_index()
+        
+    def _use_index(self, index):
+        self.index = index
+        self.movies_df = index.movies_df
+        self.vectorizer = index.vectorizer
+        self.tfidf_matrix = index.matrix
+        
+    def fetch_movie_data(self, limit=1000, checkpoint_path=None, max_workers=None):
+        """Fetch movie data from TMDB and prepare it for recommendations.
+
+        Pages through popular, top-rated and discover listings and fetches
+        details + keywords concurrently; see CorpusIngestor.
+        """
+        ingestor = CorpusIngestor(
+            self.tmdb_client,
+            max_workers=max_workers or int(os.getenv('CORPUS_INGEST_WORKERS', 8)),
+            checkpoint_path=checkpoint_path
+        )
+        self.movies_df = ingestor.ingest(limit=limit)
+        print(f"Fetched {len(self.movies_df)} movies for the corpus: {ingestor.stats}")
         return self.movies_df
         
     def prepare_recommender(self):
-        """Prepare the TF-IDF matrix for recommendations"""
-        if self.movies_df is None:
-            self.fetch_movie_data()
+        """Prepare the TF-IDF matrix for recommendations (once per process).
+
+        Normally this just loads the prebuilt index; fitting here is only a
+        fallback for when build_index.py hasn't been run.
+        """
+        with self._prepare_lock:
+            if self.tfidf_matrix is not None:
+                return
             
-        # Create TF-IDF vectorizer
-        self.vectorizer = TfidfVectorizer(
-            stop_words='english',
-            max_features=5000,
-            ngram_range=(1, 2)
-        )
-        
-        # Create TF-IDF matrix
-        self.tfidf_matrix = self.vectorizer.fit_transform(self.movies_df['features'])
+            if self.load_index():
+                return
+            
+            if self.movies_df is None:
+                self.fetch_movie_data()
+            
+            self._use_index(TfidfIndex.build(self.movies_df))
         
     def get_recommendations(self, movie_id=None, mood=None, genre=None):
         """Get movie recommendations based on movie ID, mood, or genre."""
@@ -106,28 +177,15 @@ class MovieRecommender:
                 return self.tmdb_client.get_similar_movies(movie_id)
             elif mood:
                 # Get mood-based recommendations
-                mood_genres = {
-                    'happy': [35, 10751],  # Comedy, Family
-                    'sad': [18, 10749],    # Drama, Romance
-                    'excited': [28, 12],   # Action, Adventure
-                    'romantic': [10749, 35], # Romance, Comedy
-                    'scared': [27, 53],    # Horror, Thriller
-                    'inspired': [18, 99],  # Drama, Documentary
-                    'relaxed': [35, 16]    # Comedy, Animation
-                }
-                
-                if mood not in mood_genres:
+                # Fall back to the client's wider mood table (e.g. 'scary', 'feel-good')
+                genre_ids = self.mood_genres.get(mood) or self.tmdb_client.mood_mapping.get(mood)
+                if not genre_ids:
                     return self.tmdb_client.get_popular_movies()
                 
-                movies = []
-                for genre_id in mood_genres[mood]:
-                    genre_movies = self.tmdb_client.get_movies_by_genre(genre_id)
-                    movies.extend(genre_movies)
-                
-                # Remove duplicates and sort by popularity
-                unique_movies = {movie['id']: movie for movie in movies}.values()
-                sorted_movies = sorted(unique_movies, key=lambda x: x.get('vote_average', 0), reverse=True)
-                return list(sorted_movies)[:10]
+                # One OR-ed discover query covers every genre of the mood
+                movies = self.tmdb_client.get_movies_by_genres(genre_ids, count=20)
+                sorted_movies = sorted(movies, key=lambda x: x.get('vote_average', 0), reverse=True)
+                return sorted_movies[:10]
                 
             elif genre:
                 # Get genre-based recommendations
@@ -166,28 +224,11 @@ class MovieRecommender:
             if mood not in self.mood_keywords:
                 return self._get_popular_movies()
 
-            # Map mood to TMDB genre IDs
-            mood_genres = {
-                'happy': [35, 10751],  # Comedy, Family
-                'sad': [18, 10749],    # Drama, Romance
-                'excited': [28, 12],   # Action, Adventure
-                'romantic': [10749, 35], # Romance, Comedy
-                'scared': [27, 53],    # Horror, Thriller
-                'inspired': [18, 99],  # Drama, Documentary
-                'relaxed': [35, 16]    # Comedy, Animation
-            }
-
-            # Get movies using TMDB discover API
-            movies = []
-            for genre_id in mood_genres.get(mood, []):
-                genre_movies = self.tmdb_client.get_movies_by_genre(genre_id)
-                movies.extend(genre_movies)
-
-            # Remove duplicates and sort by popularity
-            unique_movies = {movie['id']: movie for movie in movies}.values()
-            sorted_movies = sorted(unique_movies, key=lambda x: x.get('vote_average', 0), reverse=True)
+            # Get movies using a single OR-ed TMDB discover query
+            movies = self.tmdb_client.get_movies_by_genres(self.mood_genres.get(mood, []), count=20)
+            sorted_movies = sorted(movies, key=lambda x: x.get('vote_average', 0), reverse=True)
 
-            return list(sorted_movies)[:10]  # Return top 10 mood-based movies
+            return sorted_movies[:10]  # Return top 10 mood-based movies
         except Exception as e:
             print(f"Error in mood-based recommendations: {str(e)}")
             return self._get_popular_movies()
@@ -216,9 +257,15 @@ class MovieRecommender:
         
     def get_mood_recommendations(self, mood, n_recommendations=5):
         """Get movie recommendations based on mood"""
+        return self.get_mood_recommendations_batch([mood], n_recommendations)[mood]
+        
+    def get_mood_recommendations_batch(self, moods, n_recommendations=5):
+        """Get recommendations for several moods with a single similarity product"""
         if self.tfidf_matrix is None:
             self.prepare_recommender()
-            
+        self.maybe_reload_index()
+        index = self.index
+        
         # Mood to keyword mapping
         mood_keywords = {
             'happy': ['comedy', 'feel-good', 'uplifting', 'funny', 'light-hearted'],
@@ -228,46 +275,28 @@ class MovieRecommender:
             'scared': ['horror', 'scary', 'frightening', 'terrifying', 'suspense']
         }
         
-        if mood not in mood_keywords:
-            return []
+        results = {mood: [] for mood in moods}
+        known_moods = [mood for mood in results if mood in mood_keywords]
+        if not known_moods:
+            return results
             
-        # Create a query string from mood keywords
-        query = ' '.join(mood_keywords[mood])
-        
-        # Transform query to TF-IDF
-        query_vector = self.vectorizer.transform([query])
-        
-        # Calculate similarity scores
-        similarity_scores = cosine_similarity(
-            query_vector,
-            self.tfidf_matrix
-        ).flatten()
+        # Create a query string from mood keywords; one similarity product for all moods
+        queries = [' '.join(mood_keywords[mood]) for mood in known_moods]
         
-        # Get indices of most similar movies
-        similar_indices = similarity_scores.argsort()[::-1][:n_recommendations]
+        for mood, (rows, scores) in zip(known_moods, index.top_k(queries, k=n_recommendations)):
+            results[mood] = index.movies_df.iloc[rows].to_dict('records')
         
-        # Get recommended movies
-        recommendations = self.movies_df.iloc[similar_indices].to_dict('records')
-        
-        return recommendations
+        return results
         
     def get_quiz_recommendations(self, preferences, n_recommendations=5):
         """Get movie recommendations based on quiz answers"""
         if self.tfidf_matrix is None:
             self.prepare_recommender()
-            
-        # Filter movies based on preferences
-        filtered_movies = self.movies_df.copy()
+        self.maybe_reload_index()
+        index = self.index
         
-        # Filter by genre
-        if preferences.get('genre'):
-            filtered_movies = filtered_movies[
-                filtered_movies['genres'].apply(
-                    lambda x: preferences['genre'].lower() in [g.lower() for g in x]
-                )
-            ]
-            
         # Filter by mood
+        mood_terms = None
         if preferences.get('mood'):
             mood_keywords = {
                 'happy': ['comedy', 'feel-good', 'uplifting'],
@@ -276,33 +305,23 @@ class MovieRecommender:
                 'relaxed': ['comedy', 'drama', 'feel-good'],
                 'thrilled': ['action', 'thriller', 'suspense']
             }
-            
-            if preferences['mood'] in mood_keywords:
-                mood_terms = mood_keywords[preferences['mood']]
-                filtered_movies = filtered_movies[
-                    filtered_movies['keywords'].apply(
-                        lambda x: any(term in [k.lower() for k in x] for term in mood_terms)
-                    )
-                ]
-                
-        # Filter by length
-        if preferences.get('length'):
-            if preferences['length'] == 'Short (< 90 min)':
-                filtered_movies = filtered_movies[filtered_movies['runtime'] < 90]
-            elif preferences['length'] == 'Medium (90-120 min)':
-                filtered_movies = filtered_movies[
-                    (filtered_movies['runtime'] >= 90) & 
-                    (filtered_movies['runtime'] <= 120)
-                ]
-            elif preferences['length'] == 'Long (> 120 min)':
-                filtered_movies = filtered_movies[filtered_movies['runtime'] > 120]
+            mood_terms = mood_keywords.get(preferences['mood'])
+        
+        # Genre, mood keywords and length are precomputed boolean columns
+        mask = index.filters.mask(
+            genre=preferences.get('genre'),
+            keyword_terms=mood_terms,
+            runtime_bucket=preferences.get('length'),
+            base=index.active
+        )
                 
         # If no movies match the filters, return popular movies
-        if len(filtered_movies) == 0:
-            return self.movies_df.nlargest(n_recommendations, 'vote_average').to_dict('records')
+        if not mask.any():
+            mask = index.active
             
         # Sort by rating and get top recommendations
-        recommendations = filtered_movies.nlargest(n_recommendations, 'vote_average').to_dict('records')
+        rows = index.filters.top_rated(mask, n_recommendations)
+        recommendations = index.movies_df.iloc[rows].to_dict('records')
         
         return recommendations
 
@@ -0,0 +1,320 @@
+import json
+import os
+import shutil
+import threading
+import time
+import logging
+from models.filter_engine import MovieFilterIndex
+from utils.lazy import lazy_import
+
+# Imported on first use so workers that never touch the index boot without them
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+sparse = lazy_import('scipy.sparse')
+sklearn_text = lazy_import('sklearn.feature_extraction.text')
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 1
+
+DEFAULT_INDEX_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'index', 'tfidf'
+)
+
+VECTORIZER_PARAMS = {
+    'stop_words': 'english',
+    'max_features': 5000,
+    'ngram_range': (1, 2)
+}
+
+
+# Above this many rows top_k() defaults to the approximate (pruned postings) path
+APPROX_THRESHOLD = int(os.getenv('RECOMMENDER_APPROX_THRESHOLD', 50000))
+
+# Postings kept per term by the approximate path, highest weights first
+APPROX_POSTINGS_PER_TERM = int(os.getenv('RECOMMENDER_APPROX_POSTINGS', 2000))
+
+
+def get_index_path():
+    """Location of the persisted index (RECOMMENDER_INDEX_PATH overrides the default)"""
+    return os.getenv('RECOMMENDER_INDEX_PATH', DEFAULT_INDEX_PATH)
+
+
+class TfidfIndex:
+    """Fitted TF-IDF vocabulary, document matrix and movie metadata.
+
+    On disk the index is a directory of plain files:
+
+    - meta.json          format version, build time, shape, vectorizer params
+    - vocabulary.json    term -> column
+    - idf.npy            inverse document frequencies
+    - data.npy, indices.npy, indptr.npy   CSR arrays of the TF-IDF matrix
+    - movies.pkl         metadata frame, one row per matrix row
+
+    The CSR arrays are loaded with ``mmap_mode='r'``, so loading takes
+    milliseconds and every worker on the host shares the same page-cache pages.
+
+    Between full rebuilds the index can be updated incrementally: new rows are
+    transformed with the frozen vocabulary and idf and appended, and removed
+    or replaced rows are tombstoned in ``active``. compact() drops tombstones
+    and, once enough rows were appended since the last fit, refits so new
+    terms enter the vocabulary. Updates mutate the index in place, so they
+    run on a private copy (build_index.py --update); workers pick up the
+    saved result via MovieRecommender.maybe_reload_index().
+    """
+
+    def __init__(self, vectorizer, matrix, movies_df, built_at=None, active=None,
+                 appended_since_fit=0):
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+        self.movies_df = movies_df
+        self.built_at = built_at or time.time()
+        self.active = active if active is not None else np.ones(matrix.shape[0], dtype=bool)
+        self.appended_since_fit = appended_since_fit
+        self._row_by_id = {int(movie_id): row for row, movie_id in enumerate(movies_df['id'])} \
+            if 'id' in movies_df else {}
+        self._pruned_postings = None
+        self._pruned_lock = threading.Lock()
+        # Multi-hot genre/keyword columns for the quiz filters
+        self.filters = MovieFilterIndex(movies_df)
+
+    @property
+    def live_count(self):
+        return int(self.active.sum())
+
+    def top_k(self, queries, k=5, approximate=None):
+        """Return the k best rows for each query text as a list of (rows, scores).
+
+        Rows of the matrix and the transformed queries are both L2-normalised
+        by the vectorizer, so a sparse dot product is the cosine similarity.
+        All queries are scored with one matrix product, then each result row
+        is narrowed with argpartition and only the k survivors are sorted.
+
+        ``approximate`` scores only candidates reachable through each query
+        term's highest-weighted postings (see _get_pruned_postings), which
+        bounds the work per query on very large corpora. By default it is
+        used once the index has more than APPROX_THRESHOLD rows.
+        """
+        query_matrix = self.vectorizer.transform(queries)
+        k = min(k, self.live_count)
+        if k <= 0:
+            return [(np.array([], dtype=np.int64), np.array([], dtype=np.float32)) for _ in queries]
+        if approximate is None:
+            approximate = self.matrix.shape[0] > APPROX_THRESHOLD
+        if approximate:
+            return [self._top_k_approximate(query_matrix[i], k) for i in range(query_matrix.shape[0])]
+
+        scores = (query_matrix @ self.matrix.T).toarray()
+        scores[:, ~self.active] = -np.inf
+        return [self._select_top_k(row_scores, k) for row_scores in scores]
+
+    @staticmethod
+    def _select_top_k(scores, k, rows=None):
+        if len(scores) > k:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(len(scores))
+        order = candidates[np.argsort(-scores[candidates], kind='stable')]
+        selected = order if rows is None else rows[order]
+        return selected, scores[order]
+
+    def _top_k_approximate(self, query_vector, k):
+        postings = self._get_pruned_postings()
+        terms = query_vector.indices
+        candidates = np.unique(postings[:, terms].indices) if len(terms) else np.array([], dtype=np.int64)
+        candidates = candidates[self.active[candidates]]
+        if len(candidates) < k:
+            # Too few candidates to fill k results; fall back to an exact scan
+            scores = (query_vector @ self.matrix.T).toarray().ravel()
+            scores[~self.active] = -np.inf
+            return self._select_top_k(scores, k)
+        scores = (query_vector @ self.matrix[candidates].T).toarray().ravel()
+        return self._select_top_k(scores, k, rows=candidates)
+
+    def _get_pruned_postings(self):
+        """Per-term posting lists truncated to the highest weights, built once"""
+        if self._pruned_postings is None:
+            with self._pruned_lock:
+                if self._pruned_postings is None:
+                    csc = self.matrix.tocsc()
+                    keep = np.zeros(csc.nnz, dtype=bool)
+                    for term in range(csc.shape[1]):
+                        start, end = csc.indptr[term], csc.indptr[term + 1]
+                        if end - start <= APPROX_POSTINGS_PER_TERM:
+                            keep[start:end] = True
+                        else:
+                            top = np.argpartition(-csc.data[start:end], APPROX_POSTINGS_PER_TERM - 1)
+                            keep[start + top[:APPROX_POSTINGS_PER_TERM]] = True
+                    pruned = csc.copy()
+                    pruned.data = np.where(keep, pruned.data, 0).astype(pruned.data.dtype)
+                    pruned.eliminate_zeros()
+                    self._pruned_postings = pruned
+        return self._pruned_postings
+
+    def add_movies(self, new_movies_df):
+        """Append (or replace) movies using the frozen vocabulary; no refit"""
+        if new_movies_df is None or new_movies_df.empty:
+            return 0
+        new_movies_df = new_movies_df.drop_duplicates(subset='id', keep='last').reset_index(drop=True)
+        # Updating a movie = tombstone the old row and append the new one
+        self.remove_movies(new_movies_df['id'])
+
+        rows = self.vectorizer.transform(new_movies_df['features']).astype(np.float32).tocsr()
+        start = self.matrix.shape[0]
+        self.matrix = sparse.vstack([self.matrix, rows], format='csr')
+        self.movies_df = pd.concat([self.movies_df, new_movies_df], ignore_index=True)
+        self.active = np.concatenate([self.active, np.ones(len(new_movies_df), dtype=bool)])
+        for offset, movie_id in enumerate(new_movies_df['id']):
+            self._row_by_id[int(movie_id)] = start + offset
+        self.appended_since_fit += len(new_movies_df)
+        self._pruned_postings = None
+        self.filters = MovieFilterIndex(self.movies_df)
+        logger.info(f"Appended {len(new_movies_df)} movies to TF-IDF index ({self.live_count} live)")
+        return len(new_movies_df)
+
+    def remove_movies(self, movie_ids):
+        """Tombstone movies by TMDB ID; returns how many were live"""
+        removed = 0
+        for movie_id in movie_ids:
+            row = self._row_by_id.pop(int(movie_id), None)
+            if row is not None and self.active[row]:
+                self.active[row] = False
+                removed += 1
+        return removed
+
+    def needs_compaction(self, max_dead_ratio=0.2, max_appended_ratio=0.25):
+        """True once tombstones or frozen-vocabulary appends make up too much of the index"""
+        total = self.matrix.shape[0]
+        if total == 0:
+            return False
+        dead_ratio = 1 - self.live_count / total
+        appended_ratio = self.appended_since_fit / max(self.live_count, 1)
+        return dead_ratio > max_dead_ratio or appended_ratio > max_appended_ratio
+
+    def compact(self, refit=None):
+        """Drop tombstoned rows; refit the vocabulary when appends have piled up.
+
+        ``refit=None`` refits only if appended rows exceed the threshold in
+        needs_compaction(); pass True/False to force either way.
+        """
+        keep = np.flatnonzero(self.active)
+        movies_df = self.movies_df.iloc[keep].reset_index(drop=True)
+        if refit is None:
+            refit = self.appended_since_fit / max(len(keep), 1) > 0.25
+        if refit:
+            rebuilt = TfidfIndex.build(movies_df)
+            self.vectorizer = rebuilt.vectorizer
+            self.matrix = rebuilt.matrix
+            self.appended_since_fit = 0
+            self.built_at = rebuilt.built_at
+        else:
+            self.matrix = self.matrix[keep].tocsr()
+        self.movies_df = movies_df
+        self.active = np.ones(len(keep), dtype=bool)
+        self._row_by_id = {int(movie_id): row for row, movie_id in enumerate(movies_df['id'])}
+        self._pruned_postings = None
+        self.filters = MovieFilterIndex(movies_df)
+        logger.info(f"Compacted TF-IDF index to {len(keep)} movies (refit={refit})")
+
+    @classmethod
+    def build(cls, movies_df):
+        """Fit a new index over the 'features' column of a movie frame"""
+        movies_df = movies_df.reset_index(drop=True)
+        vectorizer = sklearn_text.TfidfVectorizer(**VECTORIZER_PARAMS)
+        matrix = vectorizer.fit_transform(movies_df['features']).astype(np.float32).tocsr()
+        matrix.sort_indices()
+        logger.info(f"Built TF-IDF index: {matrix.shape[0]} movies x {matrix.shape[1]} terms")
+        return cls(vectorizer, matrix, movies_df)
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, 'meta.json'))
+
+    def save(self, path):
+        """Write the index to ``path``, replacing any previous index atomically.
+
+        Tombstoned rows are dropped on the way out (without a refit).
+        """
+        if not self.active.all():
+            self.compact(refit=False)
+        path = os.path.abspath(path)
+        parent = os.path.dirname(path)
+        os.makedirs(parent, exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+
+        matrix = self.matrix.tocsr()
+        matrix.sort_indices()
+        np.save(os.path.join(tmp_path, 'data.npy'), matrix.data.astype(np.float32))
+        # Same index dtype scipy would pick, so load() can wrap the mmaps without a copy
+        index_dtype = np.int32 if matrix.nnz < np.iinfo(np.int32).max else np.int64
+        np.save(os.path.join(tmp_path, 'indices.npy'), matrix.indices.astype(index_dtype))
+        np.save(os.path.join(tmp_path, 'indptr.npy'), matrix.indptr.astype(index_dtype))
+        np.save(os.path.join(tmp_path, 'idf.npy'), np.asarray(self.vectorizer.idf_, dtype=np.float64))
+
+        vocabulary = {term: int(column) for term, column in self.vectorizer.vocabulary_.items()}
+        with open(os.path.join(tmp_path, 'vocabulary.json'), 'w') as f:
+            json.dump(vocabulary, f)
+
+        self.movies_df.to_pickle(os.path.join(tmp_path, 'movies.pkl'))
+
+        params = dict(VECTORIZER_PARAMS)
+        params['ngram_range'] = list(params['ngram_range'])
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump({
+                'version': INDEX_FORMAT_VERSION,
+                'built_at': self.built_at,
+                'n_movies': int(matrix.shape[0]),
+                'n_features': int(matrix.shape[1]),
+                'appended_since_fit': int(self.appended_since_fit),
+                'vectorizer_params': params
+            }, f)
+
+        # Swap directories so readers see either the old or the new index
+        old_path = f"{path}.old-{os.getpid()}"
+        if os.path.exists(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path, ignore_errors=True)
+        logger.info(f"Saved TF-IDF index to {path}")
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load an index written by save(); the matrix is memory-mapped by default"""
+        start = time.perf_counter()
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format version: {meta.get('version')}")
+
+        mmap_mode = 'r' if mmap else None
+        data = np.load(os.path.join(path, 'data.npy'), mmap_mode=mmap_mode)
+        indices = np.load(os.path.join(path, 'indices.npy'), mmap_mode=mmap_mode)
+        indptr = np.load(os.path.join(path, 'indptr.npy'), mmap_mode=mmap_mode)
+        matrix = sparse.csr_matrix(
+            (data, indices, indptr),
+            shape=(meta['n_movies'], meta['n_features']),
+            copy=False
+        )
+
+        with open(os.path.join(path, 'vocabulary.json')) as f:
+            vocabulary = json.load(f)
+        params = dict(meta['vectorizer_params'])
+        params['ngram_range'] = tuple(params['ngram_range'])
+        vectorizer = sklearn_text.TfidfVectorizer(vocabulary=vocabulary, **params)
+        vectorizer.idf_ = np.load(os.path.join(path, 'idf.npy'))
+
+        movies_df = pd.read_pickle(os.path.join(path, 'movies.pkl'))
+
+        logger.info(
+            f"Loaded TF-IDF index from {path} ({meta['n_movies']} movies) "
+            f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+        return cls(
+            vectorizer, matrix, movies_df,
+            built_at=meta.get('built_at'),
+            appended_since_fit=meta.get('appended_since_fit', 0)
+        )
@@ -1,28 +1,77 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Dict, Any
-from models.ai_recommender import AIRecommender
-from models.recommender import MovieRecommender
-from utils.tmdb_client import TMDBClient
+from fastapi import APIRouter, HTTPException, Body
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Dict, Any
+from models.ai_recommender import get_ai_recommender
+from models.recommender import get_recommender
+from utils.tmdb_client import get_tmdb_client
+from utils.async_tmdb_client import get_async_tmdb_client
+from utils.sse import sse_event, SSE_HEADERS
 from datetime import datetime
+import logging
 import pytz
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
-# Initialize the recommenders
-tmdb_client = TMDBClient()
-movie_recommender = MovieRecommender(tmdb_client)
-ai_recommender = AIRecommender(movie_recommender)
+# The recommenders are the per-process singletons the Flask app uses too
+def get_movie_recommender():
+    return get_recommender(get_tmdb_client())
+
+def get_chat_recommender():
+    return get_ai_recommender(get_movie_recommender())
 
+# Paths also served by the Flask app return the same JSON, so mounting this
+# router in front of it (see asgi.py) is invisible to the frontend
 @router.post("/chat-recommendations")
-async def get_chat_recommendations(user_input: str):
+async def get_chat_recommendations(user_input: str = Body(None, embed=True)):
     """
     Get movie recommendations based on natural language input
     """
+    if not user_input:
+        return JSONResponse(status_code=400, content={
+            'success': False,
+            'error': 'user_input is required'
+        })
+
+    ai_recommender = await run_in_threadpool(get_chat_recommender)
     try:
+        # Without a model this still answers plain requests, or falls back to popular movies
         recommendations = await ai_recommender.get_chat_recommendations(user_input)
-        return {"recommendations": recommendations}
+        return {
+            'success': True,
+            'recommendations': recommendations,
+            'debug_info': {
+                'user_input': user_input,
+                'recommendations_count': len(recommendations) if recommendations else 0
+            }
+        }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error(f"Error in chat recommendations: {str(e)}", exc_info=True)
+        return JSONResponse(status_code=500, content={
+            'success': False,
+            'error': f'Error in chat recommendations: {str(e)}'
+        })
+
+@router.post("/chat-recommendations/stream")
+async def stream_chat_recommendations(user_input: str = Body(None, embed=True)):
+    """
+    Server-sent events: the explanation first, then each movie as soon as it is fetched
+    """
+    if not user_input:
+        return JSONResponse(status_code=400, content={
+            'success': False,
+            'error': 'user_input is required'
+        })
+
+    ai_recommender = await run_in_threadpool(get_chat_recommender)
+
+    async def events():
+        async for event in ai_recommender.stream_chat_recommendations(user_input):
+            yield sse_event(event)
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers=SSE_HEADERS)
 
 @router.post("/contextual-recommendations")
 async def get_contextual_recommendations(context: Dict[str, Any]):
@@ -34,7 +83,8 @@ async def get_contextual_recommendations(context: Dict[str, Any]):
         if 'time_of_day' not in context:
             current_time = datetime.now(pytz.UTC)
             context['time_of_day'] = current_time.strftime('%H:%M')
-        
+
+        ai_recommender = await run_in_threadpool(get_chat_recommender)
         recommendations = await ai_recommender.get_contextual_recommendations(context)
         return {"recommendations": recommendations}
     except Exception as e:
@@ -46,22 +96,29 @@ async def get_social_recommendations(user_id: str, social_context: Dict[str, Any
     Get movie recommendations based on social and cultural context
     """
     try:
+        ai_recommender = await run_in_threadpool(get_chat_recommender)
         recommendations = await ai_recommender.get_social_recommendations(user_id, social_context)
         return {"recommendations": recommendations}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Keep existing routes
+# TF-IDF scoring is synchronous (numpy), so it runs in the threadpool instead
+# of blocking the event loop
 @router.get("/mood/{mood}")
 async def get_mood_recommendations(mood: str):
     """
     Get movie recommendations based on mood
     """
     try:
-        recommendations = movie_recommender.get_recommendations(mood=mood)
-        return {"recommendations": recommendations}
+        recommender = await run_in_threadpool(get_movie_recommender)
+        movies = await run_in_threadpool(recommender.get_mood_recommendations, mood)
+        return {'success': True, 'movies': movies}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error(f"Error getting mood recommendations: {str(e)}")
+        return JSONResponse(status_code=500, content={
+            'success': False,
+            'error': 'Error getting mood recommendations'
+        })
 
 @router.get("/genre/{genre}")
 async def get_genre_recommendations(genre: str):
@@ -69,10 +126,21 @@ async def get_genre_recommendations(genre: str):
     Get movie recommendations based on genre
     """
     try:
-        recommendations = movie_recommender.get_recommendations(genre=genre)
-        return {"recommendations": recommendations}
+        # Same selection as MovieRecommender.get_recommendations(genre=...), with non-blocking TMDB calls
+        recommender = await run_in_threadpool(get_movie_recommender)
+        tmdb_client = await run_in_threadpool(get_async_tmdb_client)
+        genre_id = recommender.genre_mapping.get(genre.lower())
+        if genre_id:
+            movies = (await tmdb_client.get_movies_by_genre(genre_id))[:10]
+        else:
+            movies = await tmdb_client.get_popular_movies()
+        return {'success': True, 'movies': movies}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error(f"Error getting genre recommendations: {str(e)}")
+        return JSONResponse(status_code=500, content={
+            'success': False,
+            'error': 'Error getting genre recommendations'
+        })
 
 @router.get("/similar/{movie_id}")
 async def get_similar_movies(movie_id: int):
@@ -80,7 +148,8 @@ async def get_similar_movies(movie_id: int):
     Get similar movies based on a movie ID
     """
     try:
-        recommendations = movie_recommender.get_recommendations(movie_id=movie_id)
+        tmdb_client = await run_in_threadpool(get_async_tmdb_client)
+        recommendations = await tmdb_client.get_similar_movies(movie_id)
         return {"recommendations": recommendations}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
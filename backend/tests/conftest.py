@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Modules import each other as top-level packages (models.x, utils.y), as when run from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Nothing under test may reach the network or the shared cache file
+os.environ.setdefault('TMDB_API_KEY', 'test')
+os.environ.setdefault('TMDB_CACHE_BACKEND', 'memory')
+os.environ.setdefault('ENABLE_CACHE_WARMER', 'false')
+os.environ['GOOGLE_API_KEY'] = ''
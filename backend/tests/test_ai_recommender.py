@@ -0,0 +1,170 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import models.gemini_model as gemini_model
+import utils.async_runtime as async_runtime
+from models.ai_recommender import AIRecommender, NO_MATCH_MESSAGE
+from models.analysis_schema import validate_analysis
+from models.gemini_model import GeminiModelLoader
+from utils.async_runtime import AsyncRuntime, run_blocking
+from utils.tmdb_client import get_tmdb_client
+
+
+def movie(movie_id, year):
+    return {'id': movie_id, 'title': f"Movie {movie_id}", 'release_date': f"{year}-01-01"}
+
+
+class FakeMovieRecommender:
+    """The MovieRecommender calls the chat paths make, without TMDB"""
+
+    def __init__(self, by_mood=None, popular=None):
+        self.tmdb_client = get_tmdb_client()
+        self.mood_genres = {'happy': [35, 10751]}
+        self.by_mood = by_mood or {}
+        self.popular = popular or [movie(900, 2024)]
+
+    def get_recommendations(self, movie_id=None, mood=None, genre=None):
+        return list(self.by_mood.get(mood, []))
+
+    def get_popular_movies(self):
+        return list(self.popular)
+
+
+class FakeAsyncTMDBClient:
+    """Discover results per genre ID, filtered by year like TMDB would"""
+
+    def __init__(self, by_genre_id):
+        self.genre_mapping = get_tmdb_client().genre_mapping
+        self.by_genre_id = by_genre_id
+        self.calls = []
+
+    async def get_movies_by_genres(self, genre_ids, count=20, sort_by='popularity.desc', year_range=None):
+        self.calls.append((genre_ids, count, year_range))
+        movies = [m for genre_id in genre_ids for m in self.by_genre_id.get(genre_id, [])]
+        if year_range:
+            movies = [m for m in movies if year_range[0] <= int(m['release_date'][:4]) <= year_range[1]]
+        return movies[:count]
+
+
+def make_recommender(by_genre_id=None, **kwargs):
+    recommender = AIRecommender(FakeMovieRecommender(**kwargs))
+    recommender.async_tmdb_client = FakeAsyncTMDBClient(by_genre_id or {})
+    return recommender
+
+
+def collect_stream(recommender, user_input):
+    async def run():
+        return [event async for event in recommender.stream_chat_recommendations(user_input)]
+    return asyncio.run(run())
+
+
+def both_paths(recommender, user_input):
+    chat = asyncio.run(recommender.get_chat_recommendations(user_input))
+    events = collect_stream(recommender, user_input)
+    chat_ids = [m['id'] for m in chat if 'id' in m]
+    stream_ids = [e['movie']['id'] for e in events if e['type'] == 'movie']
+    return chat, events, chat_ids, stream_ids
+
+
+def test_stream_and_json_pick_the_same_movies():
+    recommender = make_recommender(by_genre_id={
+        27: [movie(1, 1985), movie(2, 2001), movie(3, 1988)],
+        35: [movie(3, 1988), movie(4, 1984)]
+    })
+    chat, events, chat_ids, stream_ids = both_paths(recommender, 'horror comedy from the 80s')
+    assert chat_ids == [1, 3, 4]
+    assert sorted(stream_ids) == chat_ids
+    assert chat[0]['message'] == events[0]['message']
+    assert events[-1] == {'type': 'done', 'count': 3}
+
+
+def test_both_paths_fall_back_to_the_same_popular_movies():
+    recommender = make_recommender(by_genre_id={27: [movie(1, 2001)]}, popular=[movie(7, 2020), movie(8, 2021)])
+    chat, events, chat_ids, stream_ids = both_paths(recommender, 'horror from the 80s')
+    assert chat[0] == {'message': NO_MATCH_MESSAGE}
+    assert chat_ids == stream_ids == [7, 8]
+    assert {'type': 'message', 'message': NO_MATCH_MESSAGE} in events
+
+
+def test_fast_path_genres_resolve_through_the_full_tmdb_genre_table():
+    # 'adventure' and 'science fiction' are not in MovieRecommender's own genre table
+    recommender = make_recommender(by_genre_id={
+        12: [movie(10, 1984), movie(11, 1981)],
+        878: [movie(12, 1982)]
+    })
+    chat = asyncio.run(recommender.get_chat_recommendations('80s adventure'))
+    assert [m['id'] for m in chat if 'id' in m] == [10, 11]
+    assert recommender.async_tmdb_client.calls == [([12], 10, (1980, 1989))]
+
+    chat = asyncio.run(recommender.get_chat_recommendations('sci-fi'))
+    assert [m['id'] for m in chat if 'id' in m] == [12]
+
+
+def test_cached_intent_is_used_without_waiting_for_the_model():
+    recommender = make_recommender(by_genre_id={18: [movie(20, 1995)]})
+    request = 'something that makes me think about life'
+    assert recommender.intent_parser.parse(request) is None
+    recommender.intent_cache.set(request, {'genres': ['drama'], 'year_range': None, 'mood': None})
+    # No GOOGLE_API_KEY in tests: without the cache this would be the 'unavailable' fallback
+    recommender.model_wait = 30
+
+    chat = asyncio.run(recommender.get_chat_recommendations(request))
+    assert [m['id'] for m in chat if 'id' in m] == [20]
+    events = collect_stream(recommender, request)
+    assert [e['movie']['id'] for e in events if e['type'] == 'movie'] == [20]
+
+
+def test_model_analysis_applies_primary_genre_years_and_mood():
+    recommender = make_recommender(
+        by_genre_id={878: [movie(30, 1979), movie(31, 1982), movie(32, 2015)]},
+        by_mood={'scary': [movie(31, 1982), movie(33, 1986), movie(34, 2010)]}
+    )
+    analysis = validate_analysis({
+        'genres': ['Science Fiction', 'Horror'], 'year_range': [1980, 1989], 'mood': 'scary',
+        'primary_genre': 'Science Fiction', 'explanation': 'I picked 80s science fiction.'
+    })
+
+    async def generate(prompt):
+        return analysis
+    recommender._generate_analysis = generate
+
+    results = asyncio.run(recommender.get_contextual_recommendations({'weather': 'stormy'}))
+    assert results[0] == {'message': 'I picked 80s science fiction.'}
+    assert [m['id'] for m in results[1:]] == [31, 33]
+    assert recommender.async_tmdb_client.calls == [([878], 10, (1980, 1989))]
+
+    # A mood the recommender doesn't know is not looked up
+    analysis['mood'] = 'cozy'
+    analysis['year_range'] = None
+    results = asyncio.run(recommender.get_social_recommendations('user', {}))
+    assert [m['id'] for m in results[1:]] == [30, 31, 32]
+
+
+def test_waiting_for_model_discovery_holds_no_blocking_thread(tmp_path, monkeypatch):
+    listed = threading.Event()
+    monkeypatch.setattr(gemini_model, 'genai', SimpleNamespace(
+        configure=lambda api_key: None,
+        list_models=lambda: listed.wait(5) and [SimpleNamespace(name=gemini_model.PREFERRED_MODEL)],
+        GenerativeModel=lambda name: f"model:{name}"
+    ))
+    monkeypatch.delenv('GEMINI_MODEL', raising=False)
+    monkeypatch.setenv('GEMINI_MODEL_CACHE_PATH', str(tmp_path / 'gemini_model.json'))
+    runtime = AsyncRuntime(max_workers=1)
+    monkeypatch.setattr(async_runtime, 'runtime', runtime)
+    recommender = make_recommender()
+    recommender.gemini = GeminiModelLoader('key')
+
+    async def scenario():
+        waiting = [asyncio.ensure_future(recommender._wait_for_model()) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        # Discovery is still running, yet the single pool thread is free
+        free = await asyncio.wait_for(run_blocking(lambda: 'free'), 1)
+        listed.set()
+        return free, await asyncio.gather(*waiting)
+
+    try:
+        assert asyncio.run(scenario()) == ('free', [f"model:{gemini_model.PREFERRED_MODEL}"] * 3)
+    finally:
+        listed.set()
+        runtime.shutdown()
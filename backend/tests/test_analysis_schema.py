@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from models.analysis_schema import AnalysisError, parse_analysis, validate_analysis, build_analysis_prompt, MAX_EXPLANATION_LENGTH
+
+
+def analysis(**overrides):
+    data = {
+        'genres': ['Science Fiction', 'thriller', 'Thriller'],
+        'year_range': [1980, 1989],
+        'mood': ' Tense ',
+        'primary_genre': 'Science Fiction',
+        'explanation': ' Tense 80s sci-fi. '
+    }
+    data.update(overrides)
+    return data
+
+
+def test_valid_analysis_is_normalized():
+    assert validate_analysis(analysis()) == {
+        'genres': ['science fiction', 'thriller'],
+        'year_range': (1980, 1989),
+        'mood': 'tense',
+        'primary_genre': 'science fiction',
+        'explanation': 'Tense 80s sci-fi.'
+    }
+
+
+def test_json_is_found_inside_a_code_fence():
+    text = f"```json\n{json.dumps(analysis(year_range=None, mood=None))}\n```"
+    result = parse_analysis(text)
+    assert result['year_range'] is None
+    assert result['mood'] is None
+
+
+def test_long_explanations_are_truncated():
+    result = validate_analysis(analysis(explanation='x' * 1000))
+    assert len(result['explanation']) == MAX_EXPLANATION_LENGTH
+
+
+@pytest.mark.parametrize('overrides', [
+    {'genres': []},
+    {'genres': ['Telenovela']},
+    {'genres': 'Action'},
+    {'primary_genre': 'Telenovela'},
+    {'year_range': [1999, 1990]},
+    {'year_range': [1990]},
+    {'year_range': [True, 1990]},
+    {'year_range': ['1990', '1999']},
+    {'mood': 3},
+    {'explanation': '  '},
+])
+def test_invalid_fields_are_rejected(overrides):
+    with pytest.raises(AnalysisError):
+        validate_analysis(analysis(**overrides))
+
+
+def test_missing_keys_and_non_json_are_rejected():
+    data = analysis()
+    del data['primary_genre']
+    with pytest.raises(AnalysisError, match='primary_genre'):
+        validate_analysis(data)
+    with pytest.raises(AnalysisError):
+        parse_analysis('GENRES: action')
+    with pytest.raises(AnalysisError):
+        parse_analysis('{"genres": [}')
+
+
+def test_prompt_carries_the_output_contract():
+    prompt = build_analysis_prompt('  Recommend movies for: heist films  ')
+    assert prompt.startswith('Recommend movies for: heist films\n\n')
+    assert '"primary_genre"' in prompt
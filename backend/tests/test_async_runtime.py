@@ -0,0 +1,97 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+import utils.async_runtime as async_runtime
+from utils.async_runtime import AsyncRuntime, iterate_async
+
+
+@pytest.fixture
+def runtime(monkeypatch):
+    runtime = AsyncRuntime(max_workers=2)
+    monkeypatch.setattr(async_runtime, 'runtime', runtime)
+    yield runtime
+    runtime.shutdown()
+
+
+def test_run_reuses_one_loop_thread_for_every_call(runtime):
+    async def where():
+        await asyncio.sleep(0)
+        return asyncio.get_running_loop(), threading.current_thread().name
+
+    first, second = runtime.run(where()), runtime.run(where())
+    assert first == second
+    assert first[1] == 'async-runtime'
+
+
+def test_run_raises_the_coroutine_error_and_cancels_on_timeout(runtime):
+    async def fail():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        runtime.run(fail())
+
+    cancelled = threading.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(Exception):
+        runtime.run(slow(), timeout=0.05)
+    assert cancelled.wait(1)
+
+
+def test_run_blocking_uses_the_bounded_pool(runtime):
+    async def names():
+        return await asyncio.gather(*[
+            runtime.run_blocking(lambda: threading.current_thread().name) for _ in range(4)
+        ])
+
+    assert all(name.startswith('async-blocking') for name in runtime.run(names()))
+
+
+def test_iterate_async_closes_the_generator_on_the_loop_when_stopped_early(runtime):
+    events = []
+
+    async def numbers():
+        try:
+            for i in range(10):
+                yield i
+        finally:
+            events.append(('closed', threading.current_thread().name))
+
+    items = iterate_async(numbers())
+    assert [next(items), next(items)] == [0, 1]
+    items.close()
+    assert events == [('closed', 'async-runtime')]
+
+    assert list(iterate_async(numbers())) == list(range(10))
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_forked_child_gets_its_own_loop(runtime):
+    async def answer():
+        return await runtime.run_blocking(lambda: 42)
+
+    assert runtime.run(answer()) == 42
+    parent_loop = runtime._loop
+
+    pid = os.fork()
+    if pid == 0:
+        # The parent's loop thread did not survive the fork
+        status = 1
+        try:
+            if runtime.run(answer(), timeout=5) == 42 and runtime._loop is not parent_loop:
+                status = 0
+        finally:
+            os._exit(status)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert runtime._loop is parent_loop
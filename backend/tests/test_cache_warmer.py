@@ -0,0 +1,67 @@
+from models.recommender import MovieRecommender
+from utils.cache_warmer import CacheWarmer
+from utils.rate_limiter import RateLimiter
+from utils.tmdb_cache import MemoryCache
+from utils.tmdb_client import TMDBClient
+
+
+def make_warmed_client(monkeypatch):
+    client = TMDBClient('test', cache=MemoryCache(), rate_limiter=RateLimiter(rate=1000, burst=100, workers=1))
+    fetched = []
+
+    def fake_fetch(endpoint, params):
+        fetched.append(endpoint)
+        if endpoint.startswith('movie/') and endpoint[6:].isdigit():
+            return {'id': int(endpoint[6:]), 'title': 't', 'overview': 'o'}
+        results = [{'id': i, 'title': 't', 'overview': 'o', 'genre_ids': [28]} for i in range(1, 4)]
+        return {'results': results, 'total_pages': 1}
+
+    monkeypatch.setattr(client, '_fetch', fake_fetch)
+    warmer = CacheWarmer(client, interval=300, jitter=0, mood_genres=MovieRecommender(client).mood_genres)
+    warmer.run_once()
+    return client, warmer, fetched
+
+
+def test_warmer_fetches_listings_genres_and_listing_details(monkeypatch):
+    client, warmer, fetched = make_warmed_client(monkeypatch)
+    assert warmer.stats['failed'] == 0
+    mood_jobs = [name for name in warmer.jobs if name.startswith('mood:')]
+    # happy/feel-good share one query; the two 'romantic' entries differ
+    assert {'mood:35|10751', 'mood:35|10749', 'mood:10749', 'mood:27|53'} <= set(mood_jobs)
+    # A single-genre mood is the same query as that genre's job, so it is already warm
+    multi_genre_moods = [name for name in mood_jobs if '|' in name]
+    assert fetched.count('discover/movie') == len(client.genre_mapping) + len(multi_genre_moods)
+    assert {'movie/popular', 'trending/movie/day', 'movie/upcoming'} <= set(fetched)
+    assert {'movie/1', 'movie/2', 'movie/3'} <= set(fetched)
+
+
+def test_endpoint_reads_are_served_from_what_was_warmed(monkeypatch):
+    client, warmer, fetched = make_warmed_client(monkeypatch)
+    before = len(fetched)
+    client.get_popular_movies()
+    client.get_trending_movies()
+    client.get_new_releases()
+    client.get_movies_by_genre(client.genre_mapping['action'])
+    client.get_movies_by_genres([client.genre_mapping['science fiction']], count=10)
+    client.get_movie_details(2)
+    assert len(fetched) == before
+
+
+def test_warmed_mood_reads_make_no_fetch(monkeypatch):
+    client, warmer, fetched = make_warmed_client(monkeypatch)
+    recommender = MovieRecommender(client)
+    before = len(fetched)
+    # Both mood tables: the recommender's own ('happy') and the client's ('scary', 'feel-good')
+    for mood in list(recommender.mood_genres) + list(client.mood_mapping):
+        assert recommender.get_recommendations(mood=mood)
+    assert len(fetched) == before
+
+
+def test_second_pass_refetches_nothing_that_is_still_fresh(monkeypatch):
+    client, warmer, fetched = make_warmed_client(monkeypatch)
+    before = len(fetched)
+    # Let this worker run every job again despite the first pass's leases
+    monkeypatch.setattr(client.cache, 'acquire_lease', lambda name, ttl: True)
+    warmer.horizon = 60
+    warmer.run_once()
+    assert len(fetched) == before
@@ -0,0 +1,72 @@
+import json
+import threading
+
+import models.corpus_ingest as corpus_ingest
+from models.corpus_ingest import CorpusIngestor
+
+
+class FakeTMDBClient:
+    """Pages of 5 popular IDs (1-20); details fail for IDs in ``failing``"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.detail_calls = []
+        self._lock = threading.Lock()
+
+    def _make_request(self, endpoint, params=None, use_cache=True):
+        if endpoint == 'movie/popular':
+            page = params['page']
+            return {'results': [{'id': i} for i in range(page * 5 - 4, page * 5 + 1)], 'total_pages': 4}
+        movie_id = int(endpoint.split('/')[1])
+        with self._lock:
+            self.detail_calls.append(movie_id)
+        if movie_id in self.failing:
+            return None
+        return {'id': movie_id, 'title': f"Movie {movie_id}", 'genres': [{'name': 'Drama'}],
+                'keywords': {'keywords': [{'name': 'rain'}]}, 'overview': 'A story', 'runtime': 90}
+
+
+def make_ingestor(client, checkpoint_path):
+    # One worker keeps the fetch windows (two IDs each) deterministic
+    return CorpusIngestor(client, max_workers=1, checkpoint_path=checkpoint_path,
+                          sources=[('movie/popular', {})], chunk_size=3)
+
+
+def test_failed_run_resumes_from_the_checkpoint_without_refetching(tmp_path, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(corpus_ingest.time, 'sleep', sleeps.append)
+    checkpoint_path = str(tmp_path / 'corpus' / 'checkpoint.jsonl')
+
+    # TMDB starts failing partway through the first run
+    first = FakeTMDBClient(failing=range(7, 21))
+    movies_df = make_ingestor(first, checkpoint_path).ingest(limit=10)
+    assert list(movies_df['id']) == [1, 2, 3, 4, 5, 6]
+    # Every window from 7-8 on fails: the backoff doubles up to its cap
+    assert sleeps == [1, 2, 4, 8, 16, 30, 30]
+
+    # A crash mid-write leaves a torn last line
+    with open(checkpoint_path, 'a') as f:
+        f.write('{"id": 7, "title": "Mov')
+
+    second = FakeTMDBClient()
+    ingestor = make_ingestor(second, checkpoint_path)
+    movies_df = ingestor.ingest(limit=10)
+    assert list(movies_df['id']) == list(range(1, 11))
+    assert movies_df.loc[0, 'features'] == 'Drama rain A story'
+    # Resumed rows are not fetched again, and the limit stops the run at 10
+    assert second.detail_calls == [7, 8, 9, 10]
+    assert (ingestor.stats['resumed'], ingestor.stats['fetched'], ingestor.stats['failed']) == (6, 4, 0)
+
+    # The torn line was dropped, so the checkpoint holds each movie once
+    with open(checkpoint_path) as f:
+        assert [json.loads(line)['id'] for line in f] == list(range(1, 11))
+
+
+def test_complete_checkpoint_needs_no_requests(tmp_path):
+    checkpoint_path = str(tmp_path / 'checkpoint.jsonl')
+    make_ingestor(FakeTMDBClient(), checkpoint_path).ingest(limit=4)
+
+    client = FakeTMDBClient()
+    movies_df = make_ingestor(client, checkpoint_path).ingest(limit=3)
+    assert list(movies_df['id']) == [1, 2, 3]
+    assert client.detail_calls == []
@@ -0,0 +1,45 @@
+import pandas as pd
+from models.filter_engine import MovieFilterIndex
+
+
+def make_index(**columns):
+    frame = {
+        'genres': [['Action'], ['Comedy'], ['Action', 'Comedy'], ['Drama']],
+        'keywords': [['hero'], ['funny'], ['hero', 'funny'], []],
+        'runtime': [85, 100, 150, None],
+        'vote_average': [6.0, 8.0, 7.0, 9.0]
+    }
+    frame.update(columns)
+    return MovieFilterIndex(pd.DataFrame(frame))
+
+
+def test_runtime_buckets():
+    index = make_index()
+    assert index.mask(runtime_bucket='Short (< 90 min)').tolist() == [True, False, False, False]
+    assert index.mask(runtime_bucket='Medium (90-120 min)').tolist() == [False, True, False, False]
+    assert index.mask(runtime_bucket='Long (> 120 min)').tolist() == [False, False, True, False]
+
+
+def test_unknown_runtime_is_in_no_bucket():
+    index = make_index(runtime=[None, float('nan'), None, None])
+    for label in ('Short (< 90 min)', 'Medium (90-120 min)', 'Long (> 120 min)'):
+        assert not index.mask(runtime_bucket=label).any()
+
+
+def test_missing_runtime_column_is_in_no_bucket():
+    frame = pd.DataFrame({'genres': [['Action']], 'keywords': [[]], 'vote_average': [5.0]})
+    assert not MovieFilterIndex(frame).mask(runtime_bucket='Short (< 90 min)').any()
+
+
+def test_genre_and_keyword_masks_are_case_insensitive():
+    index = make_index()
+    assert index.mask(genre='action').tolist() == [True, False, True, False]
+    assert index.mask(genre='ACTION', keyword_terms=['Funny']).tolist() == [False, False, True, False]
+    assert not index.mask(genre='western').any()
+
+
+def test_top_rated_breaks_ties_in_frame_order():
+    index = make_index(vote_average=[7.0, 8.0, 7.0, 9.0])
+    mask = index.mask()
+    assert index.top_rated(mask, 3).tolist() == [3, 1, 0]
+    assert index.top_rated(index.mask(genre='action'), 5).tolist() == [0, 2]
@@ -0,0 +1,117 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import models.gemini_model as gemini_model
+from models.gemini_model import GeminiModelLoader, PREFERRED_MODEL
+
+
+class FakeGenAI:
+    """The parts of google.generativeai the loader uses; ``listing`` is a list of names or an exception"""
+
+    def __init__(self, listing):
+        self.listing = listing
+        self.list_calls = 0
+
+    def configure(self, api_key):
+        pass
+
+    def list_models(self):
+        self.list_calls += 1
+        if isinstance(self.listing, Exception):
+            raise self.listing
+        return [SimpleNamespace(name=name) for name in self.listing]
+
+    def GenerativeModel(self, name):
+        return f"model:{name}"
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    path = tmp_path / 'gemini_model.json'
+    monkeypatch.delenv('GEMINI_MODEL', raising=False)
+    monkeypatch.setenv('GEMINI_MODEL_CACHE_PATH', str(path))
+    return path
+
+
+def use_genai(monkeypatch, listing):
+    genai = FakeGenAI(listing)
+    monkeypatch.setattr(gemini_model, 'genai', genai)
+    return genai
+
+
+def finish_discovery(loader):
+    if loader._thread is not None:
+        loader._thread.join(2)
+
+
+def test_pinned_model_skips_discovery(cache_path, monkeypatch):
+    genai = use_genai(monkeypatch, [PREFERRED_MODEL])
+    monkeypatch.setenv('GEMINI_MODEL', 'models/gemini-pro')
+    loader = GeminiModelLoader('key')
+    assert loader.model == 'model:models/gemini-pro'
+    assert loader.get_stats()['source'] == 'pinned'
+    assert genai.list_calls == 0
+    assert not cache_path.exists()
+
+
+def test_cached_name_is_used_without_listing_models(cache_path, monkeypatch):
+    genai = use_genai(monkeypatch, [PREFERRED_MODEL])
+    cache_path.write_text(json.dumps({'model': 'models/gemini-pro', 'discovered_at': time.time()}))
+    loader = GeminiModelLoader('key')
+    assert loader.model == 'model:models/gemini-pro'
+    assert loader.source == 'disk cache'
+    assert loader._thread is None
+    assert genai.list_calls == 0
+
+
+def test_stale_cached_name_is_served_while_discovery_refreshes_it(cache_path, monkeypatch):
+    genai = use_genai(monkeypatch, ['models/gemini-pro', PREFERRED_MODEL])
+    monkeypatch.setenv('GEMINI_MODEL_CACHE_TTL', '60')
+    cache_path.write_text(json.dumps({'model': 'models/gemini-pro', 'discovered_at': time.time() - 120}))
+    loader = GeminiModelLoader('key')
+    # The old name answers straight away; discovery runs behind it
+    assert loader.model in ('model:models/gemini-pro', f"model:{PREFERRED_MODEL}")
+    finish_discovery(loader)
+    assert genai.list_calls == 1
+    assert loader.model == f"model:{PREFERRED_MODEL}"
+    assert json.loads(cache_path.read_text())['model'] == PREFERRED_MODEL
+
+
+def test_discovery_without_a_cache_writes_one(cache_path, monkeypatch):
+    use_genai(monkeypatch, ['models/gemini-pro'])
+    loader = GeminiModelLoader('key')
+    assert loader.wait(2) == 'model:models/gemini-pro'
+    assert json.loads(cache_path.read_text())['model'] == 'models/gemini-pro'
+    assert GeminiModelLoader('key').source == 'disk cache'
+
+
+def test_failed_discovery_is_retried_after_the_retry_interval(cache_path, monkeypatch):
+    genai = use_genai(monkeypatch, Exception('quota exceeded'))
+    monkeypatch.setenv('GEMINI_DISCOVERY_RETRY', '60')
+    loader = GeminiModelLoader('key')
+    assert loader.wait(2) is None
+    assert loader.get_stats()['error'] == 'quota exceeded'
+    assert not loader.is_available
+
+    # Within the retry interval nothing is listed again
+    assert loader.model is None
+    finish_discovery(loader)
+    assert genai.list_calls == 1
+
+    genai.listing = [PREFERRED_MODEL]
+    loader._failed_at -= 61
+    assert loader.wait(2) == f"model:{PREFERRED_MODEL}"
+    assert genai.list_calls == 2
+    assert loader.error is None
+    assert loader.is_available
+
+
+def test_without_an_api_key_nothing_is_discovered(cache_path, monkeypatch):
+    genai = use_genai(monkeypatch, [PREFERRED_MODEL])
+    loader = GeminiModelLoader(None)
+    assert loader.wait(1) is None
+    assert not loader.is_available
+    assert genai.list_calls == 0
@@ -0,0 +1,11 @@
+import pytest
+
+from benchmarks.import_time import LAZY_PACKAGES, profile_once
+
+
+@pytest.mark.slow
+def test_app_import_defers_heavy_modules():
+    # Same profile as benchmarks/import_time.py: a fresh worker importing the app
+    modules, _ = profile_once('app')
+    assert 'app' in modules
+    assert [name for name in LAZY_PACKAGES if name in modules] == []
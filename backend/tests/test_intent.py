@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from models.intent_cache import IntentCache, normalize_request
+from models.intent_parser import IntentParser
+from utils.tmdb_client import get_tmdb_client
+
+
+@pytest.fixture(scope='module')
+def parser():
+    client = get_tmdb_client()
+    return IntentParser(client.genre_mapping, client.mood_mapping)
+
+
+@pytest.mark.parametrize('text, intent', [
+    ('80s action', {'genres': ['action'], 'year_range': (1980, 1989), 'mood': None}),
+    ('scary movies', {'genres': [], 'year_range': None, 'mood': 'scary'}),
+    ('sci-fi from the nineties', {'genres': ['science fiction'], 'year_range': (1990, 1999), 'mood': None}),
+    ('romcoms', {'genres': ['romance', 'comedy'], 'year_range': None, 'mood': None}),
+    ('horror comedies between 1990 and 1995', {'genres': ['horror', 'comedy'], 'year_range': (1990, 1995), 'mood': None}),
+    ('feel good family movies', {'genres': ['family'], 'year_range': None, 'mood': 'feel-good'}),
+])
+def test_parser_understands_plain_requests(parser, text, intent):
+    assert parser.parse(text) == intent
+
+
+@pytest.mark.parametrize('text', [
+    'movies like Inception',
+    'something my dad would enjoy',
+    'please',
+    'funny and scary',
+])
+def test_parser_leaves_anything_else_to_the_model(parser, text):
+    assert parser.parse(text) is None
+
+
+def test_normalize_request_ignores_order_plurals_and_filler():
+    assert normalize_request('90s horror comedies') == normalize_request('Horror comedy from the 90s')
+
+
+def test_intent_cache_reuses_close_paraphrases_only():
+    cache = IntentCache(max_entries=10, ttl=60)
+    intent = {'genres': ['horror', 'comedy'], 'year_range': (1990, 1999), 'mood': None}
+    cache.set('90s horror comedies', intent)
+    assert cache.get('horror comedy from the 90s') == intent
+    assert cache.get('horor comedies 90s') == intent
+    assert cache.get('funny horror comedies 90s') is None
+    assert cache.get('80s horror comedies') is None
+    assert cache.stats['hits'] == 1
+    assert cache.stats['near_hits'] == 1
+
+
+def test_intent_cache_evicts_the_least_recently_used():
+    cache = IntentCache(max_entries=2, ttl=60)
+    cache.set('westerns', {'genres': ['western']})
+    cache.set('war films', {'genres': ['war']})
+    assert cache.get('westerns') is not None
+    cache.set('documentaries', {'genres': ['documentary']})
+    assert cache.get('war films') is None
+    assert cache.get('westerns') is not None
+    assert cache.stats['evictions'] == 1
+
+
+def test_intent_cache_expires_entries():
+    cache = IntentCache(max_entries=2, ttl=0.001)
+    cache.set('westerns', {'genres': ['western']})
+    time.sleep(0.01)
+    assert cache.get('westerns') is None
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+
+from utils.rate_limiter import RateLimiter, BACKGROUND, INTERACTIVE, parse_retry_after, priority_lane, current_lane
+
+
+class FakePauseStore:
+    def __init__(self):
+        self.pauses = {}
+
+    def get_pause(self, name):
+        return self.pauses.get(name)
+
+    def set_pause(self, name, until):
+        self.pauses[name] = until
+
+
+def test_background_lane_is_not_starved_by_a_small_bucket():
+    # 4 req/s over 4 workers: burst 1 token, which can never exceed the 25% reserve by a whole token
+    limiter = RateLimiter(rate=4, workers=4, reserve=0.25)
+    assert limiter.burst == 1.0
+    assert limiter.acquire(BACKGROUND, timeout=2)
+
+
+def test_background_lane_keeps_the_reserve_for_interactive_callers():
+    limiter = RateLimiter(rate=1, burst=4, reserve=0.5, workers=1)
+    assert limiter.acquire(BACKGROUND, timeout=0)
+    assert limiter.acquire(BACKGROUND, timeout=0)
+    # Two tokens left, both reserved
+    assert not limiter.acquire(BACKGROUND, timeout=0)
+    assert limiter.acquire(INTERACTIVE, timeout=0)
+    assert limiter.acquire(INTERACTIVE, timeout=0)
+    assert not limiter.acquire(INTERACTIVE, timeout=0)
+    assert limiter.stats['timeouts'] == 2
+
+
+def test_background_lane_yields_to_waiting_interactive_callers():
+    limiter = RateLimiter(rate=20, burst=1, reserve=0, workers=1)
+    assert limiter.acquire(INTERACTIVE, timeout=0)
+    order = []
+
+    def take(lane):
+        limiter.acquire(lane, timeout=2)
+        order.append(lane)
+
+    interactive = threading.Thread(target=take, args=(INTERACTIVE,))
+    interactive.start()
+    time.sleep(0.01)
+    take(BACKGROUND)
+    interactive.join()
+    assert order == [INTERACTIVE, BACKGROUND]
+
+
+def test_throttle_pauses_every_lane_and_is_shared_through_the_store():
+    store = FakePauseStore()
+    limiter = RateLimiter(rate=100, burst=10, workers=1, store=store)
+    limiter.throttle(0.2)
+    assert store.get_pause('tmdb') > time.time()
+    assert not limiter.acquire(INTERACTIVE, timeout=0.05)
+
+    other_worker = RateLimiter(rate=100, burst=10, workers=1, store=store, sync_interval=0)
+    assert not other_worker.acquire(INTERACTIVE, timeout=0.05)
+    assert other_worker.acquire(INTERACTIVE, timeout=1)
+
+
+def test_acquire_async_waits_without_blocking_the_loop():
+    limiter = RateLimiter(rate=20, burst=1, workers=1)
+
+    async def scenario():
+        ticks = []
+
+        async def ticker():
+            for _ in range(3):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        results = await asyncio.gather(
+            limiter.acquire_async(INTERACTIVE, timeout=1),
+            limiter.acquire_async(INTERACTIVE, timeout=1),
+            ticker()
+        )
+        return results, ticks
+
+    results, ticks = asyncio.run(scenario())
+    assert results[:2] == [True, True]
+    assert len(ticks) == 3
+    assert limiter.stats['waited'] == 1
+
+
+def test_priority_lane_sets_and_restores_the_lane():
+    assert current_lane() == INTERACTIVE
+    with priority_lane(BACKGROUND):
+        assert current_lane() == BACKGROUND
+    assert current_lane() == INTERACTIVE
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('3', 1.0) == 3.0
+    assert parse_retry_after('-1', 1.0) == 0.0
+    assert parse_retry_after('Wed, 21 Oct 2026 07:28:00 GMT', 1.5) == 1.5
+    assert parse_retry_after(None, 2.0) == 2.0
@@ -0,0 +1,68 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routes.recommendations as recommendations
+
+
+class FakeRecommender:
+    genre_mapping = {'action': 28}
+
+
+class FakeAsyncTMDBClient:
+    def __init__(self):
+        self.calls = []
+
+    async def get_movies_by_genre(self, genre_id):
+        self.calls.append(('genre', genre_id))
+        return [{'id': i} for i in range(15)]
+
+    async def get_popular_movies(self):
+        self.calls.append(('popular',))
+        return [{'id': 1}]
+
+    async def get_similar_movies(self, movie_id):
+        self.calls.append(('similar', movie_id))
+        return [{'id': 2}]
+
+
+def make_client(monkeypatch):
+    tmdb = FakeAsyncTMDBClient()
+    monkeypatch.setattr(recommendations, 'get_async_tmdb_client', lambda: tmdb)
+    monkeypatch.setattr(recommendations, 'get_movie_recommender', FakeRecommender)
+    app = FastAPI()
+    app.include_router(recommendations.router)
+    return TestClient(app), tmdb
+
+
+def test_genre_route_uses_the_async_client(monkeypatch):
+    client, tmdb = make_client(monkeypatch)
+    response = client.get('/genre/Action')
+    assert response.json() == {'success': True, 'movies': [{'id': i} for i in range(10)]}
+    assert tmdb.calls == [('genre', 28)]
+
+
+def test_unknown_genre_falls_back_to_popular(monkeypatch):
+    client, tmdb = make_client(monkeypatch)
+    assert client.get('/genre/opera').json()['movies'] == [{'id': 1}]
+    assert tmdb.calls == [('popular',)]
+
+
+def test_similar_route_uses_the_async_client(monkeypatch):
+    client, tmdb = make_client(monkeypatch)
+    assert client.get('/similar/550').json() == {'recommendations': [{'id': 2}]}
+    assert tmdb.calls == [('similar', 550)]
+
+
+class UnavailableChatRecommender:
+    is_available = False
+
+    async def get_chat_recommendations(self, user_input):
+        return [{'message': 'AI service is currently unavailable.'}, {'id': 1}]
+
+
+def test_chat_route_answers_without_a_model(monkeypatch):
+    client, _ = make_client(monkeypatch)
+    monkeypatch.setattr(recommendations, 'get_chat_recommender', UnavailableChatRecommender)
+    response = client.post('/chat-recommendations', json={'user_input': 'anything'})
+    assert response.status_code == 200
+    assert response.json()['recommendations'][1] == {'id': 1}
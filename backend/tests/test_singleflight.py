@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.singleflight import SingleFlight, AsyncSingleFlight
+
+
+def run_concurrently(targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(2)
+        return 'movies'
+
+    def leader():
+        results.append(flight.do('popular', fetch))
+
+    def follower():
+        time.sleep(0.02)
+        results.append(flight.do('popular', fetch))
+
+    def releaser():
+        time.sleep(0.1)
+        release.set()
+
+    run_concurrently([leader, follower, follower, releaser])
+    assert calls == [1]
+    assert results == ['movies'] * 3
+    assert flight.stats['executions'] == 1
+    assert flight.stats['coalesced'] == 2
+
+
+def test_errors_reach_every_waiter_and_are_not_remembered():
+    flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def fail():
+        release.wait(2)
+        raise ValueError('upstream down')
+
+    def caller(delay):
+        def run():
+            time.sleep(delay)
+            try:
+                flight.do('key', fail)
+            except ValueError as e:
+                errors.append(e)
+            if delay == 0.02:
+                release.set()
+        return run
+
+    run_concurrently([caller(0), caller(0.01), caller(0.02)])
+    assert len(errors) == 3
+    assert flight.do('key', lambda: 'recovered') == 'recovered'
+
+
+def test_follower_with_timeout_runs_the_call_itself():
+    flight = SingleFlight()
+    release = threading.Event()
+    results = []
+
+    def slow():
+        release.wait(2)
+        return 'slow'
+
+    def leader():
+        results.append(flight.do('key', slow))
+
+    def impatient():
+        time.sleep(0.02)
+        results.append(flight.do('key', lambda: 'own', timeout=0.05))
+        release.set()
+
+    run_concurrently([leader, impatient])
+    assert results == ['own', 'slow']
+    # The follower that gave up is not counted as sharing the call
+    assert flight.stats == {'executions': 1, 'coalesced': 0, 'timeouts': 1}
+
+
+def test_keys_are_independent():
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == 1
+    assert flight.do('b', lambda: 2) == 2
+    assert flight.stats == {'executions': 2, 'coalesced': 0, 'timeouts': 0}
+
+
+def test_leader_error_propagates():
+    flight = SingleFlight()
+    with pytest.raises(KeyError):
+        flight.do('a', lambda: {}['missing'])
+
+
+def test_async_calls_share_one_execution_and_survive_a_cancelled_caller():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'movies'
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do('popular', fetch))
+        second = asyncio.ensure_future(flight.do('popular', fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(scenario()) == ('movies', True)
+    assert calls == [1]
+    assert flight.stats['coalesced'] == 1
+    assert flight.stats['cancelled'] == 0
+
+
+def test_async_call_is_cancelled_once_every_caller_is_gone():
+    flight = AsyncSingleFlight()
+    finished = []
+
+    async def fetch():
+        await asyncio.sleep(1)
+        finished.append(1)
+
+    async def scenario():
+        callers = [asyncio.ensure_future(flight.do('key', fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert finished == []
+    assert flight.stats['cancelled'] == 1
+
+
+def test_async_follower_with_timeout_runs_the_call_itself():
+    flight = AsyncSingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.5)
+        return 'slow'
+
+    async def own():
+        return 'own'
+
+    async def scenario():
+        leader = asyncio.ensure_future(flight.do('key', slow))
+        await asyncio.sleep(0.01)
+        mine = await flight.do('key', own, timeout=0.02)
+        return mine, await leader
+
+    assert asyncio.run(scenario()) == ('own', 'slow')
+    assert flight.stats == {'executions': 1, 'coalesced': 0, 'timeouts': 1, 'cancelled': 0}
@@ -0,0 +1,43 @@
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routes.recommendations as recommendations
+from utils.sse import sse_event
+
+
+def test_sse_event_is_one_json_data_line():
+    event = {'type': 'movie', 'movie': {'id': 1, 'title': 'Line\nbreak'}}
+    encoded = sse_event(event)
+    assert encoded.startswith('data: ')
+    assert encoded.endswith('\n\n')
+    # Newlines inside values are escaped, so the event can't be split early
+    assert encoded.count('\n') == 2
+    assert json.loads(encoded[len('data: '):]) == event
+
+
+class FakeChatRecommender:
+    async def stream_chat_recommendations(self, user_input):
+        yield {'type': 'message', 'message': f"Movies for {user_input}"}
+        yield {'type': 'movie', 'movie': {'id': 1, 'title': 'Alien'}}
+        yield {'type': 'done', 'count': 1}
+
+
+def test_stream_endpoint_sends_each_event_unbuffered(monkeypatch):
+    monkeypatch.setattr(recommendations, 'get_chat_recommender', FakeChatRecommender)
+    app = FastAPI()
+    app.include_router(recommendations.router)
+
+    with TestClient(app).stream('POST', '/chat-recommendations/stream', json={'user_input': 'space'}) as response:
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('text/event-stream')
+        assert response.headers['cache-control'] == 'no-cache'
+        assert response.headers['x-accel-buffering'] == 'no'
+        lines = [line for line in response.iter_lines() if line]
+
+    assert [json.loads(line[len('data: '):]) for line in lines] == [
+        {'type': 'message', 'message': 'Movies for space'},
+        {'type': 'movie', 'movie': {'id': 1, 'title': 'Alien'}},
+        {'type': 'done', 'count': 1}
+    ]
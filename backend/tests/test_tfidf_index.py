@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.tfidf_index import TfidfIndex
+
+
+def movies_frame(rows):
+    return pd.DataFrame([
+        {'id': movie_id, 'title': f"Movie {movie_id}", 'features': features, 'genres': [], 'runtime': 100}
+        for movie_id, features in rows
+    ])
+
+
+@pytest.fixture
+def index():
+    return TfidfIndex.build(movies_frame([
+        (1, 'space station astronaut alien'),
+        (2, 'haunted house ghost horror'),
+        (3, 'astronaut mission mars space'),
+        (4, 'romantic comedy wedding paris'),
+        (5, 'ghost story haunted castle')
+    ]))
+
+
+def ids(index, rows):
+    return [int(index.movies_df['id'].iloc[row]) for row in rows]
+
+
+def test_top_k_ranks_by_cosine_for_every_query(index):
+    (space_rows, space_scores), (ghost_rows, _) = index.top_k(['space astronaut', 'haunted ghost'], k=2)
+    assert sorted(ids(index, space_rows)) == [1, 3]
+    assert sorted(ids(index, ghost_rows)) == [2, 5]
+    assert list(space_scores) == sorted(space_scores, reverse=True)
+
+
+def test_approximate_top_k_matches_exact_on_a_small_index(index):
+    exact = index.top_k(['haunted ghost castle'], k=3, approximate=False)[0]
+    approximate = index.top_k(['haunted ghost castle'], k=3, approximate=True)[0]
+    assert ids(index, exact[0]) == ids(index, approximate[0])
+    np.testing.assert_allclose(exact[1], approximate[1], rtol=1e-5)
+
+
+def test_k_is_capped_by_the_live_rows(index):
+    rows, scores = index.top_k(['space'], k=50)[0]
+    assert len(rows) == len(scores) == 5
+
+
+def test_save_and_load_round_trip(index, tmp_path):
+    index.remove_movies([4])
+    path = str(tmp_path / 'tfidf')
+    index.save(path)
+    loaded = TfidfIndex.load(path)
+    assert loaded.live_count == 4
+    before = index.top_k(['haunted ghost'], k=2)[0]
+    after = loaded.top_k(['haunted ghost'], k=2)[0]
+    assert ids(index, before[0]) == ids(loaded, after[0])
+
+
+def test_removed_movies_are_never_returned(index):
+    assert index.remove_movies([3, 99]) == 1
+    rows, _ = index.top_k(['astronaut mission mars'], k=4)[0]
+    assert 3 not in ids(index, rows)
+    assert index.live_count == 4
+
+
+def test_added_movie_replaces_the_old_row_without_a_refit(index):
+    vocabulary = dict(index.vectorizer.vocabulary_)
+    assert index.add_movies(movies_frame([(4, 'ghost haunted wedding'), (6, 'space alien invasion')])) == 2
+    assert index.vectorizer.vocabulary_ == vocabulary
+    assert index.live_count == 6
+    assert index.appended_since_fit == 2
+    rows, _ = index.top_k(['ghost wedding'], k=1)[0]
+    assert ids(index, rows) == [4]
+    assert index.movies_df.iloc[rows[0]]['features'] == 'ghost haunted wedding'
+
+
+def test_compact_drops_tombstones_and_refits_after_many_appends(index):
+    index.add_movies(movies_frame([(7, 'pirate treasure island'), (8, 'pirate ship ocean')]))
+    index.remove_movies([1, 2])
+    assert index.needs_compaction()
+    index.compact()
+    assert index.matrix.shape[0] == index.live_count == 5
+    assert index.active.all()
+    assert index.appended_since_fit == 0
+    # 'pirate' was unknown to the frozen vocabulary; the refit learned it
+    assert 'pirate' in index.vectorizer.vocabulary_
+    rows, _ = index.top_k(['pirate treasure'], k=1)[0]
+    assert ids(index, rows) == [7]
+
+
+def test_compact_without_refit_keeps_the_vocabulary(index):
+    vocabulary = dict(index.vectorizer.vocabulary_)
+    index.remove_movies([5])
+    index.compact(refit=False)
+    assert index.vectorizer.vocabulary_ == vocabulary
+    assert sorted(index.movies_df['id']) == [1, 2, 3, 4]
@@ -0,0 +1,118 @@
+import os
+
+import pytest
+
+import utils.tmdb_cache as tmdb_cache
+from utils.tmdb_cache import SQLiteCache
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(tmdb_cache.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'cache' / 'tmdb_cache.sqlite3')
+
+
+def test_second_worker_reads_what_the_first_fetched(db_path):
+    first, second = SQLiteCache(db_path), SQLiteCache(db_path)
+    assert second.lookup('movie/popular?page=1') == (None, False)
+    first.set('movie/popular?page=1', {'results': [{'id': 1}]}, ttl=60)
+    assert second.lookup('movie/popular?page=1') == ({'results': [{'id': 1}]}, True)
+    # A rewrite replaces the whole response
+    second.set('movie/popular?page=1', {'results': [{'id': 2}]}, ttl=60)
+    assert first.lookup('movie/popular?page=1') == ({'results': [{'id': 2}]}, True)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_forked_worker_shares_the_file_but_not_the_lease(db_path):
+    cache = SQLiteCache(db_path)
+    assert cache.acquire_lease('cache-warmer', 60)
+
+    pid = os.fork()
+    if pid == 0:
+        # The child reconnects on first use; its pid makes it another owner
+        status = 0
+        try:
+            if cache.acquire_lease('cache-warmer', 60):
+                status = 1
+            cache.set('movie/550?', {'id': 550}, ttl=60)
+        except BaseException:
+            status = 2
+        os._exit(status)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert cache.lookup('movie/550?') == ({'id': 550}, True)
+
+
+def test_entries_go_stale_then_expire(db_path, clock):
+    cache = SQLiteCache(db_path)
+    cache.set('trending/movie/week?', {'results': []}, ttl=10, stale_ttl=20)
+    assert cache.lookup('trending/movie/week?') == ({'results': []}, True)
+    assert cache.expires_in('trending/movie/week?') == 10
+
+    clock.now += 15
+    assert cache.lookup('trending/movie/week?') == ({'results': []}, False)
+
+    clock.now += 20
+    assert cache.lookup('trending/movie/week?') == (None, False)
+    assert cache.expires_in('trending/movie/week?') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['stale_hits'], stats['expired'], stats['entries']) == (1, 1, 1, 0)
+
+
+def test_prune_drops_expired_rows_then_the_least_recently_used(db_path, clock):
+    cache = SQLiteCache(db_path, max_entries=2, prune_every=1000)
+    cache.set('a', 'a', ttl=3600)
+    clock.now += 10
+    cache.set('b', 'b', ttl=3600)
+    clock.now += 10
+    cache.set('c', 'c', ttl=3600)
+    cache.set('gone', 'gone', ttl=5)
+    # Reading 'a' more than a minute later marks it recently used
+    clock.now += 100
+    assert cache.lookup('a') == ('a', True)
+
+    cache.prune()
+    assert [key for key in 'abc' if cache.lookup(key)[0] is not None] == ['a', 'c']
+    assert cache.lookup('gone') == (None, False)
+    stats = cache.stats()
+    assert (stats['expired'], stats['evictions']) == (1, 1)
+
+
+def test_lease_is_refused_to_another_owner_until_it_expires(db_path, clock, monkeypatch):
+    host = ['web-1']
+    monkeypatch.setattr(tmdb_cache.socket, 'gethostname', lambda: host[0])
+    first, second = SQLiteCache(db_path), SQLiteCache(db_path)
+    assert first.acquire_lease('cache-warmer', 60)
+    # The holder may renew its own lease
+    assert first.acquire_lease('cache-warmer', 60)
+
+    host[0] = 'web-2'
+    assert not second.acquire_lease('cache-warmer', 60)
+    clock.now += 61
+    assert second.acquire_lease('cache-warmer', 60)
+
+    host[0] = 'web-1'
+    assert not first.acquire_lease('cache-warmer', 60)
+
+
+def test_pauses_are_shared_and_never_shortened(db_path):
+    first, second = SQLiteCache(db_path), SQLiteCache(db_path)
+    assert second.get_pause('tmdb') is None
+    first.set_pause('tmdb', 2000.0)
+    second.set_pause('tmdb', 1500.0)
+    assert first.get_pause('tmdb') == second.get_pause('tmdb') == 2000.0
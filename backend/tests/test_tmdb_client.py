@@ -0,0 +1,227 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import requests
+
+from utils.rate_limiter import RateLimiter, BACKGROUND, priority_lane
+from utils.tmdb_cache import MemoryCache
+from utils.tmdb_client import TMDBClient
+from utils.async_tmdb_client import AsyncTMDBClient, _LoopState
+
+
+def make_client(**kwargs):
+    kwargs.setdefault('rate_limiter', RateLimiter(rate=100, burst=10, workers=1))
+    kwargs.setdefault('backoff_factor', 0)
+    return TMDBClient('test', cache=MemoryCache(), **kwargs)
+
+
+def test_user_request_does_not_wait_behind_a_background_fetch(monkeypatch):
+    client = make_client()
+    client.policy.rate_limit_wait = 0.05
+    release = threading.Event()
+    lanes = []
+
+    def fake_fetch(endpoint, params):
+        if len(lanes) == 0:
+            lanes.append('background')
+            release.wait(2)
+            return {'results': ['from warmer']}
+        lanes.append('interactive')
+        return {'results': ['own']}
+
+    monkeypatch.setattr(client, '_fetch', fake_fetch)
+
+    def warm():
+        with priority_lane(BACKGROUND):
+            client._make_request('movie/popular')
+
+    warmer = threading.Thread(target=warm)
+    warmer.start()
+    time.sleep(0.02)
+    started = time.monotonic()
+    data = client._make_request('movie/popular')
+    elapsed = time.monotonic() - started
+    release.set()
+    warmer.join()
+
+    assert data == {'results': ['own']}
+    assert elapsed < 1
+    assert lanes == ['background', 'interactive']
+    # The user request timed out waiting and made its own call: nothing was saved
+    assert client.get_stats()['coalescing'] == {'upstream_calls': 2, 'upstream_calls_saved': 0}
+
+
+def test_cached_response_is_reused(monkeypatch):
+    client = make_client()
+    calls = []
+
+    def fake_fetch(endpoint, params):
+        calls.append(endpoint)
+        return {'results': [{'id': 1}]}
+
+    monkeypatch.setattr(client, '_fetch', fake_fetch)
+    first = client._make_request('movie/popular', {'page': 1})
+    second = client._make_request('movie/popular', {'page': 1})
+    assert first == second
+    assert calls == ['movie/popular']
+
+
+def test_failed_fetch_is_not_cached(monkeypatch):
+    client = make_client()
+    responses = [None, {'results': []}]
+    monkeypatch.setattr(client, '_fetch', lambda endpoint, params: responses.pop(0))
+    assert client._make_request('movie/popular') is None
+    assert client._make_request('movie/popular') == {'results': []}
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return self.body
+
+
+def scripted_statuses():
+    # One 503 and one 429 before the request goes through
+    return [(503, None), (429, {'Retry-After': '0'}), (200, None)]
+
+
+def test_sync_client_retries_through_the_policy(monkeypatch):
+    client = make_client(max_retries=2)
+    script = scripted_statuses()
+
+    def fake_get(url, params=None, timeout=None):
+        status, headers = script.pop(0)
+        return FakeResponse(status, {'page': 1}, headers)
+
+    monkeypatch.setattr(client.session, 'get', fake_get)
+    assert client._make_request('movie/popular') == {'page': 1}
+    assert client.rate_limiter.stats['throttled'] == 1
+
+
+def test_async_client_retries_through_the_same_policy():
+    client = make_client(max_retries=2)
+    async_client = AsyncTMDBClient(client)
+    script = scripted_statuses()
+
+    def handler(request):
+        status, headers = script.pop(0)
+        return httpx.Response(status, json={'page': 1}, headers=headers)
+
+    async def scenario():
+        state = _LoopState(
+            httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handler)),
+            asyncio.Semaphore(4)
+        )
+        async_client._states[asyncio.get_running_loop()] = state
+        try:
+            first = await async_client._make_request('movie/popular')
+            # Served from the cache both clients share
+            second = client._make_request('movie/popular')
+        finally:
+            await async_client.aclose()
+        return first, second
+
+    assert asyncio.run(scenario()) == ({'page': 1}, {'page': 1})
+    assert async_client.stats['retries'] == 2
+    assert client.rate_limiter.stats['throttled'] == 1
+
+
+def test_both_clients_give_up_after_max_retries(monkeypatch):
+    client = make_client(max_retries=1)
+    calls = []
+
+    def fake_get(url, params=None, timeout=None):
+        calls.append(url)
+        return FakeResponse(502)
+
+    monkeypatch.setattr(client.session, 'get', fake_get)
+    assert client._make_request('movie/popular') is None
+    assert len(calls) == 2
+
+    async_client = AsyncTMDBClient(client)
+
+    async def scenario():
+        async_client._states[asyncio.get_running_loop()] = _LoopState(
+            httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(lambda r: httpx.Response(502))),
+            asyncio.Semaphore(4)
+        )
+        try:
+            return await async_client._make_request('movie/popular')
+        finally:
+            await async_client.aclose()
+
+    assert asyncio.run(scenario()) is None
+    assert async_client.stats['requests'] == 2
+
+
+class ThreadRecordingCache(MemoryCache):
+    """MemoryCache that notes which threads touch it, like a blocking SQLite cache would"""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = set()
+
+    def lookup(self, key):
+        self.threads.add(threading.get_ident())
+        return super().lookup(key)
+
+    def set(self, key, value, ttl, stale_ttl=0):
+        self.threads.add(threading.get_ident())
+        return super().set(key, value, ttl, stale_ttl)
+
+    def get_pause(self, name):
+        self.threads.add(threading.get_ident())
+        return None
+
+    def set_pause(self, name, until):
+        self.threads.add(threading.get_ident())
+
+
+def test_async_client_keeps_cache_and_pause_io_off_the_event_loop():
+    cache = ThreadRecordingCache()
+    limiter = RateLimiter(rate=100, burst=10, workers=1, store=cache, sync_interval=0)
+    client = TMDBClient('test', cache=cache, rate_limiter=limiter, backoff_factor=0)
+    async_client = AsyncTMDBClient(client)
+    responses = [httpx.Response(429, headers={'Retry-After': '0'}), httpx.Response(200, json={'page': 1})]
+
+    async def scenario():
+        async_client._states[asyncio.get_running_loop()] = _LoopState(
+            httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(lambda r: responses.pop(0))),
+            asyncio.Semaphore(4)
+        )
+        try:
+            await async_client._make_request('movie/popular')
+            await async_client._make_request('movie/popular')
+        finally:
+            await async_client.aclose()
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(scenario())
+    assert cache.threads
+    assert loop_thread not in cache.threads
+
+
+def test_genre_discover_limits_release_years_server_side(monkeypatch):
+    client = make_client()
+    requests_made = []
+
+    def fake_make_request(endpoint, params=None, use_cache=True):
+        requests_made.append(params)
+        return {'results': [{'id': 1, 'title': 'Raiders', 'genre_ids': [12]}], 'total_pages': 1}
+
+    monkeypatch.setattr(client, '_make_request', fake_make_request)
+    movies = client.get_movies_by_genres([12], count=10, year_range=(1980, 1989))
+    assert [m['id'] for m in movies] == [1]
+    assert requests_made[0]['primary_release_date.gte'] == '1980-01-01'
+    assert requests_made[0]['primary_release_date.lte'] == '1989-12-31'
+    assert requests_made[0]['with_genres'] == '12'
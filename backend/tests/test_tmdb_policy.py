@@ -0,0 +1,55 @@
+from utils.rate_limiter import RateLimiter, BACKGROUND, INTERACTIVE
+from utils.tmdb_cache import MemoryCache
+from utils.tmdb_policy import RequestPolicy, _refresh_horizon, FRESH, STALE, EXPIRING, MISS
+
+
+def make_policy(**kwargs):
+    return RequestPolicy(MemoryCache(), RateLimiter(rate=100, burst=10, workers=1), **kwargs)
+
+
+def test_lookup_reports_fresh_stale_and_miss():
+    policy = make_policy()
+    assert policy.lookup('a') == (None, MISS)
+    policy.cache.set('a', {'x': 1}, 60, 60)
+    assert policy.lookup('a') == ({'x': 1}, FRESH)
+    policy.cache.set('b', {'x': 2}, 0, 60)
+    assert policy.lookup('b') == ({'x': 2}, STALE)
+
+
+def test_lookup_while_warming_refetches_entries_about_to_expire():
+    policy = make_policy()
+    policy.cache.set('soon', {'x': 1}, 30, 60)
+    policy.cache.set('later', {'x': 2}, 3600, 60)
+    token = _refresh_horizon.set(300)
+    try:
+        assert policy.lookup('soon') == ({'x': 1}, EXPIRING)
+        assert policy.lookup('later') == ({'x': 2}, FRESH)
+        assert policy.lookup('missing') == (None, MISS)
+    finally:
+        _refresh_horizon.reset(token)
+
+
+def test_store_uses_the_ttl_of_the_endpoint_class():
+    policy = make_policy(cache_ttls={'details': (0, 60)})
+    policy.store('k', 'movie/550', {'id': 550})
+    assert policy.lookup('k') == ({'id': 550}, STALE)
+
+
+def test_wait_limit_per_lane():
+    policy = make_policy(rate_limit_wait=2, background_wait=30)
+    assert policy.wait_limit(INTERACTIVE) == 2
+    assert policy.wait_limit(BACKGROUND) == 30
+
+
+def test_retry_delay_backs_off_then_gives_up():
+    policy = make_policy(max_retries=2, backoff_factor=1)
+    assert 0.5 <= policy.retry_delay(0, 503) <= 1
+    assert 1 <= policy.retry_delay(1) <= 2
+    assert policy.retry_delay(2, 503) is None
+
+
+def test_retry_delay_on_429_pauses_the_limiter_even_when_giving_up():
+    policy = make_policy(max_retries=1)
+    assert policy.retry_delay(0, 429, '0') == 0
+    assert policy.retry_delay(1, 429, '0') is None
+    assert policy.rate_limiter.stats['throttled'] == 2
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRuntime:
+    """One long-lived event loop per worker process, for calling coroutines from Flask.
+
+    The loop runs in a daemon thread; ``run()`` submits a coroutine to it and
+    blocks the calling request thread until it finishes, so no request pays
+    for creating and closing a loop. Blocking calls made from coroutines
+    (Gemini's ``generate_content``, the synchronous recommender) go through
+    ``run_blocking()``, a bounded thread pool, so the loop keeps serving
+    other coroutines meanwhile. Everything is recreated after a fork.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or int(os.getenv('ASYNC_BLOCKING_WORKERS', 8))
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._thread = None
+        self._executor = None
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            # A forked child inherits the parent's objects but not its threads
+            self._loop = asyncio.new_event_loop()
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix='async-blocking'
+            )
+            self._loop.set_default_executor(self._executor)
+            self._thread = threading.Thread(target=self._run_loop, name='async-runtime', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+            logger.info(f"Async runtime started in process {self._pid}")
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def run(self, coro, timeout=None):
+        """Run ``coro`` on the shared loop and return its result (call from sync code only)"""
+        self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # Timed out or interrupted: don't leave the coroutine running
+            future.cancel()
+            raise
+
+    async def run_blocking(self, fn, *args, **kwargs):
+        """Await a blocking call in the bounded pool, from whichever loop is running"""
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    def shutdown(self):
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._executor.shutdown(wait=False)
+            self._pid = None
+            self._thread = None
+
+
+runtime = AsyncRuntime()
+
+def run_async(coro, timeout=None):
+    """Run a coroutine on this worker's persistent event loop"""
+    return runtime.run(coro, timeout)
+
+def iterate_async(agen, timeout=None):
+    """Iterate an async generator from sync code (e.g. a streaming Flask response).
+
+    Each item is produced on the persistent loop; closing the iterator early
+    (the client disconnected) closes the generator there too.
+    """
+    async def next_item():
+        return await agen.__anext__()
+
+    async def close():
+        await agen.aclose()
+
+    try:
+        while True:
+            try:
+                item = runtime.run(next_item(), timeout)
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        runtime.run(close())
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking function in this worker's bounded executor"""
+    return await runtime.run_blocking(fn, *args, **kwargs)
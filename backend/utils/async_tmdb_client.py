@@ -0,0 +1,379 @@
+import asyncio
+import contextvars
+import os
+import logging
+import threading
+import weakref
+from functools import partial
+import httpx
+from utils.tmdb_client import get_tmdb_client
+from utils.tmdb_policy import RETRY_STATUSES, FRESH, STALE
+from utils.singleflight import AsyncSingleFlight
+from utils.rate_limiter import current_lane
+
+logger = logging.getLogger(__name__)
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_async_tmdb_client():
+    """Return the process-wide AsyncTMDBClient, wrapping get_tmdb_client()"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_lock:
+            if _shared_client is None:
+                _shared_client = AsyncTMDBClient(get_tmdb_client())
+    return _shared_client
+
+
+class _LoopState:
+    """Per-event-loop resources; httpx clients and asyncio primitives can't cross loops"""
+
+    def __init__(self, client, semaphore):
+        self.client = client
+        self.semaphore = semaphore
+        self.inflight = AsyncSingleFlight()
+
+
+class AsyncTMDBClient:
+    """asyncio counterpart of TMDBClient with the same public methods.
+
+    Shares the sync client's API key, settings, formatters, response cache
+    and RequestPolicy, so caching, stale refreshes (run by the sync client's
+    refresh threads), wait limits and retries are the same for both; only
+    the transport differs. Cache reads and writes block (SQLite by default)
+    and run in the loop's default executor. Requests go through one pooled httpx.AsyncClient
+    per event loop, and a semaphore caps how many are in flight, so
+    ``asyncio.gather`` fan-outs stay bounded. Identical concurrent misses
+    share one upstream request, cancelled only when every caller waiting on
+    it has been cancelled, so cancelling a handler also stops its
+    outstanding TMDB calls.
+    """
+
+    def __init__(self, tmdb_client, max_concurrency=None):
+        self.sync = tmdb_client
+        self.policy = tmdb_client.policy
+        self.genre_mapping = tmdb_client.genre_mapping
+        self.mood_mapping = tmdb_client.mood_mapping
+        self.image_base_url = tmdb_client.image_base_url
+        self.max_concurrency = min(
+            max_concurrency or int(os.getenv('TMDB_ASYNC_CONCURRENCY', tmdb_client.pool_size)),
+            tmdb_client.pool_size
+        )
+        self._states = weakref.WeakKeyDictionary()
+        self.stats = {'requests': 0, 'retries': 0, 'failed': 0}
+
+    def _state(self):
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            client = httpx.AsyncClient(
+                base_url=self.sync.base_url,
+                limits=httpx.Limits(
+                    max_connections=self.sync.pool_size,
+                    max_keepalive_connections=self.sync.pool_size
+                ),
+                timeout=httpx.Timeout(self.sync.read_timeout, connect=self.sync.connect_timeout)
+            )
+            state = _LoopState(client, asyncio.Semaphore(self.max_concurrency))
+            self._states[loop] = state
+        return state
+
+    async def aclose(self):
+        """Close the connection pool of the running loop"""
+        state = self._states.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state.client.aclose()
+
+    def get_stats(self):
+        stats = dict(self.stats, max_concurrency=self.max_concurrency, coalesced=0, cancelled=0)
+        for state in list(self._states.values()):
+            stats['coalesced'] += state.inflight.stats['coalesced']
+            stats['cancelled'] += state.inflight.stats['cancelled']
+        return stats
+
+    async def _make_request(self, endpoint, params=None, use_cache=True):
+        """Async TMDBClient._make_request: cache, stale-while-revalidate, shared misses"""
+        params = dict(params or {})
+        if not use_cache:
+            return await self._fetch(endpoint, params)
+
+        key = self.policy.cache_key(endpoint, params)
+        data, status = await self._blocking(self.policy.lookup, key)
+        if status == FRESH:
+            return data
+        if status == STALE:
+            self.sync._schedule_refresh(key, endpoint, params)
+            return data
+
+        fetched = await self._fetch_shared(key, endpoint, params)
+        return fetched if fetched is not None else data
+
+    async def _fetch_shared(self, key, endpoint, params):
+        """Fetch and cache ``key``, joining an identical request already in flight"""
+        async def fetch_and_store():
+            data = await self._fetch(endpoint, params)
+            if data is not None:
+                await self._blocking(self.policy.store, key, endpoint, data)
+            return data
+
+        return await self._state().inflight.do(
+            key, fetch_and_store, timeout=self.policy.wait_limit(current_lane())
+        )
+
+    async def _blocking(self, fn, *args):
+        """Run a cache or pause-store call off the event loop, in the caller's context"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(contextvars.copy_context().run, fn, *args))
+
+    async def _fetch(self, endpoint, params):
+        state = self._state()
+        params = dict(params)
+        params['api_key'] = self.sync.api_key
+        url = f"/{endpoint}"
+        lane = current_lane()
+        limiter = self.sync.rate_limiter
+        attempt = 0
+
+        while True:
+            if not await limiter.acquire_async(lane, timeout=self.policy.wait_limit(lane)):
+                logger.error(f"Rate limit wait exceeded for {url}")
+                self.stats['failed'] += 1
+                return None
+            status = retry_after = None
+            try:
+                async with state.semaphore:
+                    logger.debug(f"Making async request to: {url}")
+                    self.stats['requests'] += 1
+                    response = await state.client.get(url, params=params)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.json()
+                status = response.status_code
+                retry_after = response.headers.get('Retry-After')
+                error = f"HTTP {status}"
+            except (httpx.HTTPStatusError, ValueError) as e:
+                logger.error(f"Error making request to {url}: {str(e)}")
+                self.stats['failed'] += 1
+                return None
+            except httpx.TransportError as e:
+                error = str(e)
+
+            # A 429 records the pause in the shared store
+            delay = await self._blocking(self.policy.retry_delay, attempt, status, retry_after)
+            if delay is None:
+                logger.error(f"Error making request to {url}: {error}")
+                self.stats['failed'] += 1
+                return None
+            self.stats['retries'] += 1
+            # Sleep outside the semaphore so other requests keep going
+            if delay:
+                await asyncio.sleep(delay)
+            attempt += 1
+
+    async def search_movies(self, query, lite=False):
+        """Search movies; lite mode skips the per-result detail calls"""
+        logger.info(f"Searching for movies with query: {query} (lite={lite})")
+        data = await self._make_request('search/movie', {'query': query})
+
+        if not data or 'results' not in data:
+            logger.error(f"No results found for query: {query}")
+            return []
+
+        if lite:
+            movies = [self.sync._format_movie_summary(movie) for movie in data['results']]
+        else:
+            movies = await self.get_movie_details_batch([movie['id'] for movie in data['results']])
+
+        logger.info(f"Found {len(movies)} movies for query: {query}")
+        return movies
+
+    async def get_movie_details_batch(self, movie_ids):
+        """Fetch details for many movies concurrently (bounded by the semaphore)"""
+        unique_ids = list(dict.fromkeys(movie_ids))
+        if not unique_ids:
+            return []
+
+        logger.info(f"Getting details for {len(unique_ids)} movies in batch")
+        results = await asyncio.gather(*(self.get_movie_details(movie_id) for movie_id in unique_ids))
+        return [movie for movie in results if movie]
+
+    async def get_movie_details(self, movie_id):
+        logger.info(f"Getting details for movie ID: {movie_id}")
+        try:
+            data = await self._make_request(f'movie/{movie_id}', {
+                'append_to_response': 'credits'
+            })
+
+            if not data:
+                logger.error(f"No data found for movie ID: {movie_id}")
+                return None
+
+            return self.sync._format_movie_details(data)
+        except Exception as e:
+            logger.error(f"Error getting movie details: {str(e)}")
+            return None
+
+    async def _get_listing(self, endpoint, formatter, label):
+        data = await self._make_request(endpoint)
+
+        if not data or 'results' not in data:
+            logger.error(f"No {label} found")
+            return []
+
+        movies = []
+        for movie in data['results'][:20]:  # Limit to 20 movies for performance
+            try:
+                movies.append(formatter(movie))
+            except Exception as e:
+                logger.error(f"Error processing movie data: {str(e)}")
+                continue
+
+        logger.info(f"Found {len(movies)} {label}")
+        return movies
+
+    async def get_popular_movies(self):
+        logger.info("Getting popular movies")
+        return await self._get_listing('movie/popular', self.sync._format_listing_movie, 'popular movies')
+
+    async def get_trending_movies(self, time_window='day'):
+        logger.info(f"Getting trending movies for time window: {time_window}")
+        return await self._get_listing(
+            f'trending/movie/{time_window}', self.sync._format_listing_movie, 'trending movies'
+        )
+
+    async def get_new_releases(self):
+        """Get new movie releases from TMDB."""
+        logger.info("Fetching new releases")
+        return await self._get_listing('movie/upcoming', self.sync._format_movie_summary, 'new releases')
+
+    async def get_similar_movies(self, movie_id):
+        logger.info(f"Getting similar movies for movie ID: {movie_id}")
+        data = await self._make_request(f'movie/{movie_id}/similar')
+
+        if not data or 'results' not in data:
+            logger.error(f"No similar movies found for movie ID: {movie_id}")
+            return []
+
+        # Limit to 5 similar movies
+        movies = await self.get_movie_details_batch([movie['id'] for movie in data['results'][:5]])
+
+        logger.info(f"Found {len(movies)} similar movies")
+        return movies
+
+    async def get_movies_by_genre(self, genre_id, page=1):
+        logger.info(f"Getting movies for genre ID: {genre_id}")
+        data = await self._make_request('discover/movie', {
+            'with_genres': genre_id,
+            'page': page,
+            'sort_by': 'popularity.desc'
+        })
+
+        if not data or 'results' not in data:
+            logger.error(f"No movies found for genre ID: {genre_id}")
+            return []
+
+        # Keep the genre order of genre_ids, like TMDBClient.get_movies_by_genre
+        id_to_name = {gid: name.title() for name, gid in self.genre_mapping.items()}
+        movies = []
+        for movie in data['results'][:10]:  # Limit to 10 movies
+            try:
+                movie_data = self.sync._format_movie_summary(movie)
+                movie_data['genres'] = [id_to_name[gid] for gid in movie.get('genre_ids', []) if gid in id_to_name]
+                movies.append(movie_data)
+            except Exception as e:
+                logger.error(f"Error processing movie data: {str(e)}")
+                continue
+
+        logger.info(f"Found {len(movies)} movies for genre ID: {genre_id}")
+        return movies
+
+    async def get_movies_by_genres(self, genre_ids, count=20, sort_by='popularity.desc', year_range=None):
+        """Discover movies in ANY of the given genres (see TMDBClient.get_movies_by_genres)"""
+        genre_ids = sorted(set(genre_ids))  # Same genre set -> same cache key
+        if not genre_ids:
+            return []
+        logger.info(f"Getting up to {count} movies for genre IDs: {genre_ids}")
+
+        movies = []
+        seen_ids = set()
+        page = 1
+        total_pages = 1
+        while len(movies) < count and page <= total_pages:
+            data = await self._make_request(
+                'discover/movie', self.sync._discover_params(genre_ids, sort_by, page, year_range)
+            )
+            if not data or 'results' not in data:
+                logger.error(f"No movies found for genre IDs {genre_ids} on page {page}")
+                break
+
+            total_pages = data.get('total_pages', page)
+            for movie in data['results']:
+                if movie['id'] in seen_ids:
+                    continue
+                try:
+                    movies.append(self.sync._format_movie_summary(movie))
+                    seen_ids.add(movie['id'])
+                except Exception as e:
+                    logger.error(f"Error processing movie data: {str(e)}")
+            page += 1
+
+        logger.info(f"Found {len(movies[:count])} movies for genre IDs {genre_ids} in {page - 1} request(s)")
+        return movies[:count]
+
+    async def get_movie_of_the_day(self):
+        logger.info("Getting movie of the day")
+        popular_movies = await self.get_popular_movies()
+        if not popular_movies:
+            logger.error("No popular movies available for movie of the day")
+            return None
+
+        movie = popular_movies[0]
+        logger.info(f"Selected movie of the day: {movie['title']}")
+        return movie
+
+    async def get_movies_by_mood(self, mood):
+        """Get movies based on mood using genre combinations."""
+        logger.info(f"Getting movies for mood: {mood}")
+
+        if mood not in self.mood_mapping:
+            logger.error(f"Invalid mood: {mood}")
+            return []
+
+        # One discover call per genre, all in flight at once
+        pages = await asyncio.gather(*(
+            self._make_request('discover/movie', {
+                'with_genres': genre_id,
+                'sort_by': 'popularity.desc',
+                'page': 1
+            })
+            for genre_id in self.mood_mapping[mood]
+        ))
+
+        seen_ids = set()
+        candidates = []
+        for data in pages:
+            if data and 'results' in data:
+                for movie in data['results']:
+                    if movie['id'] not in seen_ids:
+                        seen_ids.add(movie['id'])
+                        candidates.append(movie)
+
+        # Rank on the listing's vote_average so only the top 10 need detail calls
+        candidates = sorted(candidates, key=lambda x: x.get('vote_average', 0), reverse=True)[:10]
+        movies = await self.get_movie_details_batch([movie['id'] for movie in candidates])
+        movies = sorted(movies, key=lambda x: x.get('vote_average', 0), reverse=True)
+        logger.info(f"Found {len(movies)} movies for mood: {mood}")
+        return movies
+
+    async def get_movies_by_genre_name(self, genre_name):
+        """Get movies by genre name."""
+        logger.info(f"Getting movies for genre: {genre_name}")
+
+        genre_id = self.genre_mapping.get(genre_name.lower())
+        if not genre_id:
+            logger.error(f"Invalid genre: {genre_name}")
+            return []
+
+        return await self.get_movies_by_genre(genre_id)
@@ -0,0 +1,99 @@
+import os
+import random
+import threading
+import time
+import logging
+from functools import partial
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWarmer:
+    """Keep the hot TMDB responses in the cache fresh in the background.
+
+    Every ``interval`` seconds (plus random jitter, so workers drift apart)
+    each job re-runs its TMDBClient method inside ``tmdb_client.warming()``.
+    Only upstream responses that would go stale before the next pass are
+    re-fetched, so requests always find a fresh entry. Each job first takes
+    a lease in the cache backend; with the shared SQLite cache only one
+    worker on the host refreshes a given key per pass.
+    """
+
+    def __init__(self, tmdb_client, interval=None, jitter=None, mood_genres=None):
+        self.tmdb_client = tmdb_client
+        # Mood tables whose OR-ed discover queries the endpoints run, beyond tmdb_client.mood_mapping
+        self.mood_genres = mood_genres or {}
+        self.interval = interval or float(os.getenv('CACHE_WARMER_INTERVAL', 300))
+        self.jitter = jitter if jitter is not None else float(os.getenv('CACHE_WARMER_JITTER', 0.1))
+        # Refresh anything that would expire before the next pass (worst-case jitter included)
+        self.horizon = self.interval * (1 + self.jitter) * 1.5
+        self.jobs = self._default_jobs()
+        self.stats = {'passes': 0, 'refreshed': 0, 'skipped': 0, 'failed': 0, 'last_pass_seconds': 0.0}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _default_jobs(self):
+        """Warm exactly what the endpoints read; nothing else is worth the upstream calls"""
+        client = self.tmdb_client
+        # /api/movie-of-the-day is served from the popular listing
+        jobs = {
+            'popular': client.get_popular_movies,
+            'trending': client.get_trending_movies,
+            'new-releases': client.get_new_releases
+        }
+        # Page 1 of a single-genre discover: the genre routes and the chat genre lookups
+        for genre, genre_id in client.genre_mapping.items():
+            jobs[f'genre:{genre}'] = partial(client.get_movies_by_genres, [genre_id], count=10)
+        # One OR-ed discover per mood, as MovieRecommender.get_recommendations(mood=...)
+        # runs it for the mood buttons, /api/recommendations and chat mood requests
+        # (keyed by genre set: both tables have a 'romantic', with different genres)
+        for genre_ids in list(self.mood_genres.values()) + list(client.mood_mapping.values()):
+            name = f"mood:{'|'.join(str(genre_id) for genre_id in sorted(set(genre_ids)))}"
+            jobs[name] = partial(client.get_movies_by_genres, genre_ids, count=20)
+        # /api/movie/<id> for the movies on the home page listings (runs after those jobs)
+        jobs['listing-details'] = self._warm_listing_details
+        return jobs
+
+    def _warm_listing_details(self):
+        movies = self.tmdb_client.get_popular_movies() + self.tmdb_client.get_trending_movies()
+        self.tmdb_client.get_movie_details_batch([movie['id'] for movie in movies])
+
+    def start(self):
+        """Start the background thread (idempotent; call again after a fork)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='tmdb-cache-warmer', daemon=True)
+        self._thread.start()
+        logger.info(f"Cache warmer started: {len(self.jobs)} jobs every ~{self.interval:.0f}s")
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        """Run every job once, skipping keys another worker is already refreshing"""
+        start = time.time()
+        for name, job in self.jobs.items():
+            if self._stop.is_set():
+                break
+            if not self.tmdb_client.cache.acquire_lease(f"warm:{name}", self.interval / 2):
+                self.stats['skipped'] += 1
+                continue
+            try:
+                with self.tmdb_client.warming(self.horizon):
+                    job()
+                self.stats['refreshed'] += 1
+            except Exception as e:
+                self.stats['failed'] += 1
+                logger.error(f"Cache warmer job {name} failed: {str(e)}")
+        self.stats['passes'] += 1
+        self.stats['last_pass_seconds'] = round(time.time() - start, 3)
+
+    def _run(self):
+        # Spread workers out before the first pass
+        if self._stop.wait(random.uniform(0, self.interval * self.jitter)):
+            return
+        while not self._stop.is_set():
+            self.run_once()
+            delay = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+            self._stop.wait(delay)
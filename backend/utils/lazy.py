@@ -0,0 +1,71 @@
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Modules that dominate worker boot time and are only needed by the TF-IDF and AI paths
+HEAVY_MODULES = (
+    'numpy',
+    'pandas',
+    'scipy.sparse',
+    'sklearn.feature_extraction.text',
+    'google.generativeai'
+)
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access.
+
+    ``np = lazy_import('numpy')`` at the top of a file keeps the usual
+    ``np.zeros(...)`` spelling while moving the import cost to the first
+    request that actually needs it.
+    """
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+        self.__dict__['_lock'] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with self.__dict__['_lock']:
+                module = self.__dict__['_module']
+                if module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    logger.info(f"Imported {self._name} on first use in {time.perf_counter() - start:.2f}s")
+                    self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    """Return a LazyModule for ``name`` (dotted names give the submodule, e.g. 'scipy.sparse')"""
+    return LazyModule(name)
+
+
+def preload(names=HEAVY_MODULES):
+    """Import ``names`` now, e.g. in the gunicorn master so forked workers share them copy-on-write"""
+    timings = {}
+    for name in names:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Could not preload {name}: {str(e)}")
+            continue
+        timings[name] = round(time.perf_counter() - start, 3)
+    logger.info(f"Preloaded heavy modules: {timings}")
+    return timings
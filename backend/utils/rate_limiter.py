@@ -0,0 +1,210 @@
+import asyncio
+import os
+import time
+import threading
+import logging
+import contextvars
+from contextlib import contextmanager, asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+# Lane of the current request; the warmer, stale refreshes and corpus
+# ingestion switch to BACKGROUND, everything else is a user request
+_lane = contextvars.ContextVar('tmdb_rate_lane', default=INTERACTIVE)
+
+
+@contextmanager
+def priority_lane(lane):
+    """Run the block's TMDB calls in ``lane`` (INTERACTIVE or BACKGROUND)"""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane():
+    return _lane.get()
+
+
+class RateLimiter:
+    """Token bucket shared by every TMDB call in the process, with priority lanes.
+
+    Tokens refill at ``rate`` per second up to ``burst``. Background callers
+    never take the last ``reserve`` fraction of the bucket (though always
+    leave them a whole token to take, however small the bucket) and always
+    yield to interactive callers that are waiting, so warming and ingestion
+    only use spare capacity. A 429 empties the bucket and pauses everyone until
+    its Retry-After has passed; with a shared ``store`` (the SQLite cache)
+    the pause reaches every worker on the host, and ``rate`` is this
+    worker's share of the budget.
+    """
+
+    def __init__(self, rate=None, burst=None, reserve=None, workers=None, store=None,
+                 sync_interval=0.5):
+        workers = workers or int(os.getenv('WEB_CONCURRENCY', 1))
+        self.rate = (rate or float(os.getenv('TMDB_RATE_LIMIT', 40))) / max(workers, 1)
+        self.burst = burst or max(float(os.getenv('TMDB_RATE_LIMIT_BURST', self.rate)), 1.0)
+        reserve = reserve if reserve is not None else float(os.getenv('TMDB_RATE_LIMIT_RESERVE', 0.25))
+        # A bucket that never holds reserve + 1 tokens would starve background callers
+        self.reserve_tokens = min(self.burst * reserve, self.burst - 1)
+        self.store = store
+        self.sync_interval = sync_interval
+
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0  # wall clock, so it can be shared between processes
+        self._synced_at = 0.0
+        self._interactive_waiting = 0
+        self._cond = threading.Condition()
+        self.stats = {'acquired': 0, 'waited': 0, 'wait_seconds': 0.0, 'throttled': 0, 'timeouts': 0}
+
+    def _pause_sync_due(self):
+        """True when the shared pause should be read again (at most every sync_interval)"""
+        if self.store is None:
+            return False
+        now = time.monotonic()
+        if now - self._synced_at < self.sync_interval:
+            return False
+        self._synced_at = now
+        return True
+
+    def _sync_pause(self):
+        if self._pause_sync_due():
+            self._read_pause()
+
+    def _read_pause(self):
+        """Pick up a pause another worker recorded"""
+        paused_until = self.store.get_pause('tmdb')
+        if paused_until:
+            with self._cond:
+                self._paused_until = max(self._paused_until, paused_until)
+
+    def _reserve(self, lane):
+        """Take a token (returns 0) or return how long to wait before retrying; holds the lock"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+        pause = self._paused_until - time.time()
+        if pause > 0:
+            return pause
+        floor = 0.0
+        if lane == BACKGROUND:
+            if self._interactive_waiting:
+                return 1.0 / self.rate
+            floor = self.reserve_tokens
+        if self._tokens - floor >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (floor + 1 - self._tokens) / self.rate
+
+    def acquire(self, lane=None, timeout=None):
+        """Block until a token is available; False if ``timeout`` seconds pass first"""
+        lane = lane or _lane.get()
+        self._sync_pause()
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        with self._cond:
+            wait = self._reserve(lane)
+            if wait:
+                if lane == INTERACTIVE:
+                    self._interactive_waiting += 1
+                try:
+                    while wait:
+                        if deadline is not None:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                self.stats['timeouts'] += 1
+                                return False
+                            wait = min(wait, remaining)
+                        self._cond.wait(wait)
+                        wait = self._reserve(lane)
+                finally:
+                    if lane == INTERACTIVE:
+                        self._interactive_waiting -= 1
+                self._record_wait(time.monotonic() - start)
+            self.stats['acquired'] += 1
+            return True
+
+    @asynccontextmanager
+    async def _locked(self):
+        """Hold the lock without ever blocking the event loop on it"""
+        # Holders only do arithmetic, so the lock frees up within a loop turn or two
+        while not self._cond.acquire(blocking=False):
+            await asyncio.sleep(0)
+        try:
+            yield
+        finally:
+            self._cond.release()
+
+    async def acquire_async(self, lane=None, timeout=None):
+        """acquire() for coroutines: waits (and reads the shared pause) without blocking the loop"""
+        lane = lane or _lane.get()
+        if self._pause_sync_due():
+            await asyncio.get_running_loop().run_in_executor(None, self._read_pause)
+        start = time.monotonic()
+        async with self._locked():
+            wait = self._reserve(lane)
+            if not wait:
+                self.stats['acquired'] += 1
+                return True
+            if lane == INTERACTIVE:
+                self._interactive_waiting += 1
+        try:
+            while wait:
+                if timeout is not None:
+                    remaining = start + timeout - time.monotonic()
+                    if remaining <= 0:
+                        async with self._locked():
+                            self.stats['timeouts'] += 1
+                        return False
+                    wait = min(wait, remaining)
+                await asyncio.sleep(wait)
+                async with self._locked():
+                    wait = self._reserve(lane)
+        finally:
+            if lane == INTERACTIVE:
+                async with self._locked():
+                    self._interactive_waiting -= 1
+        async with self._locked():
+            self._record_wait(time.monotonic() - start)
+            self.stats['acquired'] += 1
+        return True
+
+    def _record_wait(self, seconds):
+        self.stats['waited'] += 1
+        self.stats['wait_seconds'] = round(self.stats['wait_seconds'] + seconds, 3)
+
+    def throttle(self, retry_after):
+        """Back off after a 429: empty the bucket and pause for ``retry_after`` seconds"""
+        paused_until = time.time() + retry_after
+        with self._cond:
+            self.stats['throttled'] += 1
+            self._tokens = 0.0
+            self._paused_until = max(self._paused_until, paused_until)
+            self._cond.notify_all()
+        logger.warning(f"TMDB rate limit hit; pausing requests for {retry_after:.1f}s")
+        if self.store is not None:
+            self.store.set_pause('tmdb', paused_until)
+
+    def get_stats(self):
+        with self._cond:
+            return dict(
+                self.stats,
+                rate=self.rate,
+                burst=self.burst,
+                tokens=round(self._tokens, 2),
+                paused_for=round(max(self._paused_until - time.time(), 0.0), 3)
+            )
+
+
+def parse_retry_after(value, default):
+    """Seconds from a Retry-After header (delta-seconds form), else ``default``"""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return default
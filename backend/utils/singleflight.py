@@ -0,0 +1,116 @@
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait and receive the same result (or exception). A caller
+    that passes ``timeout`` stops waiting after that many seconds and runs
+    ``fn`` itself, so it is never held up by a slow or low-priority leader.
+    ``coalesced`` counts the callers that got the shared outcome, so
+    ``executions + timeouts`` is the number of times ``fn`` ran. Nothing is remembered once the call finishes; caching is a separate
+    concern.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {'executions': 0, 'coalesced': 0, 'timeouts': 0}
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.stats['executions'] += 1
+                leader = True
+
+        if not leader:
+            if not call.event.wait(timeout):
+                with self._lock:
+                    self.stats['timeouts'] += 1
+                return fn()
+            with self._lock:
+                self.stats['coalesced'] += 1
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class _Flight:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop.
+
+    ``do(key, fn, timeout)`` behaves like SingleFlight.do, with ``fn``
+    returning an awaitable. The shared call runs as a task that every caller
+    awaits shielded, so one cancelled caller doesn't fail the others; the
+    task is cancelled only once every caller waiting on it is gone.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.stats = {'executions': 0, 'coalesced': 0, 'timeouts': 0, 'cancelled': 0}
+
+    async def do(self, key, fn, timeout=None):
+        flight = self._calls.get(key)
+        leader = flight is None
+        if leader:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._calls[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.stats['executions'] += 1
+
+        flight.waiters += 1
+        try:
+            if leader:
+                return await asyncio.shield(flight.task)
+            # asyncio.wait neither cancels the task nor raises on timeout
+            done, _ = await asyncio.wait({flight.task}, timeout=timeout)
+            if done:
+                self.stats['coalesced'] += 1
+                return flight.task.result()
+            self.stats['timeouts'] += 1
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+                self.stats['cancelled'] += 1
+            raise
+        finally:
+            flight.waiters -= 1
+        return await fn()
+
+    def _forget(self, key, flight):
+        if self._calls.get(key) is flight:
+            del self._calls[key]
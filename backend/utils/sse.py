@@ -0,0 +1,12 @@
+import json
+
+# Keep proxies (and nginx in particular) from buffering the stream
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+
+def sse_event(data):
+    """Encode one server-sent event carrying ``data`` as JSON"""
+    return f"data: {json.dumps(data)}\n\n"
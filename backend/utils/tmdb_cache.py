@@ -0,0 +1,422 @@
+import json
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (fresh TTL, extra stale window) in seconds per endpoint class. Within the
+# stale window an entry is still served while a refresh runs in the background.
+DEFAULT_TTLS = {
+    'details': (6 * 3600, 24 * 3600),
+    'similar': (6 * 3600, 24 * 3600),
+    'discover': (3600, 6 * 3600),
+    'upcoming': (3600, 6 * 3600),
+    'popular': (30 * 60, 2 * 3600),
+    'trending': (10 * 60, 3600),
+    'search': (10 * 60, 30 * 60),
+    'default': (5 * 60, 15 * 60)
+}
+
+_ENDPOINT_CLASSES = [
+    (re.compile(r'^movie/\d+$'), 'details'),
+    (re.compile(r'^movie/\d+/similar$'), 'similar'),
+    (re.compile(r'^discover/'), 'discover'),
+    (re.compile(r'^movie/upcoming$'), 'upcoming'),
+    (re.compile(r'^movie/popular$'), 'popular'),
+    (re.compile(r'^trending/'), 'trending'),
+    (re.compile(r'^search/'), 'search')
+]
+
+
+def classify_endpoint(endpoint):
+    """Map a TMDB endpoint path to its TTL class"""
+    for pattern, name in _ENDPOINT_CLASSES:
+        if pattern.match(endpoint):
+            return name
+    return 'default'
+
+
+def make_cache_key(endpoint, params):
+    """Build a stable cache key from an endpoint and its query params"""
+    items = sorted((k, str(v)) for k, v in (params or {}).items() if k != 'api_key')
+    query = '&'.join(f"{k}={v}" for k, v in items)
+    return f"{endpoint}?{query}"
+
+
+class CacheEntry:
+    __slots__ = ('value', 'size', 'fresh_until', 'stale_until')
+
+    def __init__(self, value, size, fresh_until, stale_until):
+        self.value = value
+        self.size = size
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class MemoryCache:
+    """In-process LRU cache bounded by entry count and approximate bytes"""
+
+    def __init__(self, max_entries=2048, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0, 'expired': 0}
+        self._leases = {}
+        self._pauses = {}
+
+    def expires_in(self, key):
+        """Seconds until the entry stops being fresh (negative once stale), or None if absent"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry.fresh_until - time.time()
+
+    def acquire_lease(self, name, ttl):
+        """Claim ``name`` for ``ttl`` seconds; False while someone else holds it"""
+        now = time.time()
+        with self._lock:
+            if self._leases.get(name, 0) > now:
+                return False
+            self._leases[name] = now + ttl
+            return True
+
+    def set_pause(self, name, until):
+        """Record that ``name`` (e.g. upstream calls) is paused until the given epoch time"""
+        with self._lock:
+            self._pauses[name] = max(self._pauses.get(name, 0), until)
+
+    def get_pause(self, name):
+        """Epoch time ``name`` is paused until, or None"""
+        with self._lock:
+            return self._pauses.get(name)
+
+    def lookup(self, key):
+        """Return (value, is_fresh); value is None on a miss or a fully expired entry"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None, False
+            if now >= entry.stale_until:
+                self._remove(key)
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None, False
+            self._entries.move_to_end(key)
+            if now < entry.fresh_until:
+                self._stats['hits'] += 1
+                return entry.value, True
+            self._stats['stale_hits'] += 1
+            return entry.value, False
+
+    def set(self, key, value, ttl, stale_ttl=0):
+        size = len(json.dumps(value, separators=(',', ':')))
+        if size > self.max_bytes:
+            logger.debug(f"Not caching {key}: {size} bytes exceeds cache budget")
+            return
+        now = time.time()
+        entry = CacheEntry(value, size, now + ttl, now + ttl + stale_ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += size
+            self._stats['sets'] += 1
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        stats['backend'] = 'memory'
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+
+class SQLiteCache:
+    """Cache stored in a local SQLite file shared by every worker on the host.
+
+    The database runs in WAL mode so readers never block the writer, and each
+    write is a single transaction, so a reader sees either the old or the new
+    response, never a partial one. Each thread opens its own connection.
+    """
+
+    def __init__(self, path, max_entries=20000, max_bytes=256 * 1024 * 1024, prune_every=200):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sets_since_prune = 0
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0, 'expired': 0}
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS tmdb_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                fresh_until REAL NOT NULL,
+                stale_until REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_tmdb_cache_accessed ON tmdb_cache (accessed_at)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_leases (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_pauses (
+                name TEXT PRIMARY KEY,
+                until REAL NOT NULL
+            )
+        ''')
+
+    def _connection(self):
+        # Connections must not cross a fork, so they are keyed by pid as well as thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=5000')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def expires_in(self, key):
+        """Seconds until the entry stops being fresh (negative once stale), or None if absent"""
+        try:
+            row = self._connection().execute(
+                'SELECT fresh_until FROM tmdb_cache WHERE key = ?', (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"SQLite cache read failed for {key}: {str(e)}")
+            return None
+        return None if row is None else row[0] - time.time()
+
+    def acquire_lease(self, name, ttl):
+        """Claim ``name`` for ``ttl`` seconds across all workers sharing the file.
+
+        Returns False while another process holds an unexpired lease.
+        """
+        owner = f"{socket.gethostname()}:{os.getpid()}"
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    'SELECT owner, expires_at FROM cache_leases WHERE name = ?', (name,)
+                ).fetchone()
+                if row is not None and row[1] > now and row[0] != owner:
+                    conn.execute('COMMIT')
+                    return False
+                conn.execute(
+                    'INSERT OR REPLACE INTO cache_leases (name, owner, expires_at) VALUES (?, ?, ?)',
+                    (name, owner, now + ttl)
+                )
+                conn.execute('COMMIT')
+                return True
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            logger.error(f"SQLite lease failed for {name}: {str(e)}")
+            return False
+
+    def set_pause(self, name, until):
+        """Record a pause visible to every worker sharing the file (never shortens one)"""
+        try:
+            self._connection().execute(
+                'INSERT INTO cache_pauses (name, until) VALUES (?, ?) '
+                'ON CONFLICT(name) DO UPDATE SET until = MAX(until, excluded.until)',
+                (name, until)
+            )
+        except sqlite3.Error as e:
+            logger.error(f"SQLite pause write failed for {name}: {str(e)}")
+
+    def get_pause(self, name):
+        """Epoch time ``name`` is paused until, or None"""
+        try:
+            row = self._connection().execute(
+                'SELECT until FROM cache_pauses WHERE name = ?', (name,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"SQLite pause read failed for {name}: {str(e)}")
+            return None
+        return None if row is None else row[0]
+
+    def lookup(self, key):
+        """Return (value, is_fresh); value is None on a miss or a fully expired entry"""
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                'SELECT value, fresh_until, stale_until, accessed_at FROM tmdb_cache WHERE key = ?',
+                (key,)
+            ).fetchone()
+            if row is None:
+                self._count('misses')
+                return None, False
+            value, fresh_until, stale_until, accessed_at = row
+            if now >= stale_until:
+                conn.execute('DELETE FROM tmdb_cache WHERE key = ? AND stale_until <= ?', (key, now))
+                self._count('expired')
+                self._count('misses')
+                return None, False
+            # Approximate LRU: only touch the row once a minute to keep reads cheap
+            if now - accessed_at > 60:
+                conn.execute('UPDATE tmdb_cache SET accessed_at = ? WHERE key = ?', (now, key))
+            self._count('hits' if now < fresh_until else 'stale_hits')
+            return json.loads(value), now < fresh_until
+        except sqlite3.Error as e:
+            logger.error(f"SQLite cache read failed for {key}: {str(e)}")
+            self._count('misses')
+            return None, False
+
+    def set(self, key, value, ttl, stale_ttl=0):
+        payload = json.dumps(value, separators=(',', ':'))
+        if len(payload) > self.max_bytes:
+            logger.debug(f"Not caching {key}: {len(payload)} bytes exceeds cache budget")
+            return
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO tmdb_cache (key, value, size, fresh_until, stale_until, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, payload, len(payload), now + ttl, now + ttl + stale_ttl, now)
+            )
+        except sqlite3.Error as e:
+            logger.error(f"SQLite cache write failed for {key}: {str(e)}")
+            return
+        
+        with self._lock:
+            self._stats['sets'] += 1
+            self._sets_since_prune += 1
+            prune = self._sets_since_prune >= self.prune_every
+            if prune:
+                self._sets_since_prune = 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Drop expired rows, then least recently used rows beyond the bounds"""
+        try:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                expired = conn.execute('DELETE FROM tmdb_cache WHERE stale_until <= ?', (time.time(),)).rowcount
+                count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tmdb_cache').fetchone()
+                evicted = 0
+                if count > self.max_entries or total > self.max_bytes:
+                    for key, size in conn.execute(
+                        'SELECT key, size FROM tmdb_cache ORDER BY accessed_at'
+                    ).fetchall():
+                        if count <= self.max_entries and total <= self.max_bytes:
+                            break
+                        conn.execute('DELETE FROM tmdb_cache WHERE key = ?', (key,))
+                        count -= 1
+                        total -= size
+                        evicted += 1
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            with self._lock:
+                self._stats['expired'] += expired
+                self._stats['evictions'] += evicted
+        except sqlite3.Error as e:
+            logger.error(f"SQLite cache prune failed: {str(e)}")
+
+    def delete(self, key):
+        try:
+            self._connection().execute('DELETE FROM tmdb_cache WHERE key = ?', (key,))
+        except sqlite3.Error as e:
+            logger.error(f"SQLite cache delete failed for {key}: {str(e)}")
+
+    def clear(self):
+        try:
+            self._connection().execute('DELETE FROM tmdb_cache')
+        except sqlite3.Error as e:
+            logger.error(f"SQLite cache clear failed: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        try:
+            count, total = self._connection().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tmdb_cache'
+            ).fetchone()
+        except sqlite3.Error:
+            count, total = None, None
+        stats['entries'] = count
+        stats['bytes'] = total
+        stats['backend'] = 'sqlite'
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'tmdb_cache.sqlite3')
+
+
+def create_cache():
+    """Build the cache backend selected by TMDB_CACHE_BACKEND ('sqlite' or 'memory')"""
+    backend = os.getenv('TMDB_CACHE_BACKEND', 'sqlite').lower()
+    max_entries = os.getenv('TMDB_CACHE_MAX_ENTRIES')
+    max_bytes = os.getenv('TMDB_CACHE_MAX_BYTES')
+    if backend == 'sqlite':
+        try:
+            cache = SQLiteCache(
+                os.getenv('TMDB_CACHE_PATH', DEFAULT_CACHE_PATH),
+                max_entries=int(max_entries or 20000),
+                max_bytes=int(max_bytes or 256 * 1024 * 1024)
+            )
+            logger.info(f"Using shared SQLite TMDB cache at {cache.path}")
+            return cache
+        except (sqlite3.Error, OSError) as e:
+            logger.error(f"Could not open SQLite cache, falling back to memory: {str(e)}")
+    return MemoryCache(
+        max_entries=int(max_entries or 2048),
+        max_bytes=int(max_bytes or 64 * 1024 * 1024)
+    )
@@ -1,9 +1,18 @@
-from tmdbv3api import TMDb, Movie
 import os
 from dotenv import load_dotenv
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import contextvars
+import threading
+import time
 from datetime import datetime, timedelta
 import logging
+from utils.tmdb_cache import create_cache
+from utils.tmdb_policy import RequestPolicy, RETRY_STATUSES, FRESH, STALE, _refresh_horizon
+from utils.singleflight import SingleFlight
+from utils.rate_limiter import RateLimiter, priority_lane, current_lane, BACKGROUND
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -11,9 +20,24 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+# One client (connection pool, cache, rate limiter) per worker process; see get_tmdb_client()
+_shared_client = None
+_shared_lock = threading.Lock()
+
+def get_tmdb_client():
+    """Return the process-wide TMDBClient, created from TMDB_API_KEY on first use"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_lock:
+            if _shared_client is None:
+                _shared_client = TMDBClient(os.getenv('TMDB_API_KEY'))
+    return _shared_client
+
 class TMDBClient:
-    def __init__(self, api_key: str):
-        """Initialize TMDB client with API key"""
+    def __init__(self, api_key: str, pool_size=None, connect_timeout=None,
+                 read_timeout=None, max_retries=None, backoff_factor=None,
+                 detail_concurrency=None, cache=None, cache_ttls=None, rate_limiter=None):
+        """Initialize TMDB client with API key and a pooled HTTP session"""
         self.api_key = api_key
         self.base_url = "https://api.themoviedb.org/3"
         self.genre_mapping = {
@@ -59,51 +83,302 @@ class TMDBClient:
             'dark': [27, 53, 80],  # Horror, Thriller, Crime
             'lighthearted': [35, 10751]  # Comedy, Family
         }
-        self.tmdb = TMDb()
-        self.tmdb.api_key = self.api_key
-        self.tmdb.language = 'en-US'
-        self.movie_api = Movie()
         self.image_base_url = "https://image.tmdb.org/t/p/w500"
         
         if not self.api_key:
             logger.error("TMDB API key not found in environment variables")
             raise ValueError("TMDB API key not found")
         
+        # HTTP session settings (constructor arguments win over environment)
+        self.pool_size = pool_size or int(os.getenv('TMDB_POOL_SIZE', 20))
+        self.connect_timeout = connect_timeout or float(os.getenv('TMDB_CONNECT_TIMEOUT', 3.05))
+        self.read_timeout = read_timeout or float(os.getenv('TMDB_READ_TIMEOUT', 10))
+        self.session = self._create_session()
+        
+        # Shared fan-out pool for batched detail fetches; never larger than the connection pool
+        self.detail_concurrency = min(
+            detail_concurrency or int(os.getenv('TMDB_DETAIL_CONCURRENCY', 8)),
+            self.pool_size
+        )
+        self._executor = self._create_detail_executor()
+        
+        # Response cache with a TTL per endpoint class and stale-while-revalidate.
+        # Any object with lookup/set/delete/clear/stats works; see utils.tmdb_cache.
+        self.cache = cache or create_cache()
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='tmdb-refresh')
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        
+        # Concurrent identical requests share one upstream call
+        self._inflight = SingleFlight()
+        
+        # Client-side rate limiting; 429s pause every worker sharing the cache file
+        self.rate_limiter = rate_limiter or RateLimiter(store=self.cache)
+        
+        # Caching, wait limits and retries, shared with AsyncTMDBClient
+        self.policy = RequestPolicy(
+            self.cache, self.rate_limiter, cache_ttls=cache_ttls,
+            max_retries=max_retries, backoff_factor=backoff_factor
+        )
+        
         logger.info(f"TMDB client initialized with API key: {self.api_key[:5]}...")
 
-    def _make_request(self, endpoint, params=None):
-        if params is None:
-            params = {}
+    def _create_detail_executor(self):
+        return ThreadPoolExecutor(
+            max_workers=self.detail_concurrency,
+            thread_name_prefix='tmdb-detail'
+        )
+
+    def after_fork(self):
+        """Give a forked worker its own sockets and threads (see gunicorn_config.post_fork)"""
+        self.session = self._create_session()
+        self._executor = self._create_detail_executor()
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='tmdb-refresh')
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+
+    def _create_session(self):
+        """Create a keep-alive session with a bounded connection pool"""
+        adapter = HTTPAdapter(
+            pool_connections=1,  # All calls go to a single host
+            pool_maxsize=self.pool_size,
+            pool_block=True,
+            max_retries=0  # _fetch retries, as RequestPolicy decides
+        )
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def get_connection_stats(self):
+        """Return connection reuse counters from the session's urllib3 pools"""
+        requests_sent = 0
+        handshakes = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                requests_sent += pool.num_requests
+                handshakes += pool.num_connections
+        return {
+            'requests': requests_sent,
+            'handshakes': handshakes,
+            'pool_hits': max(requests_sent - handshakes, 0),
+            'pool_size': self.pool_size
+        }
+
+    def get_stats(self):
+        """Return runtime counters for the metrics endpoint"""
+        return {
+            'connections': self.get_connection_stats(),
+            'cache': self.cache.stats(),
+            'rate_limit': self.rate_limiter.get_stats(),
+            'coalescing': {
+                # A follower that timed out made its own call
+                'upstream_calls': self._inflight.stats['executions'] + self._inflight.stats['timeouts'],
+                'upstream_calls_saved': self._inflight.stats['coalesced']
+            }
+        }
+
+    def _make_request(self, endpoint, params=None, use_cache=True):
+        """GET an endpoint through the response cache.
+
+        Fresh entries are returned directly. Stale entries are returned too,
+        with a single background refresh scheduled for the key, so a hot key
+        never waits on TMDB. Misses go through single-flight, so concurrent
+        callers for the same key share one upstream request. Failed requests
+        are not cached.
+        """
+        params = dict(params or {})
+        if not use_cache:
+            return self._fetch(endpoint, params)
         
+        key = self.policy.cache_key(endpoint, params)
+        data, status = self.policy.lookup(key)
+        if status == FRESH:
+            return data
+        if status == STALE:
+            self._schedule_refresh(key, endpoint, params)
+            return data
+        
+        fetched = self._fetch_shared(key, endpoint, params)
+        return fetched if fetched is not None else data
+
+    def _fetch_shared(self, key, endpoint, params):
+        """Fetch and cache ``key``, joining an identical request already in flight
+
+        A user request waits at most rate_limit_wait for the shared request
+        (which may be a background one, yielding to every user request)
+        before fetching on its own.
+        """
+        def fetch_and_store():
+            data = self._fetch(endpoint, params)
+            if data is not None:
+                self.policy.store(key, endpoint, data)
+            return data
+        
+        return self._inflight.do(key, fetch_and_store, timeout=self.policy.wait_limit(current_lane()))
+
+    @contextmanager
+    def warming(self, horizon):
+        """Within this block, re-fetch any entry that expires within ``horizon`` seconds
+
+        Calls made here run in the background rate-limit lane.
+        """
+        token = _refresh_horizon.set(horizon)
+        try:
+            with priority_lane(BACKGROUND):
+                yield
+        finally:
+            _refresh_horizon.reset(token)
+
+    def _map(self, fn, items):
+        """executor.map that carries the caller's context (e.g. warming) into the pool"""
+        context = contextvars.copy_context()
+        return self._executor.map(lambda item: context.copy().run(fn, item), items)
+
+    def _fetch(self, endpoint, params):
+        params = dict(params)
         params['api_key'] = self.api_key
         url = f"{self.base_url}/{endpoint}"
+        lane = current_lane()
+        attempt = 0
         
-        try:
-            logger.debug(f"Making request to: {url}")
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error making request to {url}: {str(e)}")
-            return None
+        while True:
+            if not self.rate_limiter.acquire(lane, timeout=self.policy.wait_limit(lane)):
+                logger.error(f"Rate limit wait exceeded for {url}")
+                return None
+            status = retry_after = None
+            try:
+                logger.debug(f"Making request to: {url}")
+                response = self.session.get(
+                    url,
+                    params=params,
+                    timeout=(self.connect_timeout, self.read_timeout)
+                )
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.json()
+                status = response.status_code
+                retry_after = response.headers.get('Retry-After')
+                error = f"HTTP {status}"
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = str(e)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                logger.error(f"Error making request to {url}: {str(e)}")
+                return None
+            
+            delay = self.policy.retry_delay(attempt, status, retry_after)
+            if delay is None:
+                logger.error(f"Error making request to {url}: {error}")
+                return None
+            time.sleep(delay)
+            attempt += 1
+
+    def _schedule_refresh(self, key, endpoint, params):
+        """Refresh a stale entry in the background, at most once per key at a time"""
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        
+        def refresh():
+            try:
+                with priority_lane(BACKGROUND):
+                    self._fetch_shared(key, endpoint, params)
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+        
+        self._refresh_executor.submit(refresh)
 
-    def search_movies(self, query):
-        logger.info(f"Searching for movies with query: {query}")
+    def search_movies(self, query, lite=False):
+        """Search movies; lite mode skips the per-result detail calls"""
+        logger.info(f"Searching for movies with query: {query} (lite={lite})")
         data = self._make_request('search/movie', {'query': query})
         
         if not data or 'results' not in data:
             logger.error(f"No results found for query: {query}")
             return []
         
-        movies = []
-        for movie in data['results']:
-            movie_data = self.get_movie_details(movie['id'])
-            if movie_data:
-                movies.append(movie_data)
+        if lite:
+            movies = [self._format_movie_summary(movie) for movie in data['results']]
+        else:
+            movies = self.get_movie_details_batch([movie['id'] for movie in data['results']])
         
         logger.info(f"Found {len(movies)} movies for query: {query}")
         return movies
 
+    def get_movie_details_batch(self, movie_ids):
+        """Fetch details for many movies concurrently.
+
+        Duplicate IDs are fetched once, results keep the order of first
+        appearance, and movies whose details can't be loaded are dropped.
+        """
+        unique_ids = list(dict.fromkeys(movie_ids))
+        if not unique_ids:
+            return []
+        
+        logger.info(f"Getting details for {len(unique_ids)} movies in batch")
+        results = self._map(self.get_movie_details, unique_ids)
+        return [movie for movie in results if movie]
+
+    def _format_movie_summary(self, movie):
+        """Shape a list/search result like the other listing endpoints"""
+        genre_names = [
+            name.title() for name, gid in self.genre_mapping.items()
+            if gid in movie.get('genre_ids', [])
+        ]
+        return {
+            'id': movie['id'],
+            'title': movie.get('title'),
+            'overview': movie.get('overview'),
+            'poster_path': movie.get('poster_path'),
+            'release_date': movie.get('release_date'),
+            'vote_average': movie.get('vote_average', 0),
+            'genres': genre_names
+        }
+
+    def _format_movie_details(self, data):
+        """Shape a movie/<id>?append_to_response=credits payload for the API"""
+        # Get cast information
+        cast = []
+        if 'credits' in data and 'cast' in data['credits']:
+            for actor in data['credits']['cast'][:5]:  # Get top 5 cast members
+                cast.append({
+                    'name': actor['name'],
+                    'character': actor['character'],
+                    'profile_path': actor['profile_path'] if actor['profile_path'] else None
+                })
+        
+        return {
+            'id': data['id'],
+            'title': data['title'],
+            'overview': data['overview'],
+            'poster_path': data.get('poster_path'),  # Return just the path
+            'release_date': data.get('release_date'),
+            'vote_average': data.get('vote_average'),
+            'runtime': data.get('runtime', 0),
+            'genres': [genre['name'] for genre in data.get('genres', [])],
+            'credits': {
+                'cast': cast
+            }
+        }
+
+    def _format_listing_movie(self, movie):
+        """Shape a popular/trending result"""
+        return {
+            'id': movie['id'],
+            'title': movie['title'],
+            'overview': movie['overview'],
+            'poster_path': movie.get('poster_path'),
+            'release_date': movie.get('release_date'),
+            'vote_average': movie.get('vote_average', 0),
+            'genres': []  # We'll get genres from genre_ids if needed
+        }
+
     def get_movie_details(self, movie_id):
         logger.info(f"Getting details for movie ID: {movie_id}")
         try:
@@ -115,29 +390,7 @@ class TMDBClient:
                 logger.error(f"No data found for movie ID: {movie_id}")
                 return None
             
-            # Get cast information
-            cast = []
-            if 'credits' in data and 'cast' in data['credits']:
-                for actor in data['credits']['cast'][:5]:  # Get top 5 cast members
-                    cast.append({
-                        'name': actor['name'],
-                        'character': actor['character'],
-                        'profile_path': actor['profile_path'] if actor['profile_path'] else None
-                    })
-            
-            return {
-                'id': data['id'],
-                'title': data['title'],
-                'overview': data['overview'],
-                'poster_path': data.get('poster_path'),  # Return just the path
-                'release_date': data.get('release_date'),
-                'vote_average': data.get('vote_average'),
-                'runtime': data.get('runtime', 0),
-                'genres': [genre['name'] for genre in data.get('genres', [])],
-                'credits': {
-                    'cast': cast
-                }
-            }
+            return self._format_movie_details(data)
         except Exception as e:
             logger.error(f"Error getting movie details: {str(e)}")
             return None
@@ -153,16 +406,7 @@ class TMDBClient:
         movies = []
         for movie in data['results'][:20]:  # Limit to 20 movies for performance
             try:
-                movie_data = {
-                    'id': movie['id'],
-                    'title': movie['title'],
-                    'overview': movie['overview'],
-                    'poster_path': movie.get('poster_path'),
-                    'release_date': movie.get('release_date'),
-                    'vote_average': movie.get('vote_average', 0),
-                    'genres': []  # We'll get genres from genre_ids if needed
-                }
-                movies.append(movie_data)
+                movies.append(self._format_listing_movie(movie))
             except Exception as e:
                 logger.error(f"Error processing movie data: {str(e)}")
                 continue
@@ -181,16 +425,7 @@ class TMDBClient:
         movies = []
         for movie in data['results'][:20]:  # Limit to 20 movies for performance
             try:
-                movie_data = {
-                    'id': movie['id'],
-                    'title': movie['title'],
-                    'overview': movie['overview'],
-                    'poster_path': movie.get('poster_path'),
-                    'release_date': movie.get('release_date'),
-                    'vote_average': movie.get('vote_average', 0),
-                    'genres': []  # We'll get genres from genre_ids if needed
-                }
-                movies.append(movie_data)
+                movies.append(self._format_listing_movie(movie))
             except Exception as e:
                 logger.error(f"Error processing movie data: {str(e)}")
                 continue
@@ -200,31 +435,23 @@ class TMDBClient:
 
     def get_new_releases(self):
         """Get new movie releases from TMDB."""
-        try:
-            logger.info("Fetching new releases")
-            results = self.movie_api.upcoming()
-            movies = []
-            
-            for movie in results[:20]:  # Limit to 20 movies for performance
-                try:
-                    movie_data = {
-                        'id': movie.id,
-                        'title': movie.title,
-                        'overview': movie.overview,
-                        'poster_path': movie.poster_path,
-                        'release_date': movie.release_date,
-                        'vote_average': movie.vote_average
-                    }
-                    movies.append(movie_data)
-                except Exception as e:
-                    logger.error(f"Error processing new release movie: {str(e)}")
-                    continue
-                    
-            logger.info(f"Found {len(movies)} new releases")
-            return movies
-        except Exception as e:
-            logger.error(f"Error fetching new releases: {str(e)}")
+        logger.info("Fetching new releases")
+        data = self._make_request('movie/upcoming')
+        
+        if not data or 'results' not in data:
+            logger.error("No new releases found")
             return []
+        
+        movies = []
+        for movie in data['results'][:20]:  # Limit to 20 movies for performance
+            try:
+                movies.append(self._format_movie_summary(movie))
+            except Exception as e:
+                logger.error(f"Error processing new release movie: {str(e)}")
+                continue
+        
+        logger.info(f"Found {len(movies)} new releases")
+        return movies
 
     def get_similar_movies(self, movie_id):
         logger.info(f"Getting similar movies for movie ID: {movie_id}")
@@ -234,11 +461,8 @@ class TMDBClient:
             logger.error(f"No similar movies found for movie ID: {movie_id}")
             return []
         
-        movies = []
-        for movie in data['results'][:5]:  # Limit to 5 similar movies
-            movie_data = self.get_movie_details(movie['id'])
-            if movie_data:
-                movies.append(movie_data)
+        # Limit to 5 similar movies
+        movies = self.get_movie_details_batch([movie['id'] for movie in data['results'][:5]])
         
         logger.info(f"Found {len(movies)} similar movies")
         return movies
@@ -288,6 +512,56 @@ class TMDBClient:
             logger.error(f"Error getting movies by genre: {str(e)}")
             return []
 
+    def get_movies_by_genres(self, genre_ids, count=20, sort_by='popularity.desc', year_range=None):
+        """Discover movies in ANY of the given genres with as few calls as possible.
+
+        TMDB treats '|' in with_genres as OR, so a whole mood is a single
+        discover query sorted server-side; further pages (20 results each)
+        are only requested while fewer than ``count`` movies were collected.
+        ``year_range`` (first, last) limits the release years server-side.
+        """
+        genre_ids = sorted(set(genre_ids))  # Same genre set -> same cache key
+        if not genre_ids:
+            return []
+        logger.info(f"Getting up to {count} movies for genre IDs: {genre_ids}")
+        
+        movies = []
+        seen_ids = set()
+        page = 1
+        total_pages = 1
+        while len(movies) < count and page <= total_pages:
+            data = self._make_request('discover/movie', self._discover_params(genre_ids, sort_by, page, year_range))
+            if not data or 'results' not in data:
+                logger.error(f"No movies found for genre IDs {genre_ids} on page {page}")
+                break
+            
+            total_pages = data.get('total_pages', page)
+            for movie in data['results']:
+                if movie['id'] in seen_ids:
+                    continue
+                try:
+                    movies.append(self._format_movie_summary(movie))
+                    seen_ids.add(movie['id'])
+                except Exception as e:
+                    logger.error(f"Error processing movie data: {str(e)}")
+            page += 1
+        
+        logger.info(f"Found {len(movies[:count])} movies for genre IDs {genre_ids} in {page - 1} request(s)")
+        return movies[:count]
+
+    @staticmethod
+    def _discover_params(genre_ids, sort_by, page, year_range=None):
+        """discover/movie query for get_movies_by_genres (shared with AsyncTMDBClient)"""
+        params = {
+            'with_genres': '|'.join(str(genre_id) for genre_id in genre_ids),
+            'sort_by': sort_by,
+            'page': page
+        }
+        if year_range:
+            params['primary_release_date.gte'] = f"{year_range[0]}-01-01"
+            params['primary_release_date.lte'] = f"{year_range[1]}-12-31"
+        return params
+
     def get_movie_of_the_day(self):
         logger.info("Getting movie of the day")
         popular_movies = self.get_popular_movies()
@@ -309,23 +583,30 @@ class TMDBClient:
             return []
         
         genre_ids = self.mood_mapping[mood]
-        movies = []
         
-        for genre_id in genre_ids:
-            data = self._make_request('discover/movie', {
+        # One discover call per genre, all in flight at once
+        pages = self._map(
+            lambda genre_id: self._make_request('discover/movie', {
                 'with_genres': genre_id,
                 'sort_by': 'popularity.desc',
                 'page': 1
-            })
-            
+            }),
+            genre_ids
+        )
+        
+        seen_ids = set()
+        candidates = []
+        for data in pages:
             if data and 'results' in data:
                 for movie in data['results']:
-                    movie_data = self.get_movie_details(movie['id'])
-                    if movie_data and movie_data not in movies:
-                        movies.append(movie_data)
+                    if movie['id'] not in seen_ids:
+                        seen_ids.add(movie['id'])
+                        candidates.append(movie)
         
-        # Sort by popularity and limit to 10 movies
-        movies = sorted(movies, key=lambda x: x.get('vote_average', 0), reverse=True)[:10]
+        # Rank on the listing's vote_average so only the top 10 need detail calls
+        candidates = sorted(candidates, key=lambda x: x.get('vote_average', 0), reverse=True)[:10]
+        movies = self.get_movie_details_batch([movie['id'] for movie in candidates])
+        movies = sorted(movies, key=lambda x: x.get('vote_average', 0), reverse=True)
         logger.info(f"Found {len(movies)} movies for mood: {mood}")
         return movies
 
@@ -0,0 +1,93 @@
+import os
+import random
+import contextvars
+from utils.tmdb_cache import DEFAULT_TTLS, classify_endpoint, make_cache_key
+from utils.rate_limiter import parse_retry_after, INTERACTIVE
+
+# Set while the cache warmer runs: entries that stop being fresh within this
+# many seconds are re-fetched instead of served from cache
+_refresh_horizon = contextvars.ContextVar('tmdb_refresh_horizon', default=None)
+
+# Statuses worth retrying; 429 also pauses the rate limiter
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# What lookup() says to do with a cached entry
+FRESH = 'fresh'          # Serve it
+STALE = 'stale'          # Serve it and refresh it in the background
+EXPIRING = 'expiring'    # Warming: fetch now, serve it only if the fetch fails
+MISS = 'miss'            # Fetch now
+
+
+class RequestPolicy:
+    """Everything a TMDB GET does apart from the HTTP call itself.
+
+    TMDBClient and AsyncTMDBClient both drive their transport with one
+    policy, so they cannot disagree on cache keys, TTLs, warming, which
+    lane waits how long, or which failures are retried and how:
+
+    - ``lookup``/``store``: the response cache, with a TTL per endpoint
+      class and stale-while-revalidate.
+    - ``wait_limit``: how long a caller in a lane may wait for a rate-limit
+      token or for an identical request already in flight.
+    - ``retry_delay``: after a failed attempt, how long to sleep before the
+      next one (a 429 pauses the shared rate limiter instead), or None to
+      give up.
+
+    The cache calls block (SQLite by default); async callers run them in an
+    executor.
+    """
+
+    def __init__(self, cache, rate_limiter, cache_ttls=None, max_retries=None,
+                 backoff_factor=None, rate_limit_wait=None, background_wait=None):
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.cache_ttls = dict(DEFAULT_TTLS)
+        if cache_ttls:
+            self.cache_ttls.update(cache_ttls)
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('TMDB_MAX_RETRIES', 3))
+        self.backoff_factor = backoff_factor if backoff_factor is not None else float(os.getenv('TMDB_BACKOFF_FACTOR', 0.5))
+        # User requests give up after rate_limit_wait seconds, background work
+        # (which yields to them) after background_wait
+        self.rate_limit_wait = rate_limit_wait or float(os.getenv('TMDB_RATE_LIMIT_MAX_WAIT', 10))
+        self.background_wait = background_wait or float(os.getenv('TMDB_RATE_LIMIT_BACKGROUND_WAIT', 120))
+
+    @staticmethod
+    def cache_key(endpoint, params):
+        return make_cache_key(endpoint, params)
+
+    def lookup(self, key):
+        """Return (cached data or None, FRESH/STALE/EXPIRING/MISS) for ``key``"""
+        horizon = _refresh_horizon.get()
+        if horizon is not None:
+            expires_in = self.cache.expires_in(key)
+            if expires_in is None or expires_in < horizon:
+                data, _ = self.cache.lookup(key)
+                return data, EXPIRING if data is not None else MISS
+
+        data, fresh = self.cache.lookup(key)
+        if data is None:
+            return None, MISS
+        return data, FRESH if fresh else STALE
+
+    def store(self, key, endpoint, data):
+        ttl, stale_ttl = self.cache_ttls[classify_endpoint(endpoint)]
+        self.cache.set(key, data, ttl, stale_ttl)
+
+    def wait_limit(self, lane):
+        """How long a caller in ``lane`` may wait for the rate limiter or a shared request"""
+        return self.rate_limit_wait if lane == INTERACTIVE else self.background_wait
+
+    def retry_delay(self, attempt, status=None, retry_after=None):
+        """Seconds to sleep before retrying ``attempt`` (0-based), or None to give up
+
+        ``status`` is the HTTP status of the failed attempt, None for a
+        connection error or timeout.
+        """
+        delay = self.backoff_factor * (2 ** attempt)
+        if status == 429:
+            # The limiter holds every caller back until Retry-After has passed
+            self.rate_limiter.throttle(parse_retry_after(retry_after, delay))
+            delay = 0.0
+        if attempt >= self.max_retries:
+            return None
+        return delay * random.uniform(0.5, 1)